@@ -51,6 +51,19 @@ def create_app(config_object=None):
     migrate.init_app(app, db)
     mail.init_app(app)
 
+    from utils.google_books import init_app as init_google_books
+    init_google_books(app)
+    from utils.autocomplete import init_app as init_autocomplete
+    init_autocomplete(app)
+    from utils.covers import init_app as init_covers
+    init_covers(app)
+    from utils.bm25 import init_app as init_bm25
+    init_bm25(app)
+    from utils.fragments import init_app as init_fragments
+    init_fragments(app)
+    from utils.conditional import init_app as init_conditional
+    init_conditional(app)
+
     # Import models after extensions are initialized
     from models import User
 
@@ -84,6 +97,7 @@ def create_app(config_object=None):
     from routes.admin import bp as admin_bp
     from routes.oauth import bp as oauth_bp
     from routes.legal import bp as legal_bp
+    from routes.covers import bp as covers_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(books_bp)
@@ -95,6 +109,7 @@ def create_app(config_object=None):
     app.register_blueprint(admin_bp)
     app.register_blueprint(oauth_bp)
     app.register_blueprint(legal_bp)
+    app.register_blueprint(covers_bp)
     # Error handlers
     @app.errorhandler(429)
     def ratelimit_handler(e):
@@ -112,9 +127,11 @@ def create_app(config_object=None):
     # Initialize CLI commands
     from cli.email_commands import init_app as init_email_cli
     from cli.user_commands import init_app as init_user_cli
+    from cli.book_commands import init_app as init_book_cli
     
     init_email_cli(app)
     init_user_cli(app)
+    init_book_cli(app)
 
     return app
 
@@ -0,0 +1,152 @@
+import click
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from flask.cli import with_appcontext
+from models import Book, User, Volume, db
+from utils import bm25, google_books, search
+
+CHECKPOINT_FILE = 'refresh_metadata.checkpoint'
+
+@click.group(name='books')
+def books_cli():
+    """Book library maintenance commands."""
+    pass
+
+def fetch_for_refresh(google_id, etag):
+    """Fetch one volume conditionally; returns (google_id, volume, error)"""
+    try:
+        volume, _ = google_books.fetch_volume(google_id, google_books.quote_etag(etag))
+        return google_id, volume, None
+    except Exception as e:
+        return google_id, None, e
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+def write_checkpoint(path, google_id):
+    if google_id is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, 'w') as f:
+        f.write(google_id)
+
+@books_cli.command('refresh-metadata')
+@click.option('--batch-size', default=100, show_default=True, help='Volumes fetched per batch.')
+@click.option('--workers', default=8, show_default=True, help='Concurrent Google Books requests.')
+@click.option('--dry-run', is_flag=True, help='Fetch and compare without saving changes.')
+@click.option('--resume', is_flag=True, help='Continue after the last completed batch.')
+@click.option('--checkpoint', 'checkpoint_path', default=None,
+              help='Checkpoint file (defaults to the instance folder).')
+@click.option('--api-url', default=None, help='Use a stand-in Google Books server.')
+@with_appcontext
+def refresh_metadata(batch_size, workers, dry_run, resume, checkpoint_path, api_url):
+    """Re-sync library metadata from Google Books."""
+    checkpoint_path = checkpoint_path or os.path.join(current_app.instance_path, CHECKPOINT_FILE)
+    if api_url:
+        os.environ['GOOGLE_BOOKS_API_URL'] = api_url
+        google_books.reset_client()
+
+    last_id = read_checkpoint(checkpoint_path) if resume else None
+    if last_id:
+        click.echo(f'Resuming after {last_id}')
+
+    stats = {'volumes': 0, 'changed': 0, 'unchanged': 0, 'failed': 0, 'books': 0}
+    # Resuming starts after the checkpoint, so it never moves past a volume that failed
+    checkpoint_id = last_id
+    first_failure = None
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            query = db.session.query(Book.google_books_id)\
+                .filter(Book.google_books_id.isnot(None))\
+                .filter(Book.google_books_id != '')
+            if last_id:
+                query = query.filter(Book.google_books_id > last_id)
+            google_ids = [row[0] for row in query.distinct()
+                          .order_by(Book.google_books_id)
+                          .limit(batch_size)
+                          .all()]
+            if not google_ids:
+                break
+
+            # Several users can own the same volume; fetch it once for all of them
+            books_by_id = {}
+            for book in Book.query.filter(Book.google_books_id.in_(google_ids)).all():
+                books_by_id.setdefault(book.google_books_id, []).append(book)
+
+            jobs = []
+            for google_id in google_ids:
+                etags = {book.etag for book in books_by_id[google_id]}
+                # Only send a conditional request if every copy has the same etag
+                etag = etags.pop() if len(etags) == 1 else None
+                jobs.append(pool.submit(fetch_for_refresh, google_id, etag))
+
+            for job in jobs:
+                google_id, volume, error = job.result()
+                stats['volumes'] += 1
+                if error is not None:
+                    stats['failed'] += 1
+                    first_failure = first_failure or google_id
+                    click.echo(f'Failed to fetch {google_id}: {error}', err=True)
+                    continue
+                if first_failure is None:
+                    checkpoint_id = google_id
+                if volume is None:
+                    stats['unchanged'] += 1
+                else:
+                    stats['changed'] += 1
+                    # Update the shared catalog entry once, then link each copy to it
+                    catalog = db.session.get(Volume, google_id) or Volume()
+                    catalog.update_from_google_books(volume)
+                    db.session.add(catalog)
+                    for book in books_by_id[google_id]:
+                        book.apply_volume(catalog, volume)
+                        stats['books'] += 1
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+                write_checkpoint(checkpoint_path, checkpoint_id)
+            last_id = google_ids[-1]
+
+    if not dry_run and first_failure is None:
+        write_checkpoint(checkpoint_path, None)
+
+    elapsed = time.perf_counter() - started
+    rate = stats['volumes'] / elapsed if elapsed else 0
+    prefix = '[dry run] ' if dry_run else ''
+    click.echo(f"{prefix}Checked {stats['volumes']} volumes in {elapsed:.1f}s ({rate:.1f} volumes/s)")
+    click.echo(f"{prefix}Changed: {stats['changed']} ({stats['books']} books), "
+               f"unchanged: {stats['unchanged']}, failed: {stats['failed']}")
+    if first_failure is not None and not dry_run:
+        click.echo(f'Run again with --resume to retry from {first_failure}')
+
+@books_cli.command('reindex-search')
+@with_appcontext
+def reindex_search():
+    """Rebuild the shelf search index (SQLite FTS5, or the bm25 backend's)."""
+    if search.get_backend().name == 'bm25':
+        user_ids = [user_id for user_id, in db.session.query(User.id)]
+        bm25.rebuild(user_ids)
+        click.echo(f'Rebuilt the search indexes of {len(user_ids)} users')
+        return
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('Only SQLite databases use the books_search index; '
+                   'PostgreSQL search columns are maintained by the database.')
+        return
+    with db.engine.begin() as connection:
+        search.BACKENDS['sqlite'].install(connection, rebuild=True)
+    count = db.session.execute(db.text('SELECT count(*) FROM books_search')).scalar()
+    click.echo(f'Indexed {count} books')
+
+def init_app(app):
+    """Register CLI commands"""
+    app.cli.add_command(books_cli)
@@ -33,6 +33,60 @@ class Config:
     RATELIMIT_STORAGE_OPTIONS = {"decode_responses": True}
     RATELIMIT_KEY_PREFIX = 'rate_limit'
     
+    # Google Books client and circuit breaker
+    GOOGLE_BOOKS_TIMEOUT = float(os.environ.get('GOOGLE_BOOKS_TIMEOUT', 5))
+    BOOKS_BREAKER_FAILURE_RATE = float(os.environ.get('BOOKS_BREAKER_FAILURE_RATE', 0.5))
+    BOOKS_BREAKER_MIN_CALLS = int(os.environ.get('BOOKS_BREAKER_MIN_CALLS', 10))
+    BOOKS_BREAKER_WINDOW_SECONDS = int(os.environ.get('BOOKS_BREAKER_WINDOW_SECONDS', 60))
+    BOOKS_BREAKER_OPEN_SECONDS = int(os.environ.get('BOOKS_BREAKER_OPEN_SECONDS', 30))
+    BOOKS_BREAKER_HALF_OPEN_PROBES = int(os.environ.get('BOOKS_BREAKER_HALF_OPEN_PROBES', 1))
+    
+    # Cluster-wide Google Books quota (token bucket shared through Redis)
+    BOOKS_QUOTA_RATE = float(os.environ.get('BOOKS_QUOTA_RATE', 5))
+    BOOKS_QUOTA_BURST = int(os.environ.get('BOOKS_QUOTA_BURST', 20))
+    # Share of the bucket detail lookups and background refreshes must leave for searches
+    BOOKS_QUOTA_DETAIL_RESERVE = float(os.environ.get('BOOKS_QUOTA_DETAIL_RESERVE', 0.2))
+    BOOKS_QUOTA_REFRESH_RESERVE = float(os.environ.get('BOOKS_QUOTA_REFRESH_RESERVE', 0.5))
+    BOOKS_QUOTA_INTERACTIVE_WAIT = float(os.environ.get('BOOKS_QUOTA_INTERACTIVE_WAIT', 2))
+    BOOKS_QUOTA_REFRESH_WAIT = float(os.environ.get('BOOKS_QUOTA_REFRESH_WAIT', 60))
+    
+    # Google Books search result cache (local LRU in front of Redis)
+    BOOKS_SEARCH_CACHE_TTL = int(os.environ.get('BOOKS_SEARCH_CACHE_TTL', 600))
+    BOOKS_SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('BOOKS_SEARCH_CACHE_MAX_ENTRIES', 256))
+    BOOKS_SEARCH_CACHE_MAX_BYTES = int(os.environ.get('BOOKS_SEARCH_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    BOOKS_SEARCH_CACHE_MAX_ITEM_BYTES = int(os.environ.get('BOOKS_SEARCH_CACHE_MAX_ITEM_BYTES', 512 * 1024))
+    # How long expired pages are kept to serve while Google Books is down
+    BOOKS_SEARCH_CACHE_STALE_TTL = int(os.environ.get('BOOKS_SEARCH_CACHE_STALE_TTL', 24 * 60 * 60))
+    
+    # Google Books volume cache; entries older than FRESH_SECONDS are revalidated by ETag
+    BOOKS_VOLUME_CACHE_TTL = int(os.environ.get('BOOKS_VOLUME_CACHE_TTL', 7 * 24 * 60 * 60))
+    BOOKS_VOLUME_CACHE_MAX_ENTRIES = int(os.environ.get('BOOKS_VOLUME_CACHE_MAX_ENTRIES', 1024))
+    BOOKS_VOLUME_CACHE_FRESH_SECONDS = int(os.environ.get('BOOKS_VOLUME_CACHE_FRESH_SECONDS', 60 * 60))
+    
+    # Search box suggestions; each worker pulls new catalog volumes this often
+    AUTOCOMPLETE_SYNC_SECONDS = int(os.environ.get('AUTOCOMPLETE_SYNC_SECONDS', 60))
+    AUTOCOMPLETE_MAX_RECENT = int(os.environ.get('AUTOCOMPLETE_MAX_RECENT', 5000))
+    
+    # Books per shelf page; further pages load as the user scrolls
+    SHELF_PAGE_SIZE = int(os.environ.get('SHELF_PAGE_SIZE', 50))
+    
+    # Shelf search backend; defaults to the database dialect (postgresql, sqlite, like), or bm25
+    SHELF_SEARCH_BACKEND = os.environ.get('SHELF_SEARCH_BACKEND')
+    # Where the bm25 backend keeps its per-user indexes (defaults to instance/search)
+    SHELF_SEARCH_INDEX_DIR = os.environ.get('SHELF_SEARCH_INDEX_DIR')
+    # Also match titles and authors with typos or partial words
+    SHELF_FUZZY_SEARCH = os.environ.get('SHELF_FUZZY_SEARCH', 'True').lower() == 'true'
+    
+    # Cover image proxy cache (defaults to instance/covers)
+    COVER_CACHE_DIR = os.environ.get('COVER_CACHE_DIR')
+    COVER_CACHE_MAX_BYTES = int(os.environ.get('COVER_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    
+    # Rendered home, shelf and stats fragments, keyed on the user's library version
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'True').lower() == 'true'
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 600))
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 1024))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    
     # Session config
     PERMANENT_SESSION_LIFETIME = timedelta(days=31)
     SESSION_COOKIE_HTTPONLY = True
@@ -1,30 +1,2 @@
-import re
-
-def strip_html_tags(text):
-    """Remove HTML tags and decode HTML entities from a string"""
-    if not text:
-        return ''
-    
-    # First pass: remove bold tags specifically (replace with their content)
-    text = re.sub(r'<b>(.*?)</b>', r'\1', text)
-    text = re.sub(r'<strong>(.*?)</strong>', r'\1', text)
-    
-    # Second pass: remove remaining HTML tags
-    clean = re.compile('<.*?>')
-    text = re.sub(clean, ' ', text)
-    
-    # Replace common HTML entities
-    text = text.replace('&nbsp;', ' ')\
-               .replace('&amp;', '&')\
-               .replace('&lt;', '<')\
-               .replace('&gt;', '>')\
-               .replace('&quot;', '"')\
-               .replace('&#39;', "'")\
-               .replace('&ndash;', '–')\
-               .replace('&mdash;', '—')
-    
-    # Clean up extra whitespace
-    text = ' '.join(text.split())
-    
-    return text.strip()
-    
\ No newline at end of file
+# Kept for older imports; the implementation lives in utils.text
+from utils.text import strip_html_tags  # noqa: F401
@@ -0,0 +1,25 @@
+"""add books user_id/google_books_id index
+
+Revision ID: 3c9a1f5e7b21
+Revises: 25754a7857d5
+Create Date: 2026-10-18 10:12:40.118402
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1f5e7b21'
+down_revision = '25754a7857d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Search pages look up the user's status for each result's volume id
+    op.create_index('ix_books_user_id_google_books_id', 'books',
+                    ['user_id', 'google_books_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_books_user_id_google_books_id', table_name='books')
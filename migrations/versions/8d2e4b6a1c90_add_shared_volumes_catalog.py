@@ -0,0 +1,116 @@
+"""add shared volumes catalog
+
+Revision ID: 8d2e4b6a1c90
+Revises: 3c9a1f5e7b21
+Create Date: 2026-10-18 14:02:17.530914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b6a1c90'
+down_revision = '3c9a1f5e7b21'
+branch_labels = None
+depends_on = None
+
+# Metadata columns moved to the catalog; books keeps them as nullable overrides
+CATALOG_COLUMNS = (
+    'isbn', 'isbn13', 'published_date', 'etag', 'self_link', 'publisher',
+    'description', 'page_count', 'print_type', 'categories', 'maturity_rating',
+    'language', 'preview_link', 'info_link', 'canonical_volume_link',
+    'small_thumbnail', 'thumbnail', 'content_version', 'is_ebook'
+)
+
+
+def upgrade():
+    op.create_table('volumes',
+        sa.Column('google_books_id', sa.String(length=20), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=True),
+        sa.Column('authors', sa.String(length=200), nullable=True),
+        sa.Column('isbn', sa.String(length=13), nullable=True),
+        sa.Column('isbn13', sa.String(length=13), nullable=True),
+        sa.Column('published_date', sa.String(length=10), nullable=True),
+        sa.Column('etag', sa.String(length=50), nullable=True),
+        sa.Column('self_link', sa.String(length=250), nullable=True),
+        sa.Column('publisher', sa.String(length=100), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('page_count', sa.Integer(), nullable=True),
+        sa.Column('print_type', sa.String(length=20), nullable=True),
+        sa.Column('categories', sa.String(length=100), nullable=True),
+        sa.Column('maturity_rating', sa.String(length=20), nullable=True),
+        sa.Column('language', sa.String(length=10), nullable=True),
+        sa.Column('preview_link', sa.String(length=250), nullable=True),
+        sa.Column('info_link', sa.String(length=250), nullable=True),
+        sa.Column('canonical_volume_link', sa.String(length=250), nullable=True),
+        sa.Column('small_thumbnail', sa.String(length=250), nullable=True),
+        sa.Column('thumbnail', sa.String(length=250), nullable=True),
+        sa.Column('content_version', sa.String(length=20), nullable=True),
+        sa.Column('is_ebook', sa.Boolean(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('google_books_id')
+    )
+
+    # Empty ids can't reference the catalog
+    op.execute("UPDATE books SET google_books_id = NULL WHERE google_books_id = ''")
+
+    # Backfill one catalog row per volume from the most recently added copy
+    columns = ', '.join(('title', 'authors') + CATALOG_COLUMNS)
+    op.execute(f"""
+        INSERT INTO volumes (google_books_id, {columns}, updated_at)
+        SELECT DISTINCT ON (google_books_id) google_books_id, {columns}, now()
+        FROM books
+        WHERE google_books_id IS NOT NULL
+        ORDER BY google_books_id, created_at DESC, id DESC
+    """)
+
+    # Deduplicate: copies that match the catalog become NULL (inherit), so only
+    # real per-user differences stay on the books row
+    assignments = ',\n'.join(
+        f'{column} = CASE WHEN books.{column} IS NOT DISTINCT FROM v.{column} '
+        f'THEN NULL ELSE books.{column} END'
+        for column in CATALOG_COLUMNS
+    )
+    op.execute(f"""
+        UPDATE books SET {assignments}
+        FROM volumes v
+        WHERE v.google_books_id = books.google_books_id
+    """)
+
+    op.create_foreign_key('fk_books_google_books_id_volumes', 'books', 'volumes',
+                          ['google_books_id'], ['google_books_id'])
+
+    # Catalog text is indexed once per volume instead of once per copy
+    op.execute("""
+        ALTER TABLE volumes
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('books_fts_config', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('books_fts_config', coalesce(authors, '')), 'B') ||
+            setweight(to_tsvector('books_fts_config', coalesce(description, '')), 'C') ||
+            setweight(to_tsvector('books_fts_config', coalesce(categories, '')), 'D')
+        ) STORED;
+
+        CREATE INDEX volumes_search_idx ON volumes USING GIN (search_vector);
+    """)
+
+    # Refresh planner statistics after the bulk update. The space freed by the
+    # deduplicated copies is reused by new rows; VACUUM FULL books (outside a
+    # transaction) returns it to the OS.
+    op.execute('ANALYZE books')
+
+
+def downgrade():
+    # Copy catalog values back onto every book before dropping the catalog
+    assignments = ',\n'.join(
+        f'{column} = COALESCE(books.{column}, v.{column})' for column in CATALOG_COLUMNS
+    )
+    op.execute(f"""
+        UPDATE books SET {assignments}
+        FROM volumes v
+        WHERE v.google_books_id = books.google_books_id
+    """)
+    op.drop_constraint('fk_books_google_books_id_volumes', 'books', type_='foreignkey')
+    op.execute('DROP INDEX IF EXISTS volumes_search_idx')
+    op.drop_table('volumes')
@@ -0,0 +1,64 @@
+"""add normalized categories
+
+Revision ID: a3d8f0b5c642
+Revises: f1b6c8e2a573
+Create Date: 2026-10-18 20:52:31.377025
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d8f0b5c642'
+down_revision = 'f1b6c8e2a573'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('book_categories',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id']),
+        sa.PrimaryKeyConstraint('book_id', 'category_id')
+    )
+    op.create_index('ix_book_categories_category_id', 'book_categories',
+                    ['category_id', 'book_id'], unique=False)
+
+    # Split each book's effective categories (override, else catalog) and
+    # normalize them like utils.volumes.normalize_category
+    op.execute(r"""
+        CREATE TEMPORARY TABLE book_category_names ON COMMIT DROP AS
+        SELECT DISTINCT b.id AS book_id,
+               regexp_replace(btrim(regexp_replace(c.name, '\s+', ' ', 'g')),
+                              '\s*/\s*', ' / ', 'g') AS name
+        FROM books b
+        LEFT JOIN volumes v ON v.google_books_id = b.google_books_id
+        CROSS JOIN LATERAL unnest(string_to_array(coalesce(b.categories, v.categories), ',')) AS c(name)
+    """)
+    op.execute("DELETE FROM book_category_names WHERE name = ''")
+    op.execute("""
+        INSERT INTO categories (name)
+        SELECT DISTINCT name FROM book_category_names ORDER BY name
+    """)
+    op.execute("""
+        INSERT INTO book_categories (book_id, category_id)
+        SELECT n.book_id, c.id
+        FROM book_category_names n JOIN categories c ON c.name = n.name
+    """)
+    op.execute('ANALYZE categories')
+    op.execute('ANALYZE book_categories')
+
+
+def downgrade():
+    op.drop_index('ix_book_categories_category_id', table_name='book_categories')
+    op.drop_table('book_categories')
+    op.drop_table('categories')
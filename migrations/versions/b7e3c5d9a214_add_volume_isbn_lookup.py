@@ -0,0 +1,46 @@
+"""add volume isbn lookup
+
+Revision ID: b7e3c5d9a214
+Revises: 8d2e4b6a1c90
+Create Date: 2026-10-18 16:41:05.218730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from utils.isbn import normalize
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3c5d9a214'
+down_revision = '8d2e4b6a1c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('volumes', sa.Column('normalized_isbn', sa.String(length=13), nullable=True))
+
+    # Checksums are validated in Python; the oldest volume keeps a shared ISBN
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("""
+        SELECT google_books_id, isbn13, isbn FROM volumes
+        WHERE isbn13 IS NOT NULL OR isbn IS NOT NULL
+        ORDER BY updated_at NULLS FIRST, google_books_id
+    """))
+    claimed = {}
+    for google_books_id, isbn13, isbn in rows:
+        key = normalize(isbn13, isbn)
+        if key and key not in claimed:
+            claimed[key] = google_books_id
+    if claimed:
+        conn.execute(
+            sa.text('UPDATE volumes SET normalized_isbn = :key WHERE google_books_id = :id'),
+            [{'key': key, 'id': google_books_id} for key, google_books_id in claimed.items()]
+        )
+
+    op.create_index('ix_volumes_normalized_isbn', 'volumes', ['normalized_isbn'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_volumes_normalized_isbn', table_name='volumes')
+    op.drop_column('volumes', 'normalized_isbn')
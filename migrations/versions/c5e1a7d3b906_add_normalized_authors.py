@@ -0,0 +1,70 @@
+"""add normalized authors
+
+Revision ID: c5e1a7d3b906
+Revises: a3d8f0b5c642
+Create Date: 2026-10-18 21:34:12.604518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1a7d3b906'
+down_revision = 'a3d8f0b5c642'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('authors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('book_authors',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['author_id'], ['authors.id']),
+        sa.PrimaryKeyConstraint('book_id', 'author_id')
+    )
+    op.create_index('ix_book_authors_author_id', 'book_authors',
+                    ['author_id', 'book_id'], unique=False)
+
+    # Existing books only have the comma-joined string; split it and collapse
+    # whitespace like utils.volumes.split_authors, keeping the first position
+    # of an author listed twice
+    op.execute(r"""
+        CREATE TEMPORARY TABLE book_author_names ON COMMIT DROP AS
+        SELECT a.book_id, a.name, min(a.position) - 1 AS position
+        FROM (
+            SELECT b.id AS book_id,
+                   btrim(regexp_replace(n.name, '\s+', ' ', 'g')) AS name,
+                   n.position
+            FROM books b
+            CROSS JOIN LATERAL unnest(string_to_array(b.authors, ','))
+                WITH ORDINALITY AS n(name, position)
+        ) a
+        WHERE a.name <> ''
+        GROUP BY a.book_id, a.name
+    """)
+    op.execute("""
+        INSERT INTO authors (name)
+        SELECT DISTINCT name FROM book_author_names ORDER BY name
+    """)
+    op.execute("""
+        INSERT INTO book_authors (book_id, author_id, position)
+        SELECT n.book_id, a.id, n.position
+        FROM book_author_names n JOIN authors a ON a.name = n.name
+    """)
+    op.execute('ANALYZE authors')
+    op.execute('ANALYZE book_authors')
+
+
+def downgrade():
+    op.drop_index('ix_book_authors_author_id', table_name='book_authors')
+    op.drop_table('book_authors')
+    op.drop_table('authors')
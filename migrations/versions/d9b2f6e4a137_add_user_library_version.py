@@ -0,0 +1,24 @@
+"""add user library version
+
+Revision ID: d9b2f6e4a137
+Revises: c5e1a7d3b906
+Create Date: 2026-10-18 22:15:47.281930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b2f6e4a137'
+down_revision = 'c5e1a7d3b906'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('library_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('users', 'library_version')
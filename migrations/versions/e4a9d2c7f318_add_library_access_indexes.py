@@ -0,0 +1,50 @@
+"""add indexes for library access patterns
+
+Revision ID: e4a9d2c7f318
+Revises: b7e3c5d9a214
+Create Date: 2026-10-18 18:20:44.906512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9d2c7f318'
+down_revision = 'b7e3c5d9a214'
+branch_labels = None
+depends_on = None
+
+# Must match models.NEVER_READ so the read shelf's ORDER BY uses the index
+NEVER_READ = "'0001-01-01 00:00:00.000000'"
+
+INDEXES = (
+    # Shelves and the home page: one user's shelf, newest first
+    ('ix_books_user_status_created', 'books', ['user_id', 'status', 'created_at', 'id']),
+    # The read shelf, by read date with unread books last
+    ('ix_books_user_status_read', 'books',
+     ['user_id', 'status', sa.text(f'coalesce(date_read, {NEVER_READ})'), 'created_at', 'id']),
+    # Stats: books read in a year
+    ('ix_books_user_date_read', 'books', ['user_id', 'date_read']),
+    # Copies of a volume, for catalog refreshes
+    ('ix_books_google_books_id', 'books', ['google_books_id']),
+    # Autocomplete syncs volumes updated since its last pass
+    ('ix_volumes_updated_at', 'volumes', ['updated_at']),
+)
+
+
+def upgrade():
+    # CONCURRENTLY builds without locking out writes, but can't run inside
+    # a transaction. A failed build leaves an INVALID index; drop it and rerun.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+        op.execute('ANALYZE books')
+        op.execute('ANALYZE volumes')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
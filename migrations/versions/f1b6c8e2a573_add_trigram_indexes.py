@@ -0,0 +1,36 @@
+"""add trigram indexes for fuzzy shelf search
+
+Revision ID: f1b6c8e2a573
+Revises: e4a9d2c7f318
+Create Date: 2026-10-18 19:37:12.604418
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b6c8e2a573'
+down_revision = 'e4a9d2c7f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm ships with PostgreSQL's contrib modules; creating it needs a
+    # role with CREATE on the database
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    # Fuzzy search matches "terms <% title" and "terms <% authors"
+    with op.get_context().autocommit_block():
+        for column in ('title', 'authors'):
+            op.create_index(f'ix_books_{column}_trgm', 'books', [column], unique=False,
+                            postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'},
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for column in ('authors', 'title'):
+            op.drop_index(f'ix_books_{column}_trgm', table_name='books',
+                          postgresql_concurrently=True, if_exists=True)
@@ -1,21 +1,48 @@
 from datetime import datetime, timezone
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session
 from extensions import db
+from utils.text import strip_html_tags
+from utils.isbn import normalize as normalize_isbn
+from utils.volumes import distinct_authors, extract_isbns, split_authors, split_categories
 
-class Book(db.Model):
-    __tablename__ = 'books'
+# Google metadata columns stored once per volume in the shared catalog.
+# Book keeps a same-named nullable column for each as a per-user override.
+CATALOG_FIELDS = (
+    'isbn', 'isbn13', 'published_date', 'etag', 'self_link', 'publisher',
+    'description', 'page_count', 'print_type', 'categories', 'maturity_rating',
+    'language', 'preview_link', 'info_link', 'canonical_volume_link',
+    'small_thumbnail', 'thumbnail', 'content_version', 'is_ebook'
+)
+
+# Read-shelf sort value for books without a read date: before every real date.
+# Kept as a SQL literal so queries match the ix_books_user_status_read index,
+# spelled as SQLite stores a DateTime so it equals itself when a page cursor
+# binds it back (PostgreSQL reads both spellings as the same timestamp).
+NEVER_READ = "'0001-01-01 00:00:00.000000'"
+
+# Catalog fields shown on list pages (covers, page counts, dates)
+LIST_FIELDS = ('thumbnail', 'etag', 'page_count', 'published_date')
+
+class Volume(db.Model):
+    """Shared catalog entry for one Google Books volume"""
+    __tablename__ = 'volumes'
+    __table_args__ = (
+        db.Index('ix_volumes_normalized_isbn', 'normalized_isbn', unique=True),
+        # Autocomplete pulls volumes changed since its last sync
+        db.Index('ix_volumes_updated_at', 'updated_at'),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    title = db.Column(db.String, nullable=False)
-    authors = db.Column(db.String, nullable=False)
+    google_books_id = db.Column(db.String, primary_key=True)
+    title = db.Column(db.String)
+    authors = db.Column(db.String)
     isbn = db.Column(db.String)
     isbn13 = db.Column(db.String)
+    # ISBN-13 form of isbn13/isbn for lookups; NULL if another volume has it
+    normalized_isbn = db.Column(db.String(13))
     published_date = db.Column(db.String)
-    status = db.Column(db.String, nullable=False, default='to_read')
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-    date_read = db.Column(db.DateTime, nullable=True)
-    google_books_id = db.Column(db.String)
     etag = db.Column(db.String)
     self_link = db.Column(db.String)
     publisher = db.Column(db.String)
@@ -34,14 +61,14 @@ class Book(db.Model):
     
     content_version = db.Column(db.String)
     is_ebook = db.Column(db.Boolean)
-    
-    user = db.relationship('User', back_populates='books')
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
     
     def __repr__(self):
-        return f"<Book(title='{self.title}', authors='{self.authors}', status='{self.status}')>"
+        return f"<Volume(google_books_id='{self.google_books_id}', title='{self.title}')>"
     
     def update_from_google_books(self, item):
-        """Update book with data from Google Books API"""
+        """Update the catalog entry with data from Google Books API"""
         volume_info = item.get('volumeInfo', {})
         
         # Basic info
@@ -50,13 +77,12 @@ class Book(db.Model):
         self.self_link = item.get('selfLink')
         
         # Volume info
-        if not self.title:
-            self.title = volume_info.get('title')
-        if not self.authors and 'authors' in volume_info:
+        self.title = volume_info.get('title')
+        if 'authors' in volume_info:
             self.authors = ', '.join(volume_info['authors'])
         self.publisher = volume_info.get('publisher')
         self.published_date = volume_info.get('publishedDate')
-        self.description = volume_info.get('description')
+        self.description = strip_html_tags(volume_info.get('description')) or None
         self.page_count = volume_info.get('pageCount')
         self.print_type = volume_info.get('printType')
         
@@ -76,16 +102,291 @@ class Book(db.Model):
         self.small_thumbnail = image_links.get('smallThumbnail')
         self.thumbnail = image_links.get('thumbnail')
         
-        # ISBN handling
-        for identifier in volume_info.get('industryIdentifiers', []):
-            if identifier['type'] == 'ISBN_13':
-                self.isbn13 = identifier['identifier']
-            elif identifier['type'] == 'ISBN_10':
-                self.isbn = identifier['identifier']
+        # ISBN handling; keep stored values for types Google doesn't list
+        for field, value in extract_isbns(volume_info).items():
+            setattr(self, field, value)
+        self.assign_normalized_isbn()
         
         # Sale info
         sale_info = item.get('saleInfo', {})
         self.is_ebook = sale_info.get('isEbook', False)
+    
+    def assign_normalized_isbn(self):
+        """Set the ISBN lookup key, unless another volume already holds it.
+        
+        Google sometimes lists one ISBN under several volume ids; the first
+        one in the catalog keeps answering lookups for it.
+        """
+        key = normalize_isbn(self.isbn13, self.isbn)
+        if key is not None and key != self.normalized_isbn:
+            with db.session.no_autoflush:
+                holder = Volume.query.filter_by(normalized_isbn=key).first()
+            if holder is not None and holder is not self:
+                key = None
+        self.normalized_isbn = key
+
+class UniqueName:
+    """Lookup table of names stored once, however many books use them"""
+    
+    @classmethod
+    def get_or_create(cls, names):
+        """Rows for ``names`` in the same order, adding any that are new"""
+        if not names:
+            return []
+        # Including ones added earlier in this flush
+        found = {obj.name: obj for obj in db.session.new if isinstance(obj, cls)}
+        with db.session.no_autoflush:
+            found.update((row.name, row) for row in cls.query.filter(cls.name.in_(names)))
+        for name in names:
+            if name not in found:
+                found[name] = cls(name=name)
+                db.session.add(found[name])
+        return [found[name] for name in names]
+
+class Category(UniqueName, db.Model):
+    """A subject heading, stored once however many books carry it"""
+    __tablename__ = 'categories'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f"<Category(name='{self.name}')>"
+
+class Author(UniqueName, db.Model):
+    """A person credited on books, stored once however they are listed"""
+    __tablename__ = 'authors'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)
+    
+    def __repr__(self):
+        return f"<Author(name='{self.name}')>"
+
+# Each book's effective categories (its override, else the volume's)
+book_categories = db.Table(
+    'book_categories',
+    db.Column('book_id', db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True),
+    # Category pages go from the category to its books
+    db.Index('ix_book_categories_category_id', 'category_id', 'book_id')
+)
+
+class BookAuthor(db.Model):
+    """One author of a book; ``position`` keeps the credited order"""
+    __tablename__ = 'book_authors'
+    __table_args__ = (
+        # Author pages and stats go from the author to their books
+        db.Index('ix_book_authors_author_id', 'author_id', 'book_id'),
+    )
+    
+    book_id = db.Column(db.Integer, db.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('authors.id'), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    
+    author = db.relationship('Author')
+
+def catalog_field(name):
+    """Book attribute that reads the user's override, falling back to the volume.
+    
+    Setting a value equal to the catalog's clears the override instead of
+    storing another copy. In queries it is ``COALESCE(books.x, volumes.x)``,
+    so the query has to join ``Book.volume`` (see ``Book.with_volume``).
+    """
+    override = f'{name}_override'
+    
+    def fget(self):
+        value = getattr(self, override)
+        if value is None and self.volume is not None:
+            return getattr(self.volume, name)
+        return value
+    
+    def fset(self, value):
+        if value is not None and self.volume is not None \
+                and str(value) == str(getattr(self.volume, name)):
+            value = None
+        setattr(self, override, value)
+    
+    def expr(cls):
+        return db.func.coalesce(getattr(cls, override), getattr(Volume, name))
+    
+    return hybrid_property(fget, fset, expr=expr)
+
+class Book(db.Model):
+    __tablename__ = 'books'
+    __table_args__ = (
+        db.Index('ix_books_user_id_google_books_id', 'user_id', 'google_books_id'),
+        # Shelves: newest first, and the read shelf by read date
+        db.Index('ix_books_user_status_created', 'user_id', 'status', 'created_at', 'id'),
+        db.Index('ix_books_user_status_read', 'user_id', 'status',
+                 db.text(f'coalesce(date_read, {NEVER_READ})'), 'created_at', 'id'),
+        # Stats by read year
+        db.Index('ix_books_user_date_read', 'user_id', 'date_read'),
+        # Copies of a volume (catalog refreshes and search index triggers)
+        db.Index('ix_books_google_books_id', 'google_books_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    title = db.Column(db.String, nullable=False)
+    authors = db.Column(db.String, nullable=False)
+    status = db.Column(db.String, nullable=False, default='to_read')
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    date_read = db.Column(db.DateTime, nullable=True)
+    google_books_id = db.Column(db.String, db.ForeignKey('volumes.google_books_id'))
+    
+    # Per-user overrides of the catalog; NULL means use the volume's value
+    isbn_override = db.Column('isbn', db.String)
+    isbn13_override = db.Column('isbn13', db.String)
+    published_date_override = db.Column('published_date', db.String)
+    etag_override = db.Column('etag', db.String)
+    self_link_override = db.Column('self_link', db.String)
+    publisher_override = db.Column('publisher', db.String)
+    description_override = db.Column('description', db.Text)
+    page_count_override = db.Column('page_count', db.Integer)
+    print_type_override = db.Column('print_type', db.String)
+    categories_override = db.Column('categories', db.String)
+    maturity_rating_override = db.Column('maturity_rating', db.String)
+    language_override = db.Column('language', db.String)
+    preview_link_override = db.Column('preview_link', db.String)
+    info_link_override = db.Column('info_link', db.String)
+    canonical_volume_link_override = db.Column('canonical_volume_link', db.String)
+    small_thumbnail_override = db.Column('small_thumbnail', db.String)
+    thumbnail_override = db.Column('thumbnail', db.String)
+    content_version_override = db.Column('content_version', db.String)
+    is_ebook_override = db.Column('is_ebook', db.Boolean)
+    
+    isbn = catalog_field('isbn')
+    isbn13 = catalog_field('isbn13')
+    published_date = catalog_field('published_date')
+    etag = catalog_field('etag')
+    self_link = catalog_field('self_link')
+    publisher = catalog_field('publisher')
+    description = catalog_field('description')
+    page_count = catalog_field('page_count')
+    print_type = catalog_field('print_type')
+    categories = catalog_field('categories')
+    maturity_rating = catalog_field('maturity_rating')
+    language = catalog_field('language')
+    preview_link = catalog_field('preview_link')
+    info_link = catalog_field('info_link')
+    canonical_volume_link = catalog_field('canonical_volume_link')
+    small_thumbnail = catalog_field('small_thumbnail')
+    thumbnail = catalog_field('thumbnail')
+    content_version = catalog_field('content_version')
+    is_ebook = catalog_field('is_ebook')
+    
+    user = db.relationship('User', back_populates='books')
+    volume = db.relationship('Volume', lazy='joined')
+    category_list = db.relationship('Category', secondary=book_categories)
+    # The ON DELETE CASCADE on book_authors removes a deleted book's links
+    author_links = db.relationship('BookAuthor', order_by='BookAuthor.position',
+                                   cascade='all, delete-orphan', passive_deletes=True)
+    
+    # Read date for ordering the read shelf; see NEVER_READ
+    read_order = db.column_property(
+        db.func.coalesce(date_read, db.literal_column(NEVER_READ, db.DateTime)), deferred=True)
+    
+    # Start of the description, loaded only by for_list(excerpt=...)
+    excerpt = db.query_expression()
+    
+    def __repr__(self):
+        return f"<Book(title='{self.title}', authors='{self.authors}', status='{self.status}')>"
+    
+    @classmethod
+    def with_volume(cls, query=None):
+        """Join the catalog so overridable columns can be filtered and sorted"""
+        query = cls.query if query is None else query
+        return query.outerjoin(cls.volume).options(db.contains_eager(cls.volume))
+    
+    @classmethod
+    def for_list(cls, query=None, excerpt=None):
+        """Like ``with_volume``, but loads only the columns list pages render.
+        
+        The description and link columns stay in the database; with
+        ``excerpt``, ``Book.excerpt`` holds that many characters of the
+        description instead.
+        """
+        query = cls.query if query is None else query
+        overrides = [getattr(cls, f'{field}_override') for field in LIST_FIELDS]
+        query = query.outerjoin(cls.volume).options(
+            db.load_only(cls.id, cls.user_id, cls.title, cls.authors, cls.status,
+                         cls.created_at, cls.date_read, cls.google_books_id, *overrides),
+            db.contains_eager(cls.volume).load_only(*(getattr(Volume, field) for field in LIST_FIELDS))
+        )
+        if excerpt:
+            query = query.options(db.with_expression(cls.excerpt, db.func.substr(cls.description, 1, excerpt)))
+        return query
+    
+    def clear_overrides(self):
+        """Drop per-user copies of catalog data so the volume's values show"""
+        for field in CATALOG_FIELDS:
+            setattr(self, f'{field}_override', None)
+    
+    def sync_categories(self):
+        """Point the category links at the book's current categories string"""
+        names = split_categories(self.categories)
+        if [category.name for category in self.category_list] != names:
+            self.category_list = Category.get_or_create(names)
+    
+    @property
+    def author_list(self):
+        return [link.author for link in self.author_links]
+    
+    def sync_authors(self, names=None):
+        """Point the author links at ``names`` (Google's list), else at the
+        book's authors string split on commas"""
+        names = distinct_authors(names) if names else split_authors(self.authors)
+        if [author.name for author in self.author_list] == names:
+            return
+        links = {link.author.name: link for link in self.author_links}
+        for position, author in enumerate(Author.get_or_create(names)):
+            # Keep existing links so the same (book, author) row isn't deleted and re-added
+            link = links.pop(author.name, None) or BookAuthor(author=author)
+            link.position = position
+            links[author.name] = link
+        self.author_links = sorted((links[name] for name in names), key=lambda link: link.position)
+    
+    def update_from_google_books(self, item):
+        """Update the shared volume from Google Books API and link this book to it"""
+        volume = self.volume
+        if volume is None or volume.google_books_id != item.get('id'):
+            volume = db.session.get(Volume, item.get('id'))
+            if volume is None:
+                volume = Volume()
+                db.session.add(volume)
+        volume.update_from_google_books(item)
+        self.apply_volume(volume, item)
+    
+    def apply_volume(self, volume, item):
+        """Link this copy to a volume just updated from Google's ``item``"""
+        self.volume = volume
+        self.google_books_id = volume.google_books_id
+        self.clear_overrides()
+        
+        if not self.title:
+            self.title = volume.title
+        if not self.authors and volume.authors:
+            self.authors = volume.authors
+        self.sync_categories()
+        # Google's list keeps names like "Tolkien, J. R. R." whole
+        google_authors = item.get('volumeInfo', {}).get('authors')
+        self.sync_authors(google_authors if google_authors and self.authors == volume.authors else None)
+
+@event.listens_for(Session, 'before_flush')
+def sync_book_links(session, flush_context, instances):
+    """Link new books, and books whose categories or authors changed, to them"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Book) or obj in session.deleted:
+            continue
+        state = db.inspect(obj)
+        if state.pending or state.attrs.categories_override.history.has_changes() \
+                or state.attrs.google_books_id.history.has_changes():
+            obj.sync_categories()
+        # Links already made from Google's list stand while the string matches it
+        if (state.pending or state.attrs.authors.history.has_changes()) \
+                and ', '.join(author.name for author in obj.author_list) != obj.authors:
+            obj.sync_authors()
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -99,8 +400,11 @@ class User(UserMixin, db.Model):
     last_seen = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     reset_token = db.Column(db.String(100), unique=True)
     reset_token_expiry = db.Column(db.DateTime)
+    # Bumped whenever the user's books change; see utils.library_version
+    library_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
-    books = db.relationship('Book', back_populates='user', cascade='all, delete-orphan')
+    books = db.relationship('Book', back_populates='user', cascade='all, delete-orphan',
+                            order_by='Book.created_at, Book.id')
     
     def __repr__(self):
         return f'<User {self.username}>'
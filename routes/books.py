@@ -1,11 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from datetime import datetime
-import re
-from googleapiclient.discovery import build
 import os
 from flask_login import login_required, current_user
-from models import Book, db
+from models import CATALOG_FIELDS, Author, Book, BookAuthor, Category, Volume, book_categories, db
 from extensions import limiter
+from utils import autocomplete, google_books, isbn
+from utils.conditional import conditional, request_params
+from utils.pagination import keyset_page
+from utils.text import strip_html_tags
+from utils.volumes import (catalog_result, normalize_author, normalize_category, normalize_volume,
+                           split_categories)
 
 # Initialize blueprint
 bp = Blueprint('books', __name__, url_prefix='/books')
@@ -13,33 +17,40 @@ bp = Blueprint('books', __name__, url_prefix='/books')
 # Get API key from environment
 GOOGLE_BOOKS_API_KEY = os.getenv('GOOGLE_BOOKS_API_KEY')
 
-def strip_html_tags(text):
-    """Remove HTML tags and decode HTML entities from a string"""
-    if not text:
-        return ''
-    
-    # First pass: remove bold tags specifically (replace with their content)
-    text = re.sub(r'<b>(.*?)</b>', r'\1', text)
-    text = re.sub(r'<strong>(.*?)</strong>', r'\1', text)
-    
-    # Second pass: remove remaining HTML tags
-    clean = re.compile('<.*?>')
-    text = re.sub(clean, ' ', text)
-    
-    # Replace common HTML entities
-    text = text.replace('&nbsp;', ' ')\
-               .replace('&amp;', '&')\
-               .replace('&lt;', '<')\
-               .replace('&gt;', '>')\
-               .replace('&quot;', '"')\
-               .replace('&#39;', "'")\
-               .replace('&ndash;', '–')\
-               .replace('&mdash;', '—')
-    
-    # Clean up extra whitespace
-    text = ' '.join(text.split())
+def _comparable(field, value):
+    """A catalog value in the form the add form shows it"""
+    if field == 'is_ebook':
+        return bool(value)
+    if value is None or isinstance(value, int):
+        return value
+    if field == 'categories':
+        return split_categories(value)
+    value = ' '.join(str(value).split())
+    if field in ('thumbnail', 'small_thumbnail'):
+        value = value.replace('http:', 'https:')
+    return value or None
+
+def form_overrides(form, volume):
+    """Catalog fields where the add form differs from Google's data.
     
-    return text.strip()
+    The form echoes what the search or detail page showed. A value that
+    differs came from a stale page or from the client, so it is only ever
+    kept as the user's own override, never written to the shared catalog.
+    """
+    overrides = {}
+    for field in CATALOG_FIELDS:
+        value = form.get(field, '').strip()
+        if not value:
+            continue
+        if field == 'page_count':
+            value = form.get(field, type=int)
+        elif field == 'is_ebook':
+            value = value.lower() == 'true'
+        elif field == 'description':
+            value = strip_html_tags(value)
+        if value is not None and _comparable(field, value) != _comparable(field, getattr(volume, field)):
+            overrides[field] = value
+    return overrides
 
 @bp.route('/search', methods=['GET', 'POST'])
 @limiter.limit("30 per minute")
@@ -63,67 +74,49 @@ def search():
                              min=min)
     
     try:
-        if not GOOGLE_BOOKS_API_KEY:
-            flash('API key not found', 'error')
-            return render_template('books/search.html', 
-                                 results_per_page=results_per_page,
-                                 max=max,
-                                 min=min)
-        
-        # Get existing books from database for comparison
-        existing_books = {book.google_books_id: book.status 
-                         for book in Book.query.filter_by(user_id=current_user.id).all()}
-        
-        # Clean up the query if it's a subject search
-        if query.startswith('subject:'):
-            category = query.replace('subject:', '').strip('"\'')
-            query = f'subject:"{category}"'
-        
-        service = build('books', 'v1', developerKey=GOOGLE_BOOKS_API_KEY)
-        result = service.volumes().list(
-            q=query,
-            startIndex=((page - 1) * results_per_page),
-            maxResults=results_per_page,
-            orderBy='relevance'
-        ).execute()
-        
-        total_items = result.get('totalItems', 0)
-        total_pages = (total_items + results_per_page - 1) // results_per_page
+        # Scanned or typed ISBNs are answered from the catalog when we have the volume
+        isbn13 = isbn.parse_query(query)
+        volume = Volume.query.filter_by(normalized_isbn=isbn13).first() if isbn13 else None
+        if volume is not None:
+            books = [catalog_result(volume)]
+            total_items = total_pages = 1
+        else:
+            if not GOOGLE_BOOKS_API_KEY:
+                flash('API key not found', 'error')
+                return render_template('books/search.html', 
+                                     results_per_page=results_per_page,
+                                     max=max,
+                                     min=min)
+            
+            # Clean up the query if it's a subject search
+            if query.startswith('subject:'):
+                category = query.replace('subject:', '').strip('"\'')
+                query = f'subject:"{category}"'
+            
+            result = google_books.search_volumes(
+                f'isbn:{isbn13}' if isbn13 else query,
+                start_index=(page - 1) * results_per_page,
+                max_results=results_per_page
+            )
+            
+            if result.get('stale'):
+                flash('Google Books is not responding, so these results may be out of date.', 'warning')
+            
+            total_items = result.get('totalItems', 0)
+            total_pages = (total_items + results_per_page - 1) // results_per_page
+            books = [normalize_volume(item) for item in result.get('items', [])]
+            for book in books:
+                autocomplete.index.add_volume(book['title'], book['authors'], recent=True)
         
-        books = []
-        if 'items' in result:
-            for item in result['items']:
-                volume_info = item.get('volumeInfo', {})
-                image_links = volume_info.get('imageLinks', {})
-                
-                book = {
-                    'id': item['id'],
-                    'title': volume_info.get('title', 'Unknown Title'),
-                    'authors': volume_info.get('authors', ['Unknown Author']),
-                    'published_date': volume_info.get('publishedDate', ''),
-                    'description': strip_html_tags(volume_info.get('description', '')),
-                    'page_count': volume_info.get('pageCount'),
-                    'categories': volume_info.get('categories', []),
-                    'language': volume_info.get('language'),
-                    'publisher': volume_info.get('publisher'),
-                    'thumbnail': image_links.get('thumbnail', ''),
-                    'small_thumbnail': image_links.get('smallThumbnail', ''),
-                    'isbn': next((i['identifier'] for i in volume_info.get('industryIdentifiers', []) 
-                                if i['type'] == 'ISBN_10'), ''),
-                    'isbn13': next((i['identifier'] for i in volume_info.get('industryIdentifiers', []) 
-                                  if i['type'] == 'ISBN_13'), ''),
-                    'etag': item.get('etag', ''),
-                    'self_link': item.get('selfLink', ''),
-                    'print_type': volume_info.get('printType', ''),
-                    'maturity_rating': volume_info.get('maturityRating', ''),
-                    'preview_link': volume_info.get('previewLink', ''),
-                    'info_link': volume_info.get('infoLink', ''),
-                    'canonical_volume_link': volume_info.get('canonicalVolumeLink', ''),
-                    'content_version': volume_info.get('contentVersion', ''),
-                    'is_ebook': item.get('saleInfo', {}).get('isEbook', False),
-                    'existing_status': existing_books.get(item['id'])
-                }
-                books.append(book)
+        # Look up only the result page's volumes in the user's library
+        page_ids = [book['id'] for book in books]
+        existing_books = dict(
+            db.session.query(Book.google_books_id, Book.status)
+            .filter(Book.user_id == current_user.id, Book.google_books_id.in_(page_ids))
+            .all()
+        ) if page_ids else {}
+        for book in books:
+            book['existing_status'] = existing_books.get(book['id'])
         
         return render_template('books/search.html', 
                              results=books, 
@@ -136,12 +129,22 @@ def search():
                              min=min)
     except Exception as e:
         print(f"Error occurred: {str(e)}")
-        flash(f'Error searching books: {str(e)}')
+        flash(f'Error searching books: {google_books.describe_error(e)}')
         return render_template('books/search.html', 
                              results_per_page=results_per_page,
                              max=max,
                              min=min)
 
+@bp.route('/autocomplete')
+@limiter.limit("120 per minute")
+@login_required
+def suggest():
+    """JSON suggestions for the search box from titles and authors seen locally"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    suggestions = autocomplete.suggest(query, limit) if len(query) >= 2 else []
+    return jsonify({'query': query, 'suggestions': suggestions})
+
 @bp.route('/add', methods=['POST'])
 @login_required
 def add():
@@ -162,35 +165,35 @@ def add():
             flash('Book already exists in your library', 'warning')
             return redirect(url_for('main.index'))
         
+        # The shared catalog entry is only ever written from Google's own data,
+        # fetched here the first time anyone adds the volume
+        volume = db.session.get(Volume, google_books_id) if google_books_id else None
+        if volume is None:
+            try:
+                # Someone is waiting on this request, so it spends detail quota
+                result = google_books.get_volume(google_books_id, call='refresh', priority='detail')
+            except Exception as e:
+                flash(f'Error adding book: {google_books.describe_error(e)}', 'error')
+                return redirect(url_for('main.index'))
+            # Google may answer with the id the volume was merged into
+            volume = db.session.get(Volume, result.get('id')) or Volume()
+            volume.update_from_google_books(result)
+            db.session.add(volume)
+        
         new_book = Book(
-            google_books_id=google_books_id,
-            title=request.form.get('title'),
-            authors=request.form.get('authors'),
+            volume=volume,
+            title=request.form.get('title') or volume.title,
+            authors=request.form.get('authors') or volume.authors,
             status=request.form.get('status', 'to_read'),
-            published_date=request.form.get('published_date'),
-            description=request.form.get('description'),
-            page_count=request.form.get('page_count'),
-            categories=request.form.get('categories'),
-            language=request.form.get('language'),
-            publisher=request.form.get('publisher'),
-            isbn=request.form.get('isbn'),
-            isbn13=request.form.get('isbn13'),
-            thumbnail=request.form.get('thumbnail'),
-            small_thumbnail=request.form.get('small_thumbnail'),
-            etag=request.form.get('etag'),
-            self_link=request.form.get('self_link'),
-            print_type=request.form.get('print_type'),
-            maturity_rating=request.form.get('maturity_rating'),
-            preview_link=request.form.get('preview_link'),
-            info_link=request.form.get('info_link'),
-            canonical_volume_link=request.form.get('canonical_volume_link'),
-            content_version=request.form.get('content_version'),
-            is_ebook=request.form.get('is_ebook') == 'true',
             user_id=current_user.id
         )
+        for field, value in form_overrides(request.form, volume).items():
+            setattr(new_book, f'{field}_override', value)
+        new_book.sync_authors(request.form.getlist('author'))
             
         db.session.add(new_book)
         db.session.commit()
+        autocomplete.index.add_volume(volume.title, volume.authors)
         flash('Book added successfully!', 'success')
         
     except Exception as e:
@@ -227,6 +230,9 @@ def update_status(book_id):
     return redirect(request.referrer or url_for('main.index'))
 
 @bp.route('/book/<book_id>')
+# Only books in the database; Google Books pages follow the catalog, not the library
+@conditional('detail', lambda book_id: dict(request_params(book_id=book_id), back=request.referrer)
+             if book_id.isdigit() else None)
 def detail(book_id):  # renamed from book_detail for blueprint consistency
     """Display details for a specific book from DB or Google Books"""
     try:
@@ -236,33 +242,17 @@ def detail(book_id):  # renamed from book_detail for blueprint consistency
         # If not in DB, check if it's a Google Books ID
         if not book:
             try:
-                service = build('books', 'v1', developerKey=GOOGLE_BOOKS_API_KEY)
-                result = service.volumes().get(volumeId=book_id).execute()
+                result = google_books.get_volume(book_id)
                 
                 # Create a book-like object from Google Books data
-                volume_info = result.get('volumeInfo', {})
-                image_links = volume_info.get('imageLinks', {})
+                book = normalize_volume(result)
+                book['author_names'] = book['authors']
+                book['authors'] = ', '.join(book['authors'])
+                book['categories'] = ', '.join(book['categories'])
+                book['is_google_books'] = True  # Flag to indicate this is from Google Books
                 
-                book = {
-                    'id': result['id'],
-                    'title': volume_info.get('title', 'Unknown Title'),
-                    'authors': ', '.join(volume_info.get('authors', ['Unknown Author'])),
-                    'published_date': volume_info.get('publishedDate', ''),
-                    'description': strip_html_tags(volume_info.get('description', '')),
-                    'page_count': volume_info.get('pageCount'),
-                    'categories': ', '.join(volume_info.get('categories', [])),
-                    'language': volume_info.get('language'),
-                    'publisher': volume_info.get('publisher'),
-                    'thumbnail': image_links.get('thumbnail', ''),
-                    'small_thumbnail': image_links.get('smallThumbnail', ''),
-                    'isbn': next((i['identifier'] for i in volume_info.get('industryIdentifiers', []) 
-                                if i['type'] == 'ISBN_10'), ''),
-                    'isbn13': next((i['identifier'] for i in volume_info.get('industryIdentifiers', []) 
-                                  if i['type'] == 'ISBN_13'), ''),
-                    'preview_link': volume_info.get('previewLink', ''),
-                    'info_link': volume_info.get('infoLink', ''),
-                    'is_google_books': True  # Flag to indicate this is from Google Books
-                }
+                if result.get('stale'):
+                    flash('Google Books is not responding, so these details may be out of date.', 'warning')
                 
                 return render_template('books/detail.html', 
                                     book=book,
@@ -270,7 +260,10 @@ def detail(book_id):  # renamed from book_detail for blueprint consistency
                                     back_url=request.referrer or url_for('main.index'))
                                     
             except Exception as e:
-                flash('Book not found', 'error')
+                if google_books.is_upstream_failure(e):
+                    flash(google_books.describe_error(e), 'error')
+                else:
+                    flash('Book not found', 'error')
                 return redirect(url_for('main.index'))
         
         # Get the referrer but exclude the edit page
@@ -309,43 +302,22 @@ def edit(book_id):
             if should_refresh:
                 google_id = request.form.get('google_books_id') or book.google_books_id
                 try:
-                    service = build('books', 'v1', developerKey=GOOGLE_BOOKS_API_KEY)
-                    result = service.volumes().get(volumeId=google_id).execute()
-                    
-                    # Extract volume info and create preview data
-                    volume_info = result.get('volumeInfo', {})
-                    image_links = volume_info.get('imageLinks', {})
+                    etag = book.etag if google_id == book.google_books_id else None
+                    # Someone is waiting on this page, so it spends detail quota
+                    result = google_books.get_volume(google_id, etag=etag, call='refresh',
+                                                     priority='detail')
+                    if result.get('stale'):
+                        flash('Google Books is not responding, so this data may be out of date.', 'warning')
                     
-                    preview_data = {
-                        'title': volume_info.get('title'),
-                        'authors': volume_info.get('authors', []),
-                        'published_date': volume_info.get('publishedDate'),
-                        'description': strip_html_tags(volume_info.get('description', '')),
-                        'page_count': volume_info.get('pageCount'),
-                        'categories': volume_info.get('categories', []),
-                        'language': volume_info.get('language'),
-                        'publisher': volume_info.get('publisher'),
-                        'thumbnail': image_links.get('thumbnail'),
-                        'small_thumbnail': image_links.get('smallThumbnail'),
-                        'isbn': next((i['identifier'] for i in volume_info.get('industryIdentifiers', []) 
-                                    if i['type'] == 'ISBN_10'), ''),
-                        'isbn13': next((i['identifier'] for i in volume_info.get('industryIdentifiers', []) 
-                                      if i['type'] == 'ISBN_13'), ''),
-                        'preview_link': volume_info.get('previewLink', ''),
-                        'info_link': volume_info.get('infoLink', ''),
-                        'canonical_volume_link': volume_info.get('canonicalVolumeLink', ''),
-                        'maturity_rating': volume_info.get('maturityRating', ''),
-                        'print_type': volume_info.get('printType', ''),
-                        'etag': result.get('etag'),
-                        'self_link': result.get('selfLink'),
-                        'content_version': result.get('volumeInfo', {}).get('contentVersion', ''),
-                        'is_ebook': result.get('saleInfo', {}).get('isEbook', False)
-                    }
+                    preview_data = normalize_volume(result, placeholders=False)
                     
                     return render_template('books/edit.html', book=book, preview_data=preview_data)
                     
+                except google_books.VolumeNotModified:
+                    flash('Book data is already up to date with Google Books', 'info')
+                    return render_template('books/edit.html', book=book)
                 except Exception as e:
-                    flash(f'Error refreshing book data: {str(e)}', 'error')
+                    flash(f'Error refreshing book data: {google_books.describe_error(e)}', 'error')
 
             # Handle manual field updates
             else:
@@ -382,23 +354,50 @@ def edit(book_id):
         return redirect(url_for('main.index'))
 
 @bp.route('/category/<path:category>')
+@login_required
 def category(category):  # renamed from category_view for blueprint consistency
-    """View books in a specific category. Using path:category to handle slashes"""
+    """View the user's books in a category. Using path:category to handle slashes"""
     try:
-        # Normalize the category string for database search
-        search_category = category.replace(' / ', '/').strip()
+        name = normalize_category(category)
         
-        # Get all books in this category, ordered by read date
-        books = Book.query\
-            .filter(Book.categories.ilike(f'%{search_category}%'))\
-            .filter(Book.status == 'read')\
-            .order_by(Book.date_read.desc())\
-            .all()
+        # Most recently read first, through the category's book links
+        query = Book.for_list()\
+            .join(book_categories, book_categories.c.book_id == Book.id)\
+            .join(Category, Category.id == book_categories.c.category_id)\
+            .filter(Category.name == name)\
+            .filter(Book.user_id == current_user.id)
+        page = keyset_page(query, [Book.read_order, Book.created_at, Book.id],
+                           request.args.get('after'), current_app.config.get('SHELF_PAGE_SIZE', 50))
             
         return render_template('books/category.html',
-                             category=category,
-                             books=books)
+                             category=name,
+                             books=page.items,
+                             next_cursor=page.next_cursor)
     except Exception as e:
         print(f"Error occurred: {str(e)}")
         flash(f'Error displaying category: {str(e)}')
         return redirect(url_for('main.index'))
+
+@bp.route('/author/<path:name>')
+@login_required
+def author(name):
+    """View the user's books by one author, through the author's book links"""
+    try:
+        name = normalize_author(name)
+        
+        query = Book.for_list()\
+            .join(BookAuthor, BookAuthor.book_id == Book.id)\
+            .join(Author, Author.id == BookAuthor.author_id)\
+            .filter(Author.name == name)\
+            .filter(Book.user_id == current_user.id)
+        page = keyset_page(query, [Book.read_order, Book.created_at, Book.id],
+                           request.args.get('after'), current_app.config.get('SHELF_PAGE_SIZE', 50))
+        
+        return render_template('books/author.html',
+                             author=name,
+                             books=page.items,
+                             next_cursor=page.next_cursor)
+    except Exception as e:
+        print(f"Error occurred: {str(e)}")
+        flash(f'Error displaying author: {str(e)}')
+        return redirect(url_for('main.index'))
@@ -0,0 +1,79 @@
+import re
+from flask import Blueprint, abort, redirect, request, send_file, url_for
+from models import Volume, db
+from extensions import limiter
+from utils import covers
+from utils.singleflight import SingleFlight
+
+bp = Blueprint('covers', __name__)
+
+VOLUME_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,40}$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+fetches = SingleFlight()
+
+def cover_source(volume, size):
+    """Where to fetch a cover from: the catalog's link, else Google's content URL"""
+    url = (volume.small_thumbnail if size == 'small' else None) or volume.thumbnail
+    return covers.source_url(volume.google_books_id, url)
+
+def load_cover(key, source, size):
+    data, content_type = covers.fetch_image(source)
+    data, content_type = covers.resize(data, content_type, covers.SIZES[size])
+    return covers.cache.put(key, data, content_type)
+
+@bp.route('/covers/<volume_id>/<size>')
+@limiter.limit("600 per minute")
+def cover(volume_id, size):
+    """Serve a cached, resized cover image"""
+    if size not in covers.SIZES or not VOLUME_ID_RE.match(volume_id):
+        abort(404)
+
+    # The version changes with the volume's etag, so a new cover gets a new URL
+    version = request.args.get('v', '')
+    key = f'{volume_id}/{size}/{version}'
+    # Keys are only stored for catalog volumes at their current version
+    entry = covers.cache.get(key)
+    if entry is None:
+        volume = db.session.get(Volume, volume_id)
+        if volume is None:
+            abort(404)
+        current = covers.cover_version(volume.etag)
+        if version != current:
+            return redirect(url_for('covers.cover', volume_id=volume_id, size=size, v=current or None))
+        source = cover_source(volume, size)
+        if source is None:
+            abort(404)
+        try:
+            entry = fetches.do(key, lambda: load_cover(key, source, size))
+        except Exception as e:
+            print(f"Cover fetch failed for {volume_id}: {str(e)}")
+            # Let the browser try Google directly rather than show a broken image
+            return redirect(source)
+
+    content_hash, content_type, path = entry
+    response = send_file(path, mimetype=content_type, etag=content_hash, conditional=True,
+                         max_age=IMMUTABLE_MAX_AGE if version else DEFAULT_MAX_AGE)
+    response.cache_control.public = True
+    if version:
+        response.cache_control.immutable = True
+    return response
+
+@bp.app_template_global()
+def cover_url(book, size='thumb'):
+    """Cover URL for a Book or a search/detail result dict.
+    
+    A book's cover goes through the proxy unless the user set their own
+    thumbnail. Search and detail results may not be in the catalog, which
+    the proxy only serves, so they link to Google directly.
+    """
+    if isinstance(book, dict):
+        thumbnail = book.get('thumbnail')
+        return thumbnail.replace('http:', 'https:', 1) if thumbnail else None
+    if not book.thumbnail:
+        return None
+    if book.thumbnail_override or book.volume is None:
+        return book.thumbnail.replace('http:', 'https:', 1)
+    version = covers.cover_version(book.volume.etag)
+    return url_for('covers.cover', volume_id=book.google_books_id, size=size, v=version or None)
@@ -1,20 +1,49 @@
 from flask import Blueprint, render_template
-from models import Book
+from models import Book, db
 from flask_login import current_user
+from utils import fragments
+from utils.conditional import conditional
 
 bp = Blueprint('main', __name__)
 
+# Newest books shown for each shelf on the home page
+HOME_SHELF_BOOKS = {'reading': 5, 'to_read': 5}
+
+def render_library():
+    """The signed-in home page's shelves and counts"""
+    # Number the user's books newest first within each shelf, and load only
+    # the first few of each, in one query (ix_books_user_status_created)
+    position = db.func.row_number().over(
+        partition_by=Book.status,
+        order_by=(Book.created_at.desc(), Book.id.desc())
+    ).label('position')
+    ranked = db.select(Book.id, Book.status, position)\
+        .where(Book.user_id == current_user.id, Book.status.in_(HOME_SHELF_BOOKS))\
+        .subquery()
+    books = Book.for_list()\
+        .join(ranked, ranked.c.id == Book.id)\
+        .filter(ranked.c.position <= db.case(HOME_SHELF_BOOKS, value=ranked.c.status))\
+        .order_by(ranked.c.position)\
+        .all()
+    shelves = {status: [] for status in HOME_SHELF_BOOKS}
+    for book in books:
+        shelves[book.status].append(book)
+    
+    # Exact shelf sizes for the overview badges
+    counts = dict(db.session.query(Book.status, db.func.count())
+                  .filter(Book.user_id == current_user.id)
+                  .group_by(Book.status))
+    
+    return fragments.render('main/_library.html',
+                            to_read=shelves['to_read'],
+                            reading=shelves['reading'],
+                            counts=counts)
+
 @bp.route('/')
+@conditional('home')
 def index():
     if not current_user.is_authenticated:
         return render_template('landing.html')
-        
-    # Get user's books for different shelves
-    to_read = Book.query.filter_by(user_id=current_user.id, status='to_read').all()
-    reading = Book.query.filter_by(user_id=current_user.id, status='reading').all()
-    read = Book.query.filter_by(user_id=current_user.id, status='read').all()
     
-    return render_template('main/home.html',
-                         to_read=to_read,
-                         reading=reading,
-                         read=read)
\ No newline at end of file
+    library = fragments.cached(current_user.id, 'home', {}, render_library)
+    return render_template('main/home.html', library=fragments.markup(library))
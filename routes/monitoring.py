@@ -75,10 +75,14 @@ def rate_limits_dashboard():
         today_hits = {}
         hourly_stats = {}
     
+    from utils.google_books import cache_stats, call_stats, breaker
     return render_template('monitoring/rate_limits.html',
                          current_limits=current_limits,
                          today_hits=today_hits,
-                         hourly_stats=hourly_stats)
+                         hourly_stats=hourly_stats,
+                         cache_stats=cache_stats(),
+                         call_stats=call_stats.snapshot(),
+                         breaker_stats=breaker.stats())
 
 @bp.route('/api/rate-limits')
 @login_required
@@ -123,4 +127,36 @@ def rate_limits_api():
             'hourly_stats': {}
         } for endpoint in endpoints}
     
-    return jsonify(metrics) 
\ No newline at end of file
+    return jsonify(metrics) 
+
+@bp.route('/api/cache')
+@login_required
+@admin_required
+def cache_api():
+    """API endpoint for Google Books cache hit/miss counters (this worker)"""
+    from utils.google_books import cache_stats
+    return jsonify(cache_stats())
+
+@bp.route('/api/books-breaker')
+@login_required
+@admin_required
+def books_breaker_api():
+    """API endpoint for the Google Books circuit breaker state (this worker)"""
+    from utils.google_books import breaker
+    return jsonify(breaker.stats())
+
+@bp.route('/api/books-quota')
+@login_required
+@admin_required
+def books_quota_api():
+    """API endpoint for the shared Google Books quota bucket"""
+    from utils.google_books import quota
+    return jsonify(quota.stats())
+
+@bp.route('/api/books-calls')
+@login_required
+@admin_required
+def books_calls_api():
+    """API endpoint for Google Books response size and parse time (this worker)"""
+    from utils.google_books import call_stats
+    return jsonify(call_stats.snapshot())
@@ -1,11 +1,64 @@
 from flask import Blueprint, render_template, request, current_app
-from models import Book, db
+from models import Book
 from flask_login import current_user
-from sqlalchemy import text, or_, desc
+from utils import fragments, search
+from utils.conditional import conditional, request_params, untagged
+from utils.pagination import keyset_page
 
 bp = Blueprint('shelf', __name__)
 
+# Description characters shown per book
+EXCERPT_LENGTH = 500
+
+def search_shelf(shelf, search_query, cursor, per_page, more=False):
+    """One page of a shelf as rendered HTML, with the match count and a
+    suggestion on the first page of a search"""
+    # Base query, joined to the shared catalog for the overridable columns
+    # (only the columns the list shows, plus one character to tell if the
+    # description was cut)
+    query = Book.for_list(excerpt=EXCERPT_LENGTH + 1).filter(
+        Book.status == shelf,
+        Book.user_id == current_user.id
+    )
+    
+    # Newest first; on the read shelf by date read, books without one last
+    if shelf == 'read':
+        key = [Book.read_order, Book.created_at, Book.id]
+    else:
+        key = [Book.created_at, Book.id]
+    
+    # Apply search if provided; ranked backends order by relevance. Fuzzy
+    # search also matches titles and authors with typos or partial words
+    backend = search.get_backend()
+    fuzzy = current_app.config.get('SHELF_FUZZY_SEARCH', True)
+    shelf_query = query
+    if search_query:
+        query, rank = backend.apply(query, search_query, user_id=current_user.id, fuzzy=fuzzy)
+        if rank is not None:
+            key = [rank, Book.id]
+    
+    # The match count and suggestion are only needed for the first render
+    count = suggestion = None
+    if search_query and not more:
+        count = query.order_by(None).count()
+        # Offer the closest title or author when no word matched exactly
+        exact = backend.apply(shelf_query, search_query, user_id=current_user.id)[0] if fuzzy else query
+        if exact.with_entities(Book.id).first() is None:
+            suggestion = backend.suggest(current_user.id, search_query)
+            if suggestion and suggestion.casefold() == search_query.casefold():
+                suggestion = None
+    
+    page = keyset_page(query, key, cursor, per_page)
+    books = fragments.render('shelf/_books.html',
+                             books=page.items,
+                             next_cursor=page.next_cursor,
+                             current_shelf=shelf,
+                             search_query=search_query)
+    return {'books': books, 'count': count, 'suggestion': suggestion}
+
 @bp.route('/shelf/<shelf>')
+@conditional('shelf', lambda shelf: dict(
+    request_params(shelf=shelf), more=request.headers.get('X-Requested-With') == 'XMLHttpRequest'))
 def view(shelf):
     """Display books on a specific shelf"""
     titles = {
@@ -17,66 +70,28 @@ def view(shelf):
     try:
         # Get search query
         search_query = request.args.get('search', '').strip()
+        cursor = request.args.get('after')
+        per_page = current_app.config.get('SHELF_PAGE_SIZE', 50)
         
-        # Base query
-        query = Book.query.filter(
-            Book.status == shelf,
-            Book.user_id == current_user.id
-        )
-        
-        # Apply search if provided
-        if search_query:
-            # Check if we're using PostgreSQL or SQLite
-            is_postgres = 'postgresql' in current_app.config['SQLALCHEMY_DATABASE_URI']
-            
-            if is_postgres:
-                # Use PostgreSQL's full-text search with existing search_vector
-                search_query_sql = text("plainto_tsquery('books_fts_config', :search_terms)")
-                
-                # Add the rank as a column to the query
-                rank_sql = text("ts_rank(search_vector, plainto_tsquery('books_fts_config', :search_terms)) as search_rank")
-                query = query.add_columns(rank_sql)
-                
-                # Add the search filter
-                query = query.filter(
-                    text("search_vector @@ plainto_tsquery('books_fts_config', :search_terms)")
-                ).params(search_terms=search_query)
-                
-                # Order by the rank column
-                query = query.order_by(text("search_rank DESC"))
-                
-                # Execute query and extract just the Book objects
-                results = query.all()
-                books = [r[0] for r in results]
-            else:
-                # SQLite fallback for tests
-                query = query.filter(or_(
-                    Book.title.ilike(f'%{search_query}%'),
-                    Book.authors.ilike(f'%{search_query}%'),
-                    Book.description.ilike(f'%{search_query}%'),
-                    Book.categories.ilike(f'%{search_query}%')
-                ))
-                
-                # Execute query
-                books = query.all()
-        else:
-            # If no search, just get all books
-            if shelf == 'read':
-                query = query.order_by(
-                    Book.date_read.desc().nulls_last(),
-                    Book.created_at.desc()
-                )
-            else:
-                query = query.order_by(Book.created_at.desc())
-            
-            books = query.all()
+        # Books, match count and suggestion, cached until the library changes
+        params = {
+            'shelf': shelf, 'search': search_query, 'after': cursor, 'per_page': per_page,
+            'backend': search.get_backend().name,
+            'fuzzy': current_app.config.get('SHELF_FUZZY_SEARCH', True),
+            # Infinite scroll only needs the next page of books
+            'more': request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        }
+        results = fragments.cached(current_user.id, 'shelf', params,
+                                   lambda: search_shelf(shelf, search_query, cursor, per_page, params['more']))
+        if params['more']:
+            return fragments.markup(results['books'])
         
-        # Get the count for the search results message
-        count = len(books)
-        search_message = f'Found {count} books matching "{search_query}"' if search_query else None
+        search_message = f'Found {results["count"]} books matching "{search_query}"' if search_query else None
         
         return render_template('shelf/view.html',
-                             books=books,
+                             books=fragments.markup(results['books']),
+                             count=results['count'],
+                             suggestion=results['suggestion'],
                              title=titles.get(shelf, 'Books'),
                              current_shelf=shelf,
                              search_query=search_query,
@@ -84,9 +99,10 @@ def view(shelf):
                              
     except Exception as e:
         print(f"Search error: {str(e)}")
-        books = []
+        untagged()
         return render_template('shelf/view.html',
-                             books=books,
+                             books='',
+                             count=0,
                              title=titles.get(shelf, 'Books'),
                              current_shelf=shelf,
-                             error="An error occurred while searching")
\ No newline at end of file
+                             error="An error occurred while searching")
@@ -1,32 +1,36 @@
 from flask import Blueprint, render_template, request
 from sqlalchemy import func, extract
 from datetime import datetime
-from collections import Counter
-from models import Book, db
+from models import Author, Book, BookAuthor, Category, book_categories, db
 from flask_login import current_user, login_required
+from utils import fragments
+from utils.conditional import conditional, request_params
 
 bp = Blueprint('stats', __name__, url_prefix='/stats')
 
-@bp.route('/')
-@login_required
-def dashboard():
+def read_in_year(year):
+    """Filter on the year read as a range, so it can use the date_read index"""
+    return db.and_(Book.date_read >= datetime(year, 1, 1), Book.date_read < datetime(year + 1, 1, 1))
+
+def render_panels(selected_year, selected_author, current_year):
+    """The dashboard's panels for the current user, as fragment HTML"""
     try:
-        # Get selected year from query params
-        selected_year = request.args.get('year', type=int)
-        selected_author = request.args.get('author')
-        
         # Calculate overall stats
         total_books = db.session.query(Book).filter_by(user_id=current_user.id).count()
-        current_year = datetime.now().year
         books_this_year = db.session.query(Book)\
             .filter_by(user_id=current_user.id)\
-            .filter(Book.date_read.isnot(None))\
-            .filter(extract('year', Book.date_read) == current_year)\
+            .filter(read_in_year(current_year))\
             .count()
         
+        # Page counts, publishers and categories live in the shared volumes
+        # catalog, so those queries join it
+        library = db.session.query(Book).filter(Book.user_id == current_user.id)
+        
         # Calculate total pages
         total_pages = db.session.query(func.sum(Book.page_count))\
-            .filter_by(user_id=current_user.id)\
+            .select_from(Book)\
+            .outerjoin(Book.volume)\
+            .filter(Book.user_id == current_user.id)\
             .filter(Book.status == 'read')\
             .scalar() or 0
             
@@ -42,46 +46,51 @@ def dashboard():
          .order_by(year_column.desc())\
          .all()
         
-        # Get most read author with count
-        most_read_author = db.session.query(
-            Book.authors,
-            func.count().label('count')
-        ).filter_by(user_id=current_user.id)\
-         .filter(Book.authors.isnot(None))\
-         .group_by(Book.authors)\
-         .order_by(-func.count())\
-         .first()
+        # Get most read author with count; co-authored books count for each author
+        most_read_author = db.session.query(Author.name, func.count().label('count'))\
+            .select_from(Book)\
+            .join(BookAuthor, BookAuthor.book_id == Book.id)\
+            .join(Author, Author.id == BookAuthor.author_id)\
+            .filter(Book.user_id == current_user.id)\
+            .group_by(Author.id, Author.name)\
+            .order_by(func.count().desc(), Author.name)\
+            .first()
         
         # Get books for selected year or author
         books = None
         if selected_year:
-            books = db.session.query(Book)\
+            books = Book.for_list(library)\
                 .filter(Book.status == 'read')\
-                .filter(extract('year', Book.date_read) == selected_year)\
+                .filter(read_in_year(selected_year))\
                 .order_by(Book.date_read.desc())\
                 .all()
         elif selected_author:
-            books = db.session.query(Book)\
-                .filter(Book.authors == selected_author)\
+            books = Book.for_list(library)\
+                .join(BookAuthor, BookAuthor.book_id == Book.id)\
+                .join(Author, Author.id == BookAuthor.author_id)\
+                .filter(Author.name == selected_author)\
                 .order_by(Book.date_read.desc())\
                 .all()
 
-        # Get categories and their counts
-        categories = []
-        for book in db.session.query(Book).filter_by(user_id=current_user.id).all():
-            if book.categories:
-                cats = [c.strip() for c in book.categories.split(',')]
-                categories.extend(cats)
-        
-        category_counts = Counter(categories)
-        top_categories = category_counts.most_common(15)  # Get top 15 categories
+        # Get the top categories and their counts
+        top_categories = db.session.query(Category.name, func.count().label('count'))\
+            .select_from(Book)\
+            .join(book_categories, book_categories.c.book_id == Book.id)\
+            .join(Category, Category.id == book_categories.c.category_id)\
+            .filter(Book.user_id == current_user.id)\
+            .group_by(Category.id, Category.name)\
+            .order_by(func.count().desc(), Category.name)\
+            .limit(15)\
+            .all()
         max_category_count = max(count for _, count in top_categories) if top_categories else 1
         
         # Get most read publisher
         most_read_publisher = db.session.query(
             Book.publisher,
             func.count().label('count')
-        ).filter_by(user_id=current_user.id)\
+        ).select_from(Book)\
+         .outerjoin(Book.volume)\
+         .filter(Book.user_id == current_user.id)\
          .filter(Book.publisher.isnot(None))\
          .group_by(Book.publisher)\
          .order_by(-func.count())\
@@ -89,28 +98,28 @@ def dashboard():
         
         # Calculate average pages per book
         avg_pages = db.session.query(func.avg(Book.page_count))\
-            .filter_by(user_id=current_user.id)\
+            .select_from(Book)\
+            .outerjoin(Book.volume)\
+            .filter(Book.user_id == current_user.id)\
             .filter(Book.page_count.isnot(None))\
             .scalar() or 0
 
         # Get longest and shortest books
-        longest_book = db.session.query(Book)\
-            .filter_by(user_id=current_user.id)\
+        longest_book = Book.for_list(library)\
             .filter(Book.page_count.isnot(None))\
             .filter(Book.page_count > 0)\
             .filter(Book.status == 'read')\
             .order_by(Book.page_count.desc())\
             .first()
             
-        shortest_book = db.session.query(Book)\
-            .filter_by(user_id=current_user.id)\
+        shortest_book = Book.for_list(library)\
             .filter(Book.page_count.isnot(None))\
             .filter(Book.page_count > 0)\
             .filter(Book.status == 'read')\
             .order_by(Book.page_count.asc())\
             .first()
 
-        return render_template('stats/dashboard.html',
+        return fragments.render('stats/_panels.html',
                             selected_author=selected_author,
                             total_books=total_books,
                             books_this_year=books_this_year,
@@ -127,4 +136,18 @@ def dashboard():
                             longest_book=longest_book,
                             shortest_book=shortest_book,)
     finally:
-        pass
\ No newline at end of file
+        pass
+
+@bp.route('/')
+@login_required
+@conditional('stats', lambda: dict(request_params(), current_year=datetime.now().year))
+def dashboard():
+    # Get selected year from query params
+    selected_year = request.args.get('year', type=int)
+    selected_author = request.args.get('author')
+    # "This year" moves on at New Year without the library changing
+    current_year = datetime.now().year
+    params = {'year': selected_year, 'author': selected_author, 'current_year': current_year}
+    panels = fragments.cached(current_user.id, 'stats', params,
+                              lambda: render_panels(selected_year, selected_author, current_year))
+    return render_template('stats/dashboard.html', panels=fragments.markup(panels))
@@ -0,0 +1,72 @@
+"""Benchmark per-request overhead of the Google Books client.
+
+Compares building a fresh service for every request (the old behaviour in
+``routes/books.py``) with the shared client in ``utils.google_books``.
+Both run against the local stub server, so the numbers isolate client
+construction and connection setup from Google's own latency.
+
+    python scripts/bench_books_client.py --requests 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httplib2
+from googleapiclient.discovery import build
+from scripts.stub_books_server import StubBooksServer
+from utils import google_books
+
+
+def per_request_build(url, count):
+    """Old behaviour: build a service and connection for every call"""
+    for i in range(count):
+        service = build('books', 'v1', developerKey='bench', http=httplib2.Http(),
+                        client_options={'api_endpoint': url})
+        service.volumes().get(volumeId=f'vol{i % 20}').execute()
+
+
+def shared_client(count):
+    """New behaviour: one service, pooled keep-alive connection per thread.
+
+    Calls the client directly; ``get_volume`` would answer most requests
+    from the volume cache and wait on the quota.
+    """
+    for i in range(count):
+        google_books.get_service().volumes().get(volumeId=f'vol{i % 20}')\
+            .execute(http=google_books.get_http())
+
+
+def timed(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<22} {elapsed * 1000 / count:8.3f} ms/request  ({count} requests)')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    server = StubBooksServer().start()
+    os.environ['GOOGLE_BOOKS_API_URL'] = server.url
+    os.environ['GOOGLE_BOOKS_API_KEY'] = 'bench'
+    google_books.reset_client()
+    try:
+        before = timed('build per request', lambda: per_request_build(server.url, args.requests),
+                       args.requests)
+        connections = server.connection_count
+        after = timed('shared client', lambda: shared_client(args.requests), args.requests)
+        print(f'connections opened: {connections} before, '
+              f'{server.connection_count - connections} after')
+        print(f'speedup: {before / after:.1f}x')
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
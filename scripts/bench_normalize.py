@@ -0,0 +1,125 @@
+"""Benchmark volume normalization for a page of search results.
+
+Compares the previous per-route code (three regex passes and chained
+``str.replace`` per description, plus one scan of ``industryIdentifiers``
+per ISBN type) with ``utils.volumes.normalize_volume``. Descriptions come
+from ``scripts/data/descriptions.json``, or ``--corpus`` can point at a
+saved Google Books search response.
+
+    python scripts/bench_normalize.py --pages 2000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.volumes import normalize_volume
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'descriptions.json')
+
+
+def legacy_strip_html_tags(text):
+    """The implementation previously copied into routes/books.py"""
+    if not text:
+        return ''
+    text = re.sub(r'<b>(.*?)</b>', r'\1', text)
+    text = re.sub(r'<strong>(.*?)</strong>', r'\1', text)
+    clean = re.compile('<.*?>')
+    text = re.sub(clean, ' ', text)
+    text = text.replace('&nbsp;', ' ')\
+               .replace('&amp;', '&')\
+               .replace('&lt;', '<')\
+               .replace('&gt;', '>')\
+               .replace('&quot;', '"')\
+               .replace('&#39;', "'")\
+               .replace('&ndash;', '–')\
+               .replace('&mdash;', '—')
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+def legacy_normalize(item):
+    """The search result mapping previously in routes/books.py"""
+    volume_info = item.get('volumeInfo', {})
+    image_links = volume_info.get('imageLinks', {})
+    return {
+        'id': item['id'],
+        'title': volume_info.get('title', 'Unknown Title'),
+        'authors': volume_info.get('authors', ['Unknown Author']),
+        'published_date': volume_info.get('publishedDate', ''),
+        'description': legacy_strip_html_tags(volume_info.get('description', '')),
+        'page_count': volume_info.get('pageCount'),
+        'categories': volume_info.get('categories', []),
+        'language': volume_info.get('language'),
+        'publisher': volume_info.get('publisher'),
+        'thumbnail': image_links.get('thumbnail', ''),
+        'small_thumbnail': image_links.get('smallThumbnail', ''),
+        'isbn': next((i['identifier'] for i in volume_info.get('industryIdentifiers', [])
+                      if i['type'] == 'ISBN_10'), ''),
+        'isbn13': next((i['identifier'] for i in volume_info.get('industryIdentifiers', [])
+                        if i['type'] == 'ISBN_13'), ''),
+        'etag': item.get('etag', ''),
+        'self_link': item.get('selfLink', ''),
+        'print_type': volume_info.get('printType', ''),
+        'maturity_rating': volume_info.get('maturityRating', ''),
+        'preview_link': volume_info.get('previewLink', ''),
+        'info_link': volume_info.get('infoLink', ''),
+        'canonical_volume_link': volume_info.get('canonicalVolumeLink', ''),
+        'content_version': volume_info.get('contentVersion', ''),
+        'is_ebook': item.get('saleInfo', {}).get('isEbook', False)
+    }
+
+
+def load_page(path, size=40):
+    """Build a page of ``size`` volumes from the corpus"""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        # A saved volumes().list response
+        items = data.get('items', [])
+    else:
+        items = [{
+            'id': f'bench{i}',
+            'etag': f'etag{i}',
+            'volumeInfo': {
+                'title': f'Book {i}',
+                'authors': ['A. Writer'],
+                'description': description,
+                'industryIdentifiers': [
+                    {'type': 'ISBN_10', 'identifier': '0306406152'},
+                    {'type': 'ISBN_13', 'identifier': '9780306406157'}
+                ],
+                'imageLinks': {'thumbnail': 'http://example.com/t.jpg'}
+            }
+        } for i, description in enumerate(data)]
+    return [items[i % len(items)] for i in range(size)]
+
+
+def timed(label, normalize, page, pages):
+    start = time.perf_counter()
+    for _ in range(pages):
+        for item in page:
+            normalize(item)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<10} {elapsed * 1e6 / pages:8.1f} us/page  ({pages} pages of {len(page)})')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+
+    page = load_page(args.corpus)
+    before = timed('legacy', legacy_normalize, page, args.pages)
+    after = timed('current', normalize_volume, page, args.pages)
+    print(f'speedup: {before / after:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark shelf search: the bm25 backend against the ILIKE fallback.
+
+Seeds an in-memory SQLite database with one user's library (50,000 books
+by default, descriptions drawn from ``scripts/data/descriptions.json``)
+and times a search as the shelf page runs it: the match count plus the
+first page in rank or date order. For bm25 it also reports the time to
+build the index, save the snapshot and load it in a fresh worker.
+
+    python scripts/bench_shelf_search.py --books 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FLASK_SECRET_KEY', 'bench')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from models import Book, User, Volume, db
+from utils import bm25, search
+from utils.text import strip_html_tags
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'descriptions.json')
+QUERIES = ('ocean', 'whale voyage', 'winter', 'detective murder', 'zzzz')
+WORDS = ('shadow', 'river', 'empire', 'garden', 'winter', 'machine', 'silent', 'harbor',
+         'crown', 'letters', 'night', 'glass', 'voyage', 'kingdom', 'storm', 'house')
+
+
+def seed(books, corpus):
+    with open(corpus) as f:
+        descriptions = [strip_html_tags(text) for text in json.load(f)]
+    rng = random.Random(1)
+    user = User(username='bench', email='bench@example.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.execute(Volume.__table__.insert(), [
+        {'google_books_id': f'vol{i}', 'title': f'Volume {i}',
+         'description': f'{descriptions[i % len(descriptions)]} {" ".join(rng.sample(WORDS, 4))}',
+         'categories': rng.choice(('Fiction', 'History', 'Science', 'Fiction / Mystery'))}
+        for i in range(books)
+    ])
+    db.session.execute(Book.__table__.insert(), [
+        {'user_id': user.id, 'title': ' '.join(rng.sample(WORDS, 3)).title(),
+         'authors': f'Author {rng.randrange(2000)}', 'status': 'read', 'google_books_id': f'vol{i}'}
+        for i in range(books)
+    ])
+    db.session.commit()
+    return user.id
+
+
+def run_search(backend, user_id, terms, per_page=50):
+    query = Book.for_list(excerpt=501).filter(Book.status == 'read', Book.user_id == user_id)
+    query, rank = backend.apply(query, terms, user_id=user_id)
+    key = [rank, Book.id] if rank is not None else [Book.created_at, Book.id]
+    count = query.order_by(None).count()
+    query.add_columns(*key).order_by(*(column.desc() for column in key)).limit(per_page + 1).all()
+    db.session.rollback()
+    return count
+
+
+def timed(label, func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{label:<34} {elapsed * 1000:9.1f} ms')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    args = parser.parse_args()
+
+    app = create_app('config.TestConfig')
+    with app.app_context(), tempfile.TemporaryDirectory() as directory:
+        bm25.store.directory = directory
+        db.create_all()
+        user_id = timed(f'seed {args.books} books', lambda: seed(args.books, args.corpus))
+
+        timed('bm25 build + save', lambda: bm25.store.build(user_id))
+        bm25.store.clear()
+        timed('bm25 load snapshot', lambda: bm25.store.get(user_id))
+        size = os.path.getsize(os.path.join(directory, f'{user_id}.idx'))
+        print(f'{"bm25 snapshot size":<34} {size / 1024 / 1024:9.1f} MB')
+
+        for terms in QUERIES:
+            print(f'\n"{terms}"')
+            for name in ('like', 'bm25'):
+                count = timed(f'  {name}', lambda: run_search(search.BACKENDS[name], user_id, terms),
+                              args.repeat)
+                print(f'{"":<36}{count} matches')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Local stand-in for the Google Books API.
+
+Serves deterministic fake volumes on the same paths as Google
+(``/books/v1/volumes`` and ``/books/v1/volumes/<id>``) so benchmarks and
+tests can point the client at it via ``GOOGLE_BOOKS_API_URL``.
+
+Run standalone with:
+
+    python scripts/stub_books_server.py --port 8089
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def make_volume(volume_id, revision=0):
+    """Build a fake volume resource for the given id"""
+    digest = hashlib.sha1(volume_id.encode()).hexdigest()
+    return {
+        'kind': 'books#volume',
+        'id': volume_id,
+        'etag': f'{digest[:11]}{revision}',
+        'selfLink': f'https://www.googleapis.com/books/v1/volumes/{volume_id}',
+        'volumeInfo': {
+            'title': f'Stub Book {volume_id}',
+            'authors': [f'Author {digest[:4]}'],
+            'publisher': 'Stub Press',
+            'publishedDate': '2020-01-01',
+            'description': f'<p>A <b>stub</b> description for {volume_id}.</p>',
+            'industryIdentifiers': [
+                {'type': 'ISBN_10', 'identifier': str(int(digest[:8], 16))[:10].zfill(10)},
+                {'type': 'ISBN_13', 'identifier': '978' + str(int(digest[8:16], 16))[:10].zfill(10)}
+            ],
+            'pageCount': 100 + int(digest[:2], 16),
+            'printType': 'BOOK',
+            'categories': ['Fiction'],
+            'maturityRating': 'NOT_MATURE',
+            'contentVersion': f'0.{revision}.0.preview.0',
+            'imageLinks': {
+                'smallThumbnail': f'http://books.google.com/books/content?id={volume_id}&zoom=5',
+                'thumbnail': f'http://books.google.com/books/content?id={volume_id}&zoom=1'
+            },
+            'language': 'en',
+            'previewLink': f'http://books.google.com/books?id={volume_id}&printsec=frontcover',
+            'infoLink': f'http://books.google.com/books?id={volume_id}',
+            'canonicalVolumeLink': f'https://books.google.com/books/about/?id={volume_id}'
+        },
+        'saleInfo': {'country': 'US', 'saleability': 'NOT_FOR_SALE', 'isEbook': False}
+    }
+
+
+def parse_fields(spec):
+    """Parse a partial-response ``fields`` spec into a nested dict.
+
+    ``a,b(c,d),e/f`` becomes ``{'a': None, 'b': {'c': None, 'd': None},
+    'e': {'f': None}}``; None means "the whole value".
+    """
+    def parse_list(pos):
+        tree = {}
+        while pos < len(spec):
+            pos = parse_item(pos, tree)
+            if pos < len(spec) and spec[pos] == ',':
+                pos += 1
+            elif pos < len(spec) and spec[pos] == ')':
+                return tree, pos + 1
+        return tree, pos
+
+    def parse_item(pos, tree):
+        start = pos
+        while pos < len(spec) and spec[pos] not in ',()/':
+            pos += 1
+        name = spec[start:pos].strip()
+        if pos < len(spec) and spec[pos] == '(':
+            subtree, pos = parse_list(pos + 1)
+            tree[name] = {**(tree.get(name) or {}), **subtree}
+        elif pos < len(spec) and spec[pos] == '/':
+            subtree = tree.get(name) or {}
+            pos = parse_item(pos + 1, subtree)
+            tree[name] = subtree
+        else:
+            tree[name] = None
+        return pos
+
+    return parse_list(0)[0]
+
+
+def apply_fields(value, tree):
+    """Keep only the parts of ``value`` selected by a parsed fields tree"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: apply_fields(value[key], subtree)
+                for key, subtree in tree.items() if key in value}
+    return value
+
+
+class StubBooksHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        fields = parse_qs(urlparse(self.path).query).get('fields')
+        if fields and status == 200:
+            payload = apply_fields(payload, parse_fields(fields[0]))
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_empty(self, status, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        with server.lock:
+            server.request_count += 1
+            server.requests.append((parsed.path, params,
+                                    {k.lower(): v for k, v in self.headers.items()}))
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_with:
+            self._send_json({'error': {'code': server.fail_with}}, status=server.fail_with)
+            return
+
+        if parsed.path == '/books/v1/volumes':
+            start = int(params.get('startIndex', ['0'])[0])
+            count = int(params.get('maxResults', ['10'])[0])
+            query = params.get('q', [''])[0]
+            items = [make_volume(f'{hashlib.md5(query.encode()).hexdigest()[:8]}{i}')
+                     for i in range(start, start + count)]
+            self._send_json({'kind': 'books#volumes', 'totalItems': 1000, 'items': items})
+        elif parsed.path.startswith('/books/v1/volumes/'):
+            volume_id = parsed.path.rsplit('/', 1)[1]
+            volume = make_volume(volume_id, server.revisions.get(volume_id, 0))
+            etag = f'"{volume["etag"]}"'
+            if self.headers.get('If-None-Match') in (etag, volume['etag']):
+                self._send_empty(304, {'ETag': etag})
+            else:
+                self._send_json(volume, headers={'ETag': etag})
+        else:
+            self._send_json({'error': {'code': 404}}, status=404)
+
+
+class StubBooksServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), StubBooksHandler)
+        self.latency = latency
+        self.fail_with = None
+        self.revisions = {}
+        self.request_count = 0
+        self.connection_count = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connection_count += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        """Serve requests from a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local Google Books API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds to sleep before answering each request')
+    args = parser.parse_args()
+    server = StubBooksServer(args.host, args.port, args.latency)
+    print(f'Stub Google Books API listening on {server.url}')
+    server.serve_forever()
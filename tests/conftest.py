@@ -37,6 +37,21 @@ def setup_fts(db_session):
                 ) STORED;
                 
                 CREATE INDEX IF NOT EXISTS books_search_idx ON books USING GIN (search_vector);
+                
+                ALTER TABLE volumes
+                ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('books_fts_config', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('books_fts_config', coalesce(authors, '')), 'B') ||
+                    setweight(to_tsvector('books_fts_config', coalesce(description, '')), 'C') ||
+                    setweight(to_tsvector('books_fts_config', coalesce(categories, '')), 'D')
+                ) STORED;
+                
+                CREATE INDEX IF NOT EXISTS volumes_search_idx ON volumes USING GIN (search_vector);
+                
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING GIN (title gin_trgm_ops);
+                CREATE INDEX IF NOT EXISTS ix_books_authors_trgm ON books USING GIN (authors gin_trgm_ops);
             """))
             
             conn.commit()
@@ -132,6 +147,20 @@ def patch_redis(monkeypatch, redis_client):
     monkeypatch.setattr(routes.monitoring, 'redis_client', redis_client)
     monkeypatch.setattr('routes.auth.redis_client', redis_client)
 
+@pytest.fixture(scope='function')
+def books_stub(monkeypatch):
+    """Run a local Google Books stub and point the shared client at it"""
+    from scripts.stub_books_server import StubBooksServer
+    from utils import google_books
+    server = StubBooksServer().start()
+    monkeypatch.setenv('GOOGLE_BOOKS_API_URL', server.url)
+    monkeypatch.setenv('GOOGLE_BOOKS_API_KEY', 'test-key')
+    monkeypatch.setattr('routes.books.GOOGLE_BOOKS_API_KEY', 'test-key')
+    google_books.reset_client()
+    yield server
+    google_books.reset_client()
+    server.stop()
+
 @pytest.fixture(autouse=True)
 def reset_rate_limiter(app):
     """Reset rate limiter between tests"""
@@ -140,6 +169,28 @@ def reset_rate_limiter(app):
     yield
     limiter.reset()
 
+@pytest.fixture(autouse=True)
+def reset_books_cache():
+    """Start every test with empty Google Books, search and page caches"""
+    from utils import autocomplete, fragments, fuzzy, google_books
+    autocomplete.reset()
+    fuzzy.invalidate()
+    fragments.cache.clear()
+    google_books.search_cache.clear()
+    google_books.volume_cache.clear()
+    google_books.call_stats.clear()
+    google_books.breaker.reset()
+    google_books.quota.reset()
+    yield
+    autocomplete.reset()
+    fuzzy.invalidate()
+    fragments.cache.clear()
+    google_books.search_cache.clear()
+    google_books.volume_cache.clear()
+    google_books.call_stats.clear()
+    google_books.breaker.reset()
+    google_books.quota.reset()
+
 @pytest.fixture(autouse=True)
 def app_context(app):
     """Create application context for tests"""
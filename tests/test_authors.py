@@ -0,0 +1,84 @@
+import re
+from datetime import datetime
+from werkzeug.security import generate_password_hash
+from models import Author, Book, User
+from utils.volumes import split_authors
+from tests.utils import get_csrf_token, login_user
+
+def test_split_authors():
+    """Test stray spaces and repeats are dropped from an authors string"""
+    assert split_authors(' Neil  Gaiman, Terry Pratchett,,Neil Gaiman') == ['Neil Gaiman', 'Terry Pratchett']
+    assert split_authors(None) == []
+
+def test_books_are_linked_to_authors(db_session, test_user):
+    """Test links keep the credited order and follow edits and Google refreshes"""
+    book = Book(title='Good Omens', authors='Terry Pratchett, Neil Gaiman', user_id=test_user.id)
+    db_session.add(book)
+    db_session.commit()
+    assert [a.name for a in book.author_list] == ['Terry Pratchett', 'Neil Gaiman']
+
+    book.authors = 'Neil Gaiman, Terry Pratchett'
+    db_session.commit()
+    assert [a.name for a in book.author_list] == ['Neil Gaiman', 'Terry Pratchett']
+    assert Author.query.count() == 2
+
+    # Google's list keeps a comma inside a name
+    book.authors = 'Pratchett, Terry, Gaiman, Neil'
+    book.update_from_google_books({'id': 'v1', 'volumeInfo': {
+        'title': 'Good Omens', 'authors': ['Pratchett, Terry', 'Gaiman, Neil']}})
+    db_session.commit()
+    assert [a.name for a in book.author_list] == ['Pratchett, Terry', 'Gaiman, Neil']
+
+def test_add_uses_google_author_list(auth_client, db_session, books_stub):
+    login_user(auth_client, 'testuser', 'testpass123')
+    csrf_token = get_csrf_token(auth_client.get('/books/search'))
+    auth_client.post('/books/add', data={
+        'csrf_token': csrf_token, 'id': 'v2', 'title': 'The Hobbit',
+        'authors': 'Tolkien, J. R. R.', 'author': ['Tolkien, J. R. R.']
+    })
+    book = Book.query.filter_by(google_books_id='v2').one()
+    assert [a.name for a in book.author_list] == ['Tolkien, J. R. R.']
+
+def test_stats_count_each_author(auth_client, db_session):
+    """Test "A, B" and "B, A" count toward the same authors"""
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add_all([
+        Book(title='[TEST] One', authors='Ann Leckie, Jo Walton', user_id=user.id),
+        Book(title='[TEST] Two', authors='Jo Walton, Ann Leckie', user_id=user.id),
+        Book(title='[TEST] Three', authors='Jo Walton', user_id=user.id),
+    ])
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    html = auth_client.get('/stats/').get_data(as_text=True)
+    assert 'author=Jo+Walton' in html
+    html = auth_client.get('/stats/?author=Ann Leckie').get_data(as_text=True)
+    assert '[TEST] One' in html and '[TEST] Two' in html
+    assert '[TEST] Three' not in html
+
+def test_author_page_is_user_scoped_and_paginated(auth_client, db_session, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'SHELF_PAGE_SIZE', 1)
+    user = User.query.filter_by(username='testuser').first()
+    other = User(username='other', email='other@example.com',
+                 password=generate_password_hash('testpass123'))
+    db_session.add(other)
+    db_session.commit()
+    db_session.add_all([
+        Book(title='[TEST] Older', authors='Ursula K. Le Guin', status='read',
+             date_read=datetime(2023, 1, 1), user_id=user.id),
+        Book(title='[TEST] Newer', authors='Someone Else,  Ursula K.  Le Guin', status='read',
+             date_read=datetime(2024, 1, 1), user_id=user.id),
+        Book(title='[TEST] Not mine', authors='Ursula K. Le Guin', user_id=other.id),
+    ])
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    html = auth_client.get('/books/author/Ursula K. Le Guin').get_data(as_text=True)
+    assert '[TEST] Newer' in html
+    assert '[TEST] Older' not in html
+    assert '[TEST] Not mine' not in html
+
+    next_url = re.search(r'href="([^"]+after=[^"]+)"', html).group(1).replace('&amp;', '&')
+    html = auth_client.get(next_url).get_data(as_text=True)
+    assert '[TEST] Older' in html
+    assert 'after=' not in html
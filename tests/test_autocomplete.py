@@ -0,0 +1,77 @@
+import time
+from models import Volume
+from utils import autocomplete
+from utils.autocomplete import PrefixIndex
+from tests.utils import login_user
+
+def test_prefix_lookup_matches_word_starts():
+    """Test titles match on any word and whole-title matches rank first"""
+    index = PrefixIndex()
+    index.add_volume('The Lord of the Rings', ['J. R. R. Tolkien'])
+    index.add_volume('Ringworld', 'Larry Niven')
+
+    assert [s['text'] for s in index.search('ring')] == ['Ringworld', 'The Lord of the Rings']
+    assert index.search('TOLK') == [{'text': 'J. R. R. Tolkien', 'kind': 'author'}]
+    assert index.search('larry') == [{'text': 'Larry Niven', 'kind': 'author'}]
+    assert index.search('zzz') == []
+
+def test_recent_entries_are_capped():
+    """Test search-result entries are evicted oldest first, catalog ones kept"""
+    index = PrefixIndex(max_recent=2)
+    index.add('Dune')
+    index.add('Dune', recent=True)
+    index.add('Emma', recent=True)
+    index.add('Dracula', recent=True)
+    index.add('Dubliners', recent=True)
+
+    assert index.search('emma') == []
+    assert [s['text'] for s in index.search('d')] == ['Dune', 'Dracula', 'Dubliners']
+
+def test_autocomplete_endpoint(auth_client, db_session, test_user):
+    """Test the endpoint answers from the catalog and stays fast"""
+    db_session.add(Volume(google_books_id='v1', title='Dune Messiah', authors='Frank Herbert'))
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    response = auth_client.get('/books/autocomplete?q=dune')
+    assert response.status_code == 200
+    assert response.get_json()['suggestions'] == [{'text': 'Dune Messiah', 'kind': 'title'}]
+
+    for i in range(2000):
+        autocomplete.index.add(f'Generated Title {i}')
+    started = time.perf_counter()
+    response = auth_client.get('/books/autocomplete?q=generated title 1')
+    assert time.perf_counter() - started < 0.05
+    assert len(response.get_json()['suggestions']) == 8
+
+    response = auth_client.get('/books/autocomplete?q=d')
+    assert response.get_json()['suggestions'] == []
+
+def test_catalog_changes_picked_up_incrementally(app, db_session, monkeypatch):
+    """Test a sync only adds volumes changed since the last one"""
+    db_session.add(Volume(google_books_id='v1', title='Emma', authors='Jane Austen'))
+    db_session.commit()
+    assert autocomplete.suggest('emm') == [{'text': 'Emma', 'kind': 'title'}]
+
+    db_session.add(Volume(google_books_id='v2', title='Persuasion', authors='Jane Austen'))
+    db_session.commit()
+    assert autocomplete.suggest('pers') == []  # Not due for a sync yet
+
+    monkeypatch.setattr(autocomplete, 'sync_seconds', 0)
+    assert autocomplete.suggest('pers') == [{'text': 'Persuasion', 'kind': 'title'}]
+
+def test_catalog_build_sorts_once():
+    """Test a bulk build matches adding one by one and stays fast on a large catalog"""
+    volumes = [('The Lord of the Rings', 'J. R. R. Tolkien'), ('Ringworld', ['Larry Niven']),
+               ('Ringworld', 'Larry Niven'), ('', None)]
+    one_by_one = PrefixIndex()
+    for title, authors in volumes:
+        one_by_one.add_volume(title, authors)
+    bulk = PrefixIndex()
+    bulk.add_volumes(volumes)
+    assert bulk._entries == one_by_one._entries
+
+    started = time.perf_counter()
+    bulk.add_volumes((f'Generated Title {i}', f'Author {i % 5000}') for i in range(50_000))
+    assert time.perf_counter() - started < 5
+    assert [s['text'] for s in bulk.search('generated title 49999')] == ['Generated Title 49999']
@@ -0,0 +1,107 @@
+import json
+import pickle
+import re
+import pytest
+from models import Book, User, Volume
+from utils import bm25, search
+from tests.utils import login_user
+
+@pytest.fixture
+def bm25_backend(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'SHELF_SEARCH_BACKEND', 'bm25')
+    monkeypatch.setattr(bm25.store, 'directory', str(tmp_path))
+    bm25.store.clear()
+    yield bm25.store
+    bm25.store.clear()
+
+def shelf_titles(client, query):
+    html = client.get(f'/shelf/read?search={query}').get_data(as_text=True)
+    return re.findall(r'\[TEST\] [\w ]+?(?=\s*</a>)', html)
+
+def test_tokenize_matches_fts_config():
+    """Test stop words are dropped, accents folded and words stemmed"""
+    assert bm25.tokenize('The Oceans of Café Culture') == ['ocean', 'cafe', 'cultur']
+    assert bm25.tokenize(None) == []
+
+def test_index_ranks_and_requires_every_word():
+    index = bm25.LibraryIndex()
+    index.add(1, ['Ocean Notes', 'A', 'Tides and currents', ''])
+    index.add(2, ['Harbor Life', 'B', 'A story set by the oceans', 'Fiction'])
+    index.add(3, ['Desert', 'C', None, None])
+
+    scores = index.search('ocean', search.WEIGHTS)
+    assert list(scores) == [1, 2]
+    assert scores[1] > scores[2]
+    assert list(index.search('ocean story', search.WEIGHTS)) == [2]
+    assert index.search('ocean desert', search.WEIGHTS) == {}
+
+    # Re-adding replaces the old text; removal survives compaction
+    index.add(1, ['Mountain Notes', 'A', '', ''])
+    index.remove(3)
+    index.compact()
+    assert list(index.search('ocean', search.WEIGHTS)) == [2]
+    assert list(index.search('mountain', search.WEIGHTS)) == [1]
+    assert len(index) == 2
+
+    restored = bm25.LibraryIndex.from_data(json.loads(json.dumps(index.to_data())))
+    assert restored.search('mountain', search.WEIGHTS) == index.search('mountain', search.WEIGHTS)
+
+def test_shelf_search_uses_bm25(auth_client, db_session, bm25_backend):
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add(Book(title='[TEST] Ocean Notes', authors='A', status='read', user_id=user.id,
+                        description='Tides and currents'))
+    db_session.add(Book(title='[TEST] Harbor Life', authors='B', status='read', user_id=user.id,
+                        description='A story set by the oceans'))
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    assert search.get_backend().name == 'bm25'
+    assert shelf_titles(auth_client, 'oceans') == ['[TEST] Ocean Notes', '[TEST] Harbor Life']
+    assert shelf_titles(auth_client, 'nothing') == []
+
+def test_changes_reach_the_index_through_the_journal(auth_client, db_session, bm25_backend):
+    """Test commits are replayed incrementally, also by a worker starting from the snapshot"""
+    user = User.query.filter_by(username='testuser').first()
+    volume = Volume(google_books_id='v1', title='Dune', description='Spice and sandworms')
+    book = Book(volume=volume, title='[TEST] Dune', authors='Frank Herbert',
+                status='read', user_id=user.id)
+    db_session.add(book)
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+    assert shelf_titles(auth_client, 'sandworms') == ['[TEST] Dune']
+
+    volume.description = 'Politics on Arrakis'
+    db_session.add(Book(title='[TEST] Arrakis Notes', authors='B', status='read', user_id=user.id))
+    db_session.commit()
+    assert shelf_titles(auth_client, 'sandworms') == []
+    # A title match outranks a description match
+    assert shelf_titles(auth_client, 'arrakis') == ['[TEST] Arrakis Notes', '[TEST] Dune']
+
+    # Another worker loads the snapshot and replays the rest of the journal
+    db_session.delete(book)
+    db_session.commit()
+    bm25_backend.clear()
+    assert shelf_titles(auth_client, 'arrakis') == ['[TEST] Arrakis Notes']
+    assert bm25_backend.get(user.id).journal_offset > 0
+
+def test_untracked_users_are_not_journaled(db_session, test_user, bm25_backend, tmp_path):
+    db_session.add(Book(title='Dune', authors='Frank Herbert', user_id=test_user.id))
+    db_session.commit()
+    assert list(tmp_path.iterdir()) == []
+
+def test_snapshot_is_plain_data(db_session, test_user, bm25_backend, tmp_path):
+    """Test snapshots are JSON and anything else on disk is rebuilt, never unpickled"""
+    db_session.add(Book(title='Dune', authors='Frank Herbert', user_id=test_user.id))
+    db_session.commit()
+    bm25_backend.build(test_user.id)
+    path = tmp_path / f'{test_user.id}.idx'
+    assert json.loads(path.read_text())['format'] == bm25.FORMAT
+
+    class Planted:
+        def __reduce__(self):
+            return (print, ('unpickled',))
+    path.write_bytes(pickle.dumps(Planted()))
+    bm25_backend.clear()
+    assert bm25_backend.load(test_user.id) is None
+    assert list(bm25_backend.search(test_user.id, 'dune', search.WEIGHTS)) == [
+        Book.query.filter_by(title='Dune').one().id]
@@ -3,7 +3,7 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash
 from utils.text import strip_html_tags
 from unittest.mock import patch
-from models import User
+from models import User, Volume
 from extensions import db
 
 def get_csrf_token(response):
@@ -25,9 +25,12 @@ def test_strip_html_tags():
     assert strip_html_tags("<p>Test</p>") == "Test"
     assert strip_html_tags("<b>Bold</b> and <i>italic</i>") == "Bold and italic"
     assert strip_html_tags("No tags here") == "No tags here"
+    assert strip_html_tags("<p>One</p><p>Two</p>") == "One Two"
+    assert strip_html_tags("<i>word</i>s &amp; more&nbsp;text") == "words & more text"
+    assert strip_html_tags("&lt;script&gt;") == "<script>"
 
 @patch('extensions.limiter.enabled', False)  # Disable rate limiting for tests
-def test_add_book(auth_client, db_session):
+def test_add_book(auth_client, db_session, books_stub):
     """Test adding a book"""
     # Create test user
     user = User(
@@ -69,6 +72,12 @@ def test_add_book(auth_client, db_session):
     assert book.authors == 'Test Author'
     assert book.status == 'to_read'
     assert book.user_id == user.id
+    # The shared catalog holds Google's data; what the form sent differently
+    # is kept on the user's row
+    assert book.volume.google_books_id == 'test123'
+    assert book.volume.description == 'A stub description for test123.'
+    assert book.description_override == 'A test book about Python'
+    assert book.publisher_override is None
 
 def test_update_status(auth_client, db_session):
     """Test updating book status"""
@@ -326,7 +335,7 @@ def test_book_search(auth_client, db_session):
         'totalItems': 1
     }
     
-    with patch('routes.books.build') as mock_build:
+    with patch('utils.google_books.get_service') as mock_build:
         # Configure mock
         mock_service = mock_build.return_value
         mock_volumes = mock_service.volumes.return_value
@@ -366,7 +375,7 @@ def test_book_search_no_results(auth_client, db_session):
         'totalItems': 0
     }
     
-    with patch('routes.books.build') as mock_build:
+    with patch('utils.google_books.get_service') as mock_build:
         # Configure mock
         mock_service = mock_build.return_value
         mock_volumes = mock_service.volumes.return_value
@@ -399,7 +408,7 @@ def test_book_search_api_error(auth_client, db_session):
     # Log in the user
     login_user(auth_client, 'testuser10', 'testpass123')
 
-    with patch('routes.books.build') as mock_build:
+    with patch('utils.google_books.get_service') as mock_build:
         # Configure mock to raise an exception
         mock_service = mock_build.return_value
         mock_volumes = mock_service.volumes.return_value
@@ -415,4 +424,86 @@ def test_book_search_api_error(auth_client, db_session):
             'query': 'python'
         }, follow_redirects=True)
         assert response.status_code == 200
-        assert b'Error searching books' in response.data
\ No newline at end of file
+        assert b'Error searching books' in response.data
+
+def test_edit_refresh_unchanged_volume(client, test_user, db_session, books_stub):
+    """Test refreshing an unchanged book skips the payload via its etag"""
+    from scripts.stub_books_server import make_volume
+    from tests.utils import login_user as login
+    book = Book(
+        google_books_id='vol3',
+        title='Test Book',
+        authors='Test Author',
+        status='to_read',
+        etag=make_volume('vol3')['etag'],
+        user_id=test_user.id
+    )
+    db_session.add(book)
+    db_session.commit()
+    login(client, 'testuser', 'testpass123')
+
+    response = client.get(f'/books/edit/{book.id}')
+    csrf_token = get_csrf_token(response)
+    response = client.post(f'/books/edit/{book.id}', data={
+        'csrf_token': csrf_token,
+        'refresh_google': '1'
+    })
+    assert response.status_code == 200
+    assert b'already up to date' in response.data
+    assert books_stub.request_count == 1
+
+@patch('extensions.limiter.enabled', False)  # Disable rate limiting for tests
+def test_book_search_marks_existing_books(client, test_user, db_session, books_stub):
+    """Test search results flag volumes already in the user's library"""
+    import hashlib
+    from tests.utils import login_user as login
+    first_id = hashlib.md5(b'dune').hexdigest()[:8] + '0'
+    db_session.add(Book(google_books_id=first_id, title='Dune', authors='Frank Herbert',
+                        status='reading', user_id=test_user.id))
+    db_session.add(Book(google_books_id='not-on-page', title='Other', authors='Someone',
+                        status='read', user_id=test_user.id))
+    db_session.commit()
+    login(client, 'testuser', 'testpass123')
+
+    response = client.get('/books/search?query=dune')
+    assert response.status_code == 200
+    assert response.data.count(b'Already in your library') == 1
+    assert b'Already in your library (Reading shelf)' in response.data
+
+@patch('extensions.limiter.enabled', False)  # Disable rate limiting for tests
+def test_book_search_when_google_unavailable(client, test_user, db_session, books_stub):
+    """Test search explains an outage instead of showing the raw error"""
+    from tests.utils import login_user as login
+    login(client, 'testuser', 'testpass123')
+    books_stub.fail_with = 503
+
+    response = client.get('/books/search?query=dune')
+    assert response.status_code == 200
+    assert b'Google Books is not responding right now' in response.data
+
+@patch('extensions.limiter.enabled', False)  # Disable rate limiting for tests
+def test_add_keeps_form_data_out_of_catalog(client, test_user, db_session, books_stub):
+    """Test one user's form values never reach another user's shelf"""
+    from tests.utils import get_csrf_token, login_user as login
+    db_session.add(User(username='other', email='other@example.com',
+                        password=generate_password_hash('testpass123')))
+    db_session.commit()
+
+    login(client, 'testuser', 'testpass123')
+    client.post('/books/add', data={
+        'csrf_token': get_csrf_token(client.get('/books/search')), 'id': 'POPULAR1',
+        'title': 'Popular', 'authors': 'Someone', 'description': '&lt;script&gt;alert(1)&lt;/script&gt;'})
+    # The user's own copy shows as text
+    html = client.get('/shelf/to_read').data
+    assert b'<script>alert(1)' not in html
+    assert b'&lt;script&gt;alert(1)' in html
+    client.get('/logout')
+
+    login(client, 'other', 'testpass123')
+    client.post('/books/add', data={
+        'csrf_token': get_csrf_token(client.get('/books/search')), 'id': 'POPULAR1',
+        'title': 'Popular', 'authors': 'Someone'})
+    assert db_session.get(Volume, 'POPULAR1').description == 'A stub description for POPULAR1.'
+    html = client.get('/shelf/to_read').data
+    assert b'A stub description for POPULAR1.' in html
+    assert b'alert(1)' not in html
@@ -0,0 +1,69 @@
+import time
+from utils.cache import LRUCache, TwoTierCache
+from utils import google_books
+
+def test_lru_evicts_least_recently_used():
+    """Test entry-count bound evicts the oldest unused key"""
+    cache = LRUCache(max_entries=2, max_bytes=1000)
+    cache.set('a', 1, 10, 60)
+    cache.set('b', 2, 10, 60)
+    assert cache.get('a') == 1  # 'b' is now least recently used
+    cache.set('c', 3, 10, 60)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+def test_lru_byte_budget():
+    """Test total size bound and oversized values"""
+    cache = LRUCache(max_entries=10, max_bytes=100)
+    cache.set('a', 'x', 60, 60)
+    cache.set('b', 'y', 60, 60)
+    assert cache.get('a') is None
+    assert cache.bytes == 60
+
+    cache.set('huge', 'z', 500, 60)
+    assert cache.get('huge') is None
+
+def test_lru_expiry():
+    """Test entries expire after their TTL"""
+    cache = LRUCache()
+    cache.set('a', 1, 10, 0.01)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.bytes == 0
+
+def test_two_tier_redis_fallback(redis_client):
+    """Test a local miss is answered from Redis and counted"""
+    cache = TwoTierCache('test', ttl=60)
+    cache.set('key', {'answer': 42})
+    assert redis_client.ttl('cache:test:key') > 0
+
+    # Simulate another worker with an empty local tier
+    cache.local.clear()
+    assert cache.get('key') == {'answer': 42}
+    assert cache.get('key') == {'answer': 42}
+    assert cache.get('missing') is None
+
+    stats = cache.stats()
+    assert stats['redis_hits'] == 1
+    assert stats['local_hits'] == 1
+    assert stats['misses'] == 1
+
+def test_two_tier_skips_oversized_items(redis_client):
+    """Test values over the per-item limit are not cached"""
+    cache = TwoTierCache('test', max_item_bytes=10)
+    cache.set('key', 'x' * 100)
+    assert cache.get('key') is None
+    assert redis_client.get('cache:test:key') is None
+
+def test_search_results_cached(books_stub):
+    """Test repeated searches only hit the API once"""
+    first = google_books.search_volumes('Dune', start_index=0, max_results=10)
+    second = google_books.search_volumes('  dune ', start_index=0, max_results=10)
+    assert first == second
+    assert books_stub.request_count == 1
+
+    # Other pages are separate entries
+    google_books.search_volumes('dune', start_index=10, max_results=10)
+    assert books_stub.request_count == 2
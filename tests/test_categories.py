@@ -0,0 +1,58 @@
+import re
+from datetime import datetime
+from werkzeug.security import generate_password_hash
+from models import Book, Category, User, Volume
+from utils.volumes import split_categories
+from tests.utils import login_user
+
+def test_split_categories():
+    """Test spellings of one category collapse to a single name"""
+    assert split_categories('Fiction / Fantasy,  Science  Fiction,Fiction/Fantasy,') == \
+        ['Fiction / Fantasy', 'Science Fiction']
+    assert split_categories(None) == []
+
+def test_books_are_linked_to_categories(db_session, test_user):
+    """Test links follow the catalog, overrides and Google refreshes"""
+    volume = Volume(google_books_id='v1', title='Dune', categories='Fiction,Science Fiction')
+    book = Book(volume=volume, title='Dune', authors='Frank Herbert', user_id=test_user.id)
+    db_session.add(book)
+    db_session.commit()
+    assert [c.name for c in book.category_list] == ['Fiction', 'Science Fiction']
+
+    book.categories = 'Space Opera'
+    db_session.commit()
+    assert [c.name for c in book.category_list] == ['Space Opera']
+
+    book.update_from_google_books({'id': 'v1', 'volumeInfo': {
+        'title': 'Dune', 'categories': ['Fiction / Classics']}})
+    db_session.commit()
+    assert [c.name for c in book.category_list] == ['Fiction / Classics']
+    assert Category.query.filter_by(name='Fiction').count() == 1
+
+def test_category_page_is_user_scoped_and_paginated(auth_client, db_session, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'SHELF_PAGE_SIZE', 1)
+    user = User.query.filter_by(username='testuser').first()
+    other = User(username='other', email='other@example.com',
+                 password=generate_password_hash('testpass123'))
+    db_session.add(other)
+    db_session.commit()
+    db_session.add_all([
+        Book(title='[TEST] Older', authors='A', status='read', categories='Fiction / Fantasy',
+             date_read=datetime(2023, 1, 1), user_id=user.id),
+        Book(title='[TEST] Newer', authors='B', status='to_read', categories='Fiction/Fantasy',
+             date_read=datetime(2024, 1, 1), user_id=user.id),
+        Book(title='[TEST] Not mine', authors='C', status='read', categories='Fiction / Fantasy',
+             user_id=other.id),
+    ])
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    html = auth_client.get('/books/category/Fiction / Fantasy').get_data(as_text=True)
+    assert '[TEST] Newer' in html
+    assert '[TEST] Older' not in html
+    assert '[TEST] Not mine' not in html
+
+    next_url = re.search(r'href="([^"]+after=[^"]+)"', html).group(1).replace('&amp;', '&')
+    html = auth_client.get(next_url).get_data(as_text=True)
+    assert '[TEST] Older' in html
+    assert 'after=' not in html
@@ -0,0 +1,66 @@
+import time
+import pytest
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+def fail():
+    raise ValueError('upstream down')
+
+def call_failing(breaker, times):
+    for _ in range(times):
+        with pytest.raises(ValueError):
+            breaker.call(fail)
+
+def test_opens_at_failure_threshold():
+    """Test the breaker opens once enough calls fail and then rejects fast"""
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4)
+    breaker.call(lambda: 'ok')
+    call_failing(breaker, 2)
+    assert breaker.state == CLOSED  # Not enough calls yet
+    call_failing(breaker, 1)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: pytest.fail('should not be called'))
+    assert breaker.stats()['rejected'] == 1
+
+def test_half_open_probe_closes_or_reopens(monkeypatch):
+    """Test a probe after the open period decides the next state"""
+    breaker = CircuitBreaker('test', min_calls=2, open_seconds=30)
+    call_failing(breaker, 2)
+    assert breaker.state == OPEN
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 31)
+    call_failing(breaker, 1)
+    assert breaker.state == OPEN
+    assert breaker.stats()['opened'] == 2
+
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 62)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+def test_half_open_limits_probes():
+    """Test only the configured number of probes run while half-open"""
+    breaker = CircuitBreaker('test', min_calls=1, open_seconds=0)
+    call_failing(breaker, 1)
+
+    def nested():
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 'second probe')
+        return 'ok'
+
+    assert breaker.call(nested) == 'ok'
+
+def test_ignored_errors_count_as_success():
+    """Test errors that are not upstream failures do not trip the breaker"""
+    breaker = CircuitBreaker('test', min_calls=2, is_failure=lambda e: not isinstance(e, KeyError))
+
+    def missing():
+        raise KeyError('not found')
+
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            breaker.call(missing)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['successes'] == 3
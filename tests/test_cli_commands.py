@@ -121,4 +121,138 @@ def test_email_test_command_failure(app, db_session, monkeypatch):
     
     # Verify the command failed
     assert result.exit_code == 1
-    assert "Failed to send test email" in result.output 
\ No newline at end of file
+    assert "Failed to send test email" in result.output 
+
+def create_refresh_books(db_session):
+    """Create books for refresh-metadata tests"""
+    from models import Book
+    from scripts.stub_books_server import make_volume
+    user = User(username='reader', email='reader@example.com',
+                password=generate_password_hash('testpass123'))
+    other = User(username='other', email='other@example.com',
+                 password=generate_password_hash('testpass123'))
+    db_session.add_all([user, other])
+    db_session.commit()
+    books = [
+        # Unchanged: stored etag matches the stub
+        Book(google_books_id='aaa', title='A', authors='X', status='read',
+             etag=make_volume('aaa')['etag'], user_id=user.id),
+        # Stale etag, owned by two users
+        Book(google_books_id='bbb', title='B', authors='Y', status='to_read',
+             etag='old', user_id=user.id),
+        Book(google_books_id='bbb', title='B', authors='Y', status='reading',
+             etag='old', user_id=other.id),
+        Book(google_books_id='ccc', title='C', authors='Z', status='to_read',
+             user_id=user.id),
+    ]
+    db_session.add_all(books)
+    db_session.commit()
+    return books
+
+def test_refresh_metadata_command(app, db_session, books_stub, tmp_path):
+    """Test refresh-metadata fetches each volume once and skips unchanged ones"""
+    from cli.book_commands import books_cli
+    from models import Book
+    create_refresh_books(db_session)
+    runner = CliRunner()
+    result = runner.invoke(books_cli, ['refresh-metadata', '--batch-size', '2',
+                                       '--checkpoint', str(tmp_path / 'checkpoint')])
+    assert result.exit_code == 0, result.output
+    assert 'Checked 3 volumes' in result.output
+    assert 'Changed: 2 (3 books), unchanged: 1, failed: 0' in result.output
+    assert books_stub.request_count == 3
+
+    for book in Book.query.filter_by(google_books_id='bbb').all():
+        assert book.publisher == 'Stub Press'
+        assert book.etag != 'old'
+    assert Book.query.filter_by(google_books_id='aaa').first().publisher is None
+    assert not (tmp_path / 'checkpoint').exists()
+
+def test_refresh_metadata_dry_run(app, db_session, books_stub, tmp_path):
+    """Test dry run reports changes without saving them"""
+    from cli.book_commands import books_cli
+    from models import Book
+    create_refresh_books(db_session)
+    runner = CliRunner()
+    result = runner.invoke(books_cli, ['refresh-metadata', '--dry-run',
+                                       '--checkpoint', str(tmp_path / 'checkpoint')])
+    assert result.exit_code == 0, result.output
+    assert '[dry run] Changed: 2 (3 books)' in result.output
+    assert all(book.publisher is None for book in Book.query.all())
+
+def test_refresh_metadata_resume(app, db_session, books_stub, tmp_path):
+    """Test resume continues after the checkpointed volume id"""
+    from cli.book_commands import books_cli
+    create_refresh_books(db_session)
+    checkpoint = tmp_path / 'checkpoint'
+    checkpoint.write_text('bbb')
+    runner = CliRunner()
+    result = runner.invoke(books_cli, ['refresh-metadata', '--resume',
+                                       '--checkpoint', str(checkpoint)])
+    assert result.exit_code == 0, result.output
+    assert 'Resuming after bbb' in result.output
+    assert 'Checked 1 volumes' in result.output
+    assert books_stub.requests[0][0] == '/books/v1/volumes/ccc'
+
+def test_refresh_metadata_retries_failures(app, db_session, books_stub, tmp_path, monkeypatch):
+    """Test the checkpoint stops before a failed volume so --resume retries it"""
+    from cli.book_commands import books_cli
+    from models import Book, Volume
+    from utils import google_books
+    create_refresh_books(db_session)
+    checkpoint = tmp_path / 'checkpoint'
+    fetch_volume = google_books.fetch_volume
+    def failing_fetch(volume_id, *args, **kwargs):
+        if volume_id == 'bbb':
+            raise RuntimeError('timed out')
+        return fetch_volume(volume_id, *args, **kwargs)
+    monkeypatch.setattr(google_books, 'fetch_volume', failing_fetch)
+
+    runner = CliRunner()
+    result = runner.invoke(books_cli, ['refresh-metadata', '--batch-size', '1',
+                                       '--checkpoint', str(checkpoint)])
+    assert result.exit_code == 0, result.output
+    assert 'failed: 1' in result.output
+    assert 'retry from bbb' in result.output
+    assert checkpoint.read_text() == 'aaa'
+
+    # The shared volume is updated once however many users own it
+    monkeypatch.setattr(google_books, 'fetch_volume', fetch_volume)
+    updates = []
+    update = Volume.update_from_google_books
+    monkeypatch.setattr(Volume, 'update_from_google_books',
+                        lambda self, item: updates.append(item['id']) or update(self, item))
+    result = runner.invoke(books_cli, ['refresh-metadata', '--resume', '--checkpoint', str(checkpoint)])
+    assert result.exit_code == 0, result.output
+    # ccc was refreshed on the first run
+    assert 'Checked 2 volumes' in result.output
+    assert 'Changed: 1 (2 books)' in result.output
+    assert updates == ['bbb']
+    assert all(book.publisher == 'Stub Press' for book in Book.query.filter_by(google_books_id='bbb'))
+    assert not checkpoint.exists()
+
+def test_reindex_search_command(app, db_session):
+    """Test reindex-search rebuilds the SQLite index from the books table"""
+    from cli.book_commands import books_cli
+    create_refresh_books(db_session)
+    db_session.execute(db.text('DELETE FROM books_search'))
+    db_session.commit()
+
+    runner = CliRunner()
+    result = runner.invoke(books_cli, ['reindex-search'])
+    assert result.exit_code == 0, result.output
+    assert 'Indexed 4 books' in result.output
+
+def test_reindex_search_command_rebuilds_bm25(app, db_session, tmp_path, monkeypatch):
+    """Test reindex-search rebuilds each user's bm25 index when that backend is used"""
+    from cli.book_commands import books_cli
+    from utils import bm25
+    monkeypatch.setitem(app.config, 'SHELF_SEARCH_BACKEND', 'bm25')
+    monkeypatch.setattr(bm25.store, 'directory', str(tmp_path))
+    user_id = create_refresh_books(db_session)[0].user_id
+
+    runner = CliRunner()
+    result = runner.invoke(books_cli, ['reindex-search'])
+    assert result.exit_code == 0, result.output
+    assert 'Rebuilt the search indexes of' in result.output
+    assert (tmp_path / f'{user_id}.idx').exists()
@@ -0,0 +1,89 @@
+from models import Book, User
+from tests.utils import capture_statements, get_csrf_token, login_user
+
+def add_book(db_session, **kwargs):
+    user = User.query.filter_by(username='testuser').first()
+    book = Book(title='Dune', authors='Frank Herbert', status='reading', user_id=user.id, **kwargs)
+    db_session.add(book)
+    db_session.commit()
+    return book
+
+def test_unchanged_pages_answer_304(auth_client, db_session):
+    """Test a revalidated page is a 304 with no queries on the library"""
+    login_user(auth_client, 'testuser', 'testpass123')
+    book = add_book(db_session)
+
+    for url in ('/', '/shelf/reading', '/stats/', f'/books/book/{book.id}'):
+        response = auth_client.get(url)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        etag = response.headers['ETag']
+        assert etag.startswith('W/"')
+
+        response, statements = capture_statements(auth_client, url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.data == b''
+        assert not [s for s, _ in statements if 'FROM books' in s]
+
+def test_tag_follows_library_and_parameters(auth_client, db_session):
+    """Test a change to the library or the view gives a new tag"""
+    login_user(auth_client, 'testuser', 'testpass123')
+    book = add_book(db_session)
+    etag = auth_client.get('/shelf/reading').headers['ETag']
+    assert auth_client.get('/shelf/reading?search=dune').headers['ETag'] != etag
+
+    book.title = 'Dune Messiah'
+    db_session.commit()
+    response = auth_client.get('/shelf/reading', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Dune Messiah' in response.data
+    assert response.headers['ETag'] != etag
+
+def test_csrf_window_changes_tag(auth_client, db_session, monkeypatch):
+    """Test a reused page never carries a CSRF token close to expiring"""
+    from utils import conditional
+    login_user(auth_client, 'testuser', 'testpass123')
+    add_book(db_session)
+    etag = auth_client.get('/').headers['ETag']
+
+    now = conditional.time.time()
+    monkeypatch.setattr(conditional.time, 'time', lambda: now + 1800)
+    response = auth_client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+def test_flashed_pages_are_not_tagged(auth_client, db_session):
+    """Test a page showing a flashed message is neither tagged nor answered with 304"""
+    login_user(auth_client, 'testuser', 'testpass123')
+    book = add_book(db_session)
+    etag = auth_client.get('/shelf/read').headers['ETag']
+
+    auth_client.post(f'/books/update_status/{book.id}', data={
+        'csrf_token': get_csrf_token(auth_client.get('/books/search')), 'status': 'to_read'})
+    response = auth_client.get('/shelf/read', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Book moved to' in response.data
+    assert 'ETag' not in response.headers
+
+def test_anonymous_pages_are_not_tagged(client):
+    response = client.get('/')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+def test_error_pages_are_not_tagged(auth_client, db_session, monkeypatch):
+    """Test a shelf rendered after a failed search is not kept by the browser"""
+    import routes.shelf
+    login_user(auth_client, 'testuser', 'testpass123')
+    add_book(db_session)
+
+    def fail(*args):
+        raise RuntimeError('search backend down')
+    monkeypatch.setattr(routes.shelf, 'search_shelf', fail)
+    response = auth_client.get('/shelf/reading')
+    assert b'Dune' not in response.data
+    assert 'ETag' not in response.headers
+
+    monkeypatch.undo()
+    response = auth_client.get('/shelf/reading')
+    assert b'Dune' in response.data
+    assert 'ETag' in response.headers
@@ -0,0 +1,128 @@
+import os
+import pytest
+from models import Book, Volume
+from utils import covers
+from utils.covers import CoverCache
+from tests.utils import login_user
+
+JPEG = b'\xff\xd8\xff\xe0fake-jpeg-bytes'
+
+@pytest.fixture
+def cover_cache(tmp_path, monkeypatch):
+    cache = CoverCache(str(tmp_path / 'covers'), max_bytes=1024 * 1024)
+    monkeypatch.setattr(covers, 'cache', cache)
+    return cache
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+    def fake_fetch(url):
+        calls.append(url)
+        return JPEG, 'image/jpeg'
+    monkeypatch.setattr(covers, 'fetch_image', fake_fetch)
+    return calls
+
+def test_cover_is_fetched_once(client, db_session, cover_cache, fetches):
+    """Test a cover is fetched from the catalog's link once and then served from disk"""
+    db_session.add(Volume(google_books_id='vol1', title='Dune', etag='tag1',
+                          thumbnail='http://books.google.com/books/content?id=vol1&img=1'))
+    db_session.commit()
+    version = covers.cover_version('tag1')
+
+    response = client.get(f'/covers/vol1/thumb?v={version}')
+    assert response.status_code == 200
+    assert response.data == JPEG
+    assert response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert fetches == ['https://books.google.com/books/content?id=vol1&img=1']
+
+    etag = response.headers['ETag']
+    again = client.get(f'/covers/vol1/thumb?v={version}')
+    assert again.data == JPEG
+    assert len(fetches) == 1
+
+    cached = client.get(f'/covers/vol1/thumb?v={version}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+def test_cover_only_serves_catalog_versions(client, db_session, cover_cache, fetches):
+    """Test unknown volumes and made-up versions never fetch or store anything"""
+    db_session.add(Volume(google_books_id='vol1', title='Dune', etag='tag1'))
+    db_session.commit()
+
+    assert client.get('/covers/unknown/thumb').status_code == 404
+    response = client.get('/covers/vol1/thumb?v=made-up')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/covers/vol1/thumb?v={covers.cover_version("tag1")}')
+    assert fetches == []
+    assert cover_cache.size() == 0
+
+def test_cover_rejects_bad_requests(client, cover_cache, fetches):
+    """Test unknown sizes and odd ids never reach Google"""
+    assert client.get('/covers/vol1/huge').status_code == 404
+    assert client.get('/covers/bad.id/thumb').status_code == 404
+    assert fetches == []
+
+def test_cover_falls_back_to_google(client, db_session, cover_cache, monkeypatch):
+    """Test a failed fetch redirects the browser to the original image"""
+    def failing_fetch(url):
+        raise OSError('connection reset')
+    monkeypatch.setattr(covers, 'fetch_image', failing_fetch)
+
+    db_session.add(Volume(google_books_id='vol2', title='Emma'))
+    db_session.commit()
+
+    response = client.get('/covers/vol2/small')
+    assert response.status_code == 302
+    assert response.headers['Location'].startswith('https://books.google.com/books/content?id=vol2')
+    assert cover_cache.get('vol2/small/') is None
+
+def test_source_url_only_allows_google():
+    assert covers.source_url('x', 'http://evil.example.com/a.jpg') is None
+    assert covers.source_url('x', 'http://evilbooks.google.com/a.jpg') is None
+    assert covers.source_url('x', 'http://books.google.com.example.com/a.jpg') is None
+    assert covers.source_url('x', 'http://books.googleusercontent.com/a.jpg') == \
+        'https://books.googleusercontent.com/a.jpg'
+
+def test_cache_deduplicates_and_evicts(tmp_path):
+    """Test identical covers share a blob and old blobs go once over budget"""
+    cache = CoverCache(str(tmp_path), max_bytes=2700)
+    first = cache.put('a/thumb/', b'x' * 1000, 'image/jpeg')
+    assert cache.put('b/thumb/', b'x' * 1000, 'image/jpeg')[0] == first[0]
+    # One blob and two key files
+    assert cache.size() == 1000 + 2 * len(f'{first[0]} image/jpeg')
+
+    old = cache.put('c/thumb/', b'y' * 1000, 'image/jpeg')
+    os.utime(old[2], (0, 0))
+    os.utime(first[2], (1, 1))
+    cache.put('d/thumb/', b'z' * 1000, 'image/jpeg')
+
+    assert cache.size() <= 2700
+    assert cache.get('c/thumb/') is None
+    assert cache.get('a/thumb/') is not None
+    assert cache.get('d/thumb/') is not None
+
+def test_cache_evicts_key_files(tmp_path):
+    """Test key files count toward the budget and old ones are removed"""
+    cache = CoverCache(str(tmp_path), max_bytes=1000)
+    for i in range(20):
+        cache.put(f'vol{i}/thumb/', b'x' * 10, 'image/jpeg')
+        os.utime(cache._key_path(f'vol{i}/thumb/'), (i + 1, i + 1))
+    assert cache.size() <= 1000
+    assert cache.get('vol0/thumb/') is None
+    assert cache.get('vol19/thumb/') is not None
+
+def test_shelf_uses_cover_proxy(auth_client, db_session, test_user):
+    """Test templates point at the proxy unless the user set their own cover"""
+    volume = Volume(google_books_id='vol3', title='Emma', etag='tag1',
+                    thumbnail='http://books.google.com/books/content?id=vol3')
+    db_session.add(volume)
+    db_session.add(Book(volume=volume, title='Emma', authors='Jane Austen',
+                        status='read', user_id=test_user.id))
+    db_session.add(Book(title='Custom', authors='Someone', status='read', user_id=test_user.id,
+                        thumbnail_override='http://example.com/custom.jpg'))
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    html = auth_client.get('/shelf/read').get_data(as_text=True)
+    assert '/covers/vol3/thumb?v=' in html
+    assert 'https://example.com/custom.jpg' in html
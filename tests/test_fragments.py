@@ -0,0 +1,95 @@
+from models import Book, User, Volume
+from utils import fragments, library_version
+from tests.utils import capture_statements, get_csrf_token, login_user
+
+def count_book_queries(client, url):
+    response, statements = capture_statements(client, url)
+    assert response.status_code == 200
+    return response, len([s for s, _ in statements if 'FROM books' in s])
+
+def test_library_version_follows_changes(db_session, test_user, redis_client):
+    """Test adding, editing, moving and removing a book each bump the version"""
+    other = User(username='other', email='other@example.com', password='x')
+    db_session.add(other)
+    db_session.commit()
+    assert library_version.get(test_user.id) == 0
+
+    book = Book(title='Dune', authors='Frank Herbert', status='to_read', user_id=test_user.id)
+    db_session.add(book)
+    db_session.commit()
+    assert library_version.get(test_user.id) == 1
+    assert redis_client.get(f'library_version:{test_user.id}') == '1'
+
+    book.title = 'Dune Messiah'
+    db_session.commit()
+    book.status = 'read'
+    db_session.commit()
+    db_session.delete(book)
+    db_session.commit()
+    assert library_version.get(test_user.id) == 4
+    assert library_version.get(other.id) == 0
+
+    # Nothing is bumped for a change that is rolled back
+    db_session.add(Book(title='Emma', authors='Jane Austen', user_id=test_user.id))
+    db_session.flush()
+    db_session.rollback()
+    assert library_version.get(test_user.id) == 4
+
+def test_volume_refresh_bumps_its_readers(db_session, test_user):
+    """Test refreshed catalog data changes the version of every user holding it"""
+    volume = Volume(google_books_id='v1', title='Dune')
+    db_session.add(Book(title='Dune', authors='Frank Herbert', volume=volume, user_id=test_user.id))
+    db_session.commit()
+    version = library_version.get(test_user.id)
+
+    volume.description = 'Spice.'
+    db_session.commit()
+    assert library_version.get(test_user.id) == version + 1
+
+def test_library_version_without_redis(monkeypatch, db_session, test_user, redis_client):
+    """Test the version is read from the database when Redis has no copy or is down"""
+    import routes.monitoring
+    db_session.add(Book(title='Dune', authors='Frank Herbert', user_id=test_user.id))
+    db_session.commit()
+
+    redis_client.delete(f'library_version:{test_user.id}')
+    assert library_version.get(test_user.id) == 1
+    assert redis_client.get(f'library_version:{test_user.id}') == '1'
+
+    monkeypatch.setattr(routes.monitoring, 'redis_client', routes.monitoring.DummyRedis())
+    db_session.add(Book(title='Emma', authors='Jane Austen', user_id=test_user.id))
+    db_session.commit()
+    assert library_version.get(test_user.id) == 2
+
+def test_repeat_views_skip_queries(auth_client, db_session):
+    """Test an unchanged library is served from the cache and a change shows at once"""
+    login_user(auth_client, 'testuser', 'testpass123')
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add(Book(title='Dune', authors='Frank Herbert', status='reading', user_id=user.id))
+    db_session.commit()
+
+    for url in ('/', '/shelf/reading', '/stats/'):
+        first, queries = count_book_queries(auth_client, url)
+        assert queries > 0
+        second, queries = count_book_queries(auth_client, url)
+        assert queries == 0
+        assert b'Frank Herbert' in second.data
+
+    book = Book.query.filter_by(title='Dune').one()
+    auth_client.post(f'/books/update_status/{book.id}', data={
+        'csrf_token': get_csrf_token(auth_client.get('/books/search')), 'status': 'read'})
+    response, queries = count_book_queries(auth_client, '/shelf/reading')
+    assert queries > 0
+    assert b'Dune' not in response.data
+
+def test_cached_fragment_gets_current_csrf_token(auth_client, db_session):
+    """Test forms in a cached fragment carry this session's CSRF token"""
+    login_user(auth_client, 'testuser', 'testpass123')
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add(Book(title='Dune', authors='Frank Herbert', status='reading', user_id=user.id))
+    db_session.commit()
+
+    auth_client.get('/')
+    html = auth_client.get('/').get_data(as_text=True)
+    assert fragments.CSRF_PLACEHOLDER not in html
+    assert 'name="csrf_token" value="' in html
@@ -0,0 +1,96 @@
+import time
+from models import Book, User, db
+from utils import fuzzy
+from utils.fuzzy import TrigramIndex, trigrams
+from tests.utils import login_user
+
+def test_trigrams_match_pg_trgm():
+    """Test words are padded the way pg_trgm pads them"""
+    assert trigrams('Cat') == {'  c', ' ca', 'cat', 'at '}
+    assert trigrams('') == set()
+
+def test_index_tolerates_typos_and_partial_words():
+    index = TrigramIndex()
+    index.add('J. R. R. Tolkien', 'author', 1)
+    index.add('The Hobbit', 'title', 1)
+    index.add('Frank Herbert', 'author', 2)
+
+    assert [m[1] for m in index.search('tolkein')] == ['J. R. R. Tolkien']
+    assert [m[1] for m in index.search('hobb')] == ['The Hobbit']
+    assert index.search('xyzzy') == []
+
+def test_fuzzy_shelf_search(auth_client, db_session):
+    """Test misspelled authors still find books and offer a suggestion"""
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add(Book(title='[TEST] The Hobbit', authors='J. R. R. Tolkien',
+                        status='read', user_id=user.id))
+    db_session.add(Book(title='[TEST] Dune', authors='Frank Herbert',
+                        status='read', user_id=user.id))
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    html = auth_client.get('/shelf/read?search=tolkein').get_data(as_text=True)
+    assert '[TEST] The Hobbit' in html
+    assert '[TEST] Dune' not in html
+    assert 'Did you mean' in html
+    assert 'search=J.+R.+R.+Tolkien' in html
+
+    # An exact hit needs no suggestion
+    html = auth_client.get('/shelf/read?search=tolkien').get_data(as_text=True)
+    assert '[TEST] The Hobbit' in html
+    assert 'Did you mean' not in html
+
+def test_fuzzy_can_be_disabled(auth_client, db_session, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'SHELF_FUZZY_SEARCH', False)
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add(Book(title='[TEST] The Hobbit', authors='J. R. R. Tolkien',
+                        status='read', user_id=user.id))
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    html = auth_client.get('/shelf/read?search=tolkein').get_data(as_text=True)
+    assert '[TEST] The Hobbit' not in html
+    assert 'Did you mean' in html
+
+def test_index_follows_library_changes(db_session, test_user, redis_client):
+    """Test a user's index catches up with their library version, wherever it changed"""
+    assert fuzzy.suggest(test_user.id, 'hobit') is None
+    db_session.add(Book(title='The Hobbit', authors='Tolkien', status='read', user_id=test_user.id))
+    db_session.commit()
+    assert fuzzy.suggest(test_user.id, 'hobit') == 'The Hobbit'
+
+    # Another worker renames the book; only the version tells this one
+    db_session.execute(db.update(Book).values(title='The Silmarillion'))
+    db_session.execute(db.update(User).values(library_version=User.library_version + 1))
+    db_session.commit()
+    redis_client.delete(f'library_version:{test_user.id}')
+    assert fuzzy.suggest(test_user.id, 'silmarilion') == 'The Silmarillion'
+    assert fuzzy.suggest(test_user.id, 'hobit') is None
+
+def test_large_index_follows_changes_quickly(db_session, test_user, monkeypatch):
+    """Test a search after a change re-indexes only that book, with 50k books"""
+    words = ['river', 'shadow', 'garden', 'empire', 'winter', 'silver', 'forest', 'night',
+             'storm', 'glass', 'ember', 'harbor', 'crown', 'stone', 'iron', 'ocean']
+    db_session.execute(db.insert(Book), [
+        {'title': f'{words[i % 16]} {words[i // 16 % 16]} {words[i // 256 % 16]} {i}',
+         'authors': f'Author {i % 5000}', 'status': 'read', 'user_id': test_user.id}
+        for i in range(50_000)
+    ])
+    db_session.commit()
+    fuzzy.match_scores(test_user.id, 'shadw garden')
+
+    book = Book.query.filter_by(user_id=test_user.id).first()
+    book.title = 'The Hobbit'
+    db_session.commit()
+    added = []
+    add = TrigramIndex.add
+    monkeypatch.setattr(TrigramIndex, 'add', lambda self, *args: added.append(args) or add(self, *args))
+    started = time.perf_counter()
+    assert book.id in fuzzy.match_scores(test_user.id, 'hobit')
+    assert time.perf_counter() - started < 0.5
+    assert [text for text, _, _ in added] == ['The Hobbit', book.authors]
+
+    started = time.perf_counter()
+    for _ in range(5):
+        fuzzy.match_scores(test_user.id, 'shadw garden')
+    assert (time.perf_counter() - started) / 5 < 0.5
@@ -0,0 +1,141 @@
+import threading
+import pytest
+from googleapiclient.errors import HttpError
+from utils import google_books
+from utils.circuit_breaker import CircuitOpenError
+
+def test_service_built_once(books_stub):
+    """Test the Books service is shared across calls"""
+    assert google_books.get_service() is google_books.get_service()
+
+def test_http_is_per_thread(books_stub):
+    """Test each thread gets its own reusable Http object"""
+    main_http = google_books.get_http()
+    assert google_books.get_http() is main_http
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(google_books.get_http()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main_http
+
+def test_search_volumes_against_stub(books_stub):
+    """Test searching through the shared client"""
+    result = google_books.search_volumes('python', start_index=0, max_results=5)
+    assert result['totalItems'] == 1000
+    assert len(result['items']) == 5
+
+    path, params, _ = books_stub.requests[-1]
+    assert path == '/books/v1/volumes'
+    assert params['q'] == ['python']
+    assert params['key'] == ['test-key']
+
+def test_get_volume_against_stub(books_stub):
+    """Test fetching a single volume through the shared client"""
+    result = google_books.get_volume('abc123')
+    assert result['id'] == 'abc123'
+    assert result['volumeInfo']['title'] == 'Stub Book abc123'
+
+def test_connections_are_reused(books_stub):
+    """Test repeated calls reuse a single keep-alive connection"""
+    for i in range(5):
+        google_books.get_volume(f'vol{i}')
+    assert books_stub.request_count == 5
+    assert books_stub.connection_count == 1
+
+def test_volume_cache_serves_fresh_entries(books_stub):
+    """Test a fresh cached volume is served without a request"""
+    first = google_books.get_volume('vol1')
+    second = google_books.get_volume('vol1')
+    assert first == second
+    assert books_stub.request_count == 1
+
+def test_stale_volume_revalidated_with_etag(books_stub, monkeypatch):
+    """Test stale entries are revalidated and a 304 reuses the cached body"""
+    from scripts.stub_books_server import make_volume
+    monkeypatch.setattr(google_books, 'volume_fresh_seconds', 0)
+    first = google_books.get_volume('vol1')
+    second = google_books.get_volume('vol1')
+    assert second == first
+    assert books_stub.request_count == 2
+    _, _, headers = books_stub.requests[-1]
+    assert headers['if-none-match'] == f'"{make_volume("vol1")["etag"]}"'
+
+    # A changed volume replaces the cached entry
+    books_stub.revisions['vol1'] = 1
+    google_books.get_volume('vol1')
+    entry = google_books.volume_cache.get('detail:vol1')
+    assert entry['etag'] == f'"{make_volume("vol1", 1)["etag"]}"'
+
+def test_get_volume_with_matching_etag_not_modified(books_stub):
+    """Test a caller etag that still matches raises VolumeNotModified"""
+    from scripts.stub_books_server import make_volume
+    import pytest
+    with pytest.raises(google_books.VolumeNotModified):
+        google_books.get_volume('vol2', etag=make_volume('vol2')['etag'])
+
+def test_calls_request_declared_fields(books_stub):
+    """Test each call type asks only for its declared fields"""
+    google_books.search_volumes('python', max_results=2)
+    detail = google_books.get_volume('vol1')
+    google_books.fetch_volume('vol2')
+
+    sent = [params['fields'][0] for _, params, _ in books_stub.requests]
+    assert sent == [google_books.FIELD_SPECS['search'],
+                    google_books.FIELD_SPECS['detail'],
+                    google_books.FIELD_SPECS['refresh']]
+    assert 'saleInfo' not in detail
+    assert 'printType' not in detail['volumeInfo']
+
+def test_call_stats_recorded(books_stub, monkeypatch):
+    """Test response bytes, parse time and 304s are recorded per call type"""
+    monkeypatch.setattr(google_books, 'volume_fresh_seconds', 0)
+    google_books.search_volumes('python', max_results=2)
+    google_books.get_volume('vol1')
+    google_books.get_volume('vol1')  # Revalidated, answered with 304
+
+    stats = google_books.call_stats.snapshot()
+    assert stats['search']['requests'] == 1
+    assert stats['search']['bytes'] > 0
+    assert stats['search']['parse_ms'] >= 0
+    assert stats['detail']['requests'] == 1
+    assert stats['detail']['not_modified'] == 1
+
+def test_stale_search_served_when_upstream_fails(books_stub, monkeypatch):
+    """Test a failed search falls back to the last cached page"""
+    monkeypatch.setattr(google_books.search_cache, 'ttl', -1)  # Stored already expired
+    fresh = google_books.search_volumes('python', max_results=5)
+
+    books_stub.fail_with = 503
+    result = google_books.search_volumes('python', max_results=5)
+    assert result['stale'] is True
+    assert result['items'] == fresh['items']
+    assert books_stub.request_count == 2
+    assert google_books.breaker.stats()['stale_served'] == 1
+
+def test_search_without_stale_copy_raises(books_stub):
+    """Test failures surface when nothing is cached"""
+    books_stub.fail_with = 503
+    with pytest.raises(HttpError):
+        google_books.search_volumes('python')
+    assert google_books.breaker.stats()['failures'] == 1
+
+def test_breaker_opens_and_skips_upstream(books_stub):
+    """Test an open breaker stops calling Google Books"""
+    google_books.breaker.configure(min_calls=2)
+    books_stub.fail_with = 503
+    for i in range(2):
+        with pytest.raises(HttpError):
+            google_books.get_volume(f'vol{i}')
+    assert google_books.breaker.state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        google_books.get_volume('vol9')
+    assert books_stub.request_count == 2
+
+def test_not_found_does_not_trip_breaker(books_stub):
+    """Test 404s are not treated as upstream failures"""
+    books_stub.fail_with = 404
+    with pytest.raises(HttpError):
+        google_books.get_volume('missing')
+    assert google_books.breaker.stats()['failures'] == 0
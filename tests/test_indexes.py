@@ -0,0 +1,95 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from werkzeug.security import generate_password_hash
+from models import Author, Book, Category, User, Volume, db
+from tests.utils import capture_statements, login_user
+
+USERS = 50
+BOOKS_PER_USER = 400
+STATUSES = ('to_read', 'reading', 'read')
+
+@pytest.fixture
+def large_library(db_session, test_user):
+    """20,000 books over 50 users, with planner statistics"""
+    users = [{'username': f'reader{i}', 'email': f'reader{i}@example.com',
+              'password': generate_password_hash('x', method='pbkdf2:sha256:1')}
+             for i in range(USERS - 1)]
+    db_session.execute(User.__table__.insert(), users)
+    user_ids = [test_user.id] + [u.id for u in User.query.filter(User.id != test_user.id)]
+
+    db_session.execute(Volume.__table__.insert(), [
+        {'google_books_id': f'vol{i}', 'title': f'Volume {i}', 'isbn13': None,
+         'updated_at': datetime(2024, 1, 1) + timedelta(minutes=i)}
+        for i in range(2000)
+    ])
+    start = datetime(2020, 1, 1)
+    rows = []
+    for u, user_id in enumerate(user_ids):
+        for i in range(BOOKS_PER_USER):
+            status = STATUSES[i % 3]
+            rows.append({
+                'user_id': user_id, 'title': f'Book {u}-{i}', 'authors': f'Author {i % 40}',
+                'status': status, 'google_books_id': f'vol{(u * 7 + i) % 2000}',
+                'created_at': start + timedelta(hours=i),
+                'date_read': start + timedelta(days=i) if status == 'read' and i % 5 else None
+            })
+    db_session.execute(Book.__table__.insert(), rows)
+    db_session.execute(Category.__table__.insert(), [{'name': f'Category {i}'} for i in range(20)])
+    db_session.execute(db.text('INSERT INTO book_categories SELECT id, id % 20 + 1 FROM books'))
+    db_session.execute(Author.__table__.insert(), [{'name': f'Author {i}'} for i in range(40)])
+    db_session.execute(db.text('INSERT INTO book_authors SELECT b.id, a.id, 0 FROM books b '
+                               'JOIN authors a ON a.name = b.authors'))
+    db_session.commit()
+    db_session.execute(db.text('ANALYZE'))
+    db_session.commit()
+
+def selects(client, url, **kwargs):
+    response, statements = capture_statements(client, url, **kwargs)
+    assert response.status_code == 200, url
+    return [(s, p) for s, p in statements if s.lstrip().upper().startswith('SELECT')]
+
+def query_plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+    return [row[3] for row in rows]
+
+def full_scans(statement, parameters):
+    """Plan steps that read a whole books or volumes table"""
+    return [step for step in query_plan(statement, parameters)
+            if re.match(r'SCAN (books|volumes)\b', step)]
+
+HOT_PAGES = [
+    '/',
+    '/shelf/read',
+    '/shelf/to_read',
+    '/stats/',
+    '/stats/?year=2020',
+    '/stats/?author=Author%203',
+    '/books/search?query=9780441013593',
+    '/books/category/Category 3',
+    '/books/author/Author 3',
+]
+
+def test_hot_queries_use_indexes(client, large_library):
+    """Test every query behind the main pages seeks an index instead of scanning"""
+    login_user(client, 'testuser', 'testpass123')
+    checked = 0
+    for url in HOT_PAGES:
+        for statement, parameters in selects(client, url):
+            if 'FROM books' not in statement and 'FROM volumes' not in statement:
+                continue
+            assert full_scans(statement, parameters) == [], f'{url}: {statement}'
+            checked += 1
+
+    # Later shelf pages seek to the cursor
+    html = client.get('/shelf/read').get_data(as_text=True)
+    next_url = re.search(r'data-next-url="([^"]+)"', html).group(1).replace('&amp;', '&')
+    for statement, parameters in selects(
+            client, next_url, headers={'X-Requested-With': 'XMLHttpRequest'}):
+        if 'FROM books' in statement:
+            plan = query_plan(statement, parameters)
+            assert not any(step.startswith(('SCAN books', 'SCAN volumes')) for step in plan), plan
+            # Rows come out of the index already in order
+            assert not any('TEMP B-TREE' in step for step in plan), plan
+            checked += 1
+    assert checked > 10
@@ -0,0 +1,63 @@
+from models import Book, Volume
+from utils import isbn
+from tests.utils import login_user
+
+def test_isbn_validation_and_conversion():
+    """Test checksums are enforced and both forms map to one ISBN-13"""
+    assert isbn.is_valid('0441013597')
+    assert isbn.is_valid('978-0-441-01359-3')
+    assert isbn.is_valid('080442957x')
+    assert not isbn.is_valid('0441013598')
+    assert not isbn.is_valid('9780441013594')
+
+    assert isbn.to_isbn13('0-441-01359-7') == '9780441013593'
+    assert isbn.to_isbn13('080442957X') == '9780804429573'
+    assert isbn.to_isbn10('9780441013593') == '0441013597'
+    assert isbn.to_isbn10('9791032305690') is None
+
+def test_parse_query():
+    """Test only queries that are an ISBN take the fast path"""
+    assert isbn.parse_query(' 978 0441 013593 ') == '9780441013593'
+    assert isbn.parse_query('isbn:0441013597') == '9780441013593'
+    assert isbn.parse_query('ISBN: "9780441013593"') == '9780441013593'
+    assert isbn.parse_query('1234567890') is None
+    assert isbn.parse_query('dune 0441013597') is None
+
+def test_duplicate_isbn_keeps_first_volume(db_session):
+    """Test a second volume with the same ISBN doesn't take over the lookup"""
+    first = Volume(google_books_id='v1', isbn='0441013597')
+    first.assign_normalized_isbn()
+    db_session.add(first)
+    db_session.commit()
+
+    second = Volume(google_books_id='v2', isbn13='9780441013593')
+    second.assign_normalized_isbn()
+    db_session.add(second)
+    db_session.commit()
+
+    assert first.normalized_isbn == '9780441013593'
+    assert second.normalized_isbn is None
+
+def test_isbn_search_resolves_locally(client, test_user, db_session, books_stub):
+    """Test a known ISBN is answered from the catalog without calling Google"""
+    volume = Volume(google_books_id='dune1', title='Dune', authors='Frank Herbert',
+                    isbn='0441013597', isbn13='9780441013593')
+    volume.assign_normalized_isbn()
+    db_session.add(volume)
+    db_session.add(Book(volume=volume, title='Dune', authors='Frank Herbert',
+                        status='reading', user_id=test_user.id))
+    db_session.commit()
+    login_user(client, 'testuser', 'testpass123')
+
+    response = client.get('/books/search?query=0-441-01359-7')
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'Dune' in html
+    assert 'Already in your library' in html
+    assert books_stub.requests == []
+
+def test_isbn_search_miss_asks_google(client, test_user, db_session, books_stub):
+    """Test an unknown ISBN goes to Google as a normalized isbn: query"""
+    login_user(client, 'testuser', 'testpass123')
+    client.get('/books/search?query=0441013597')
+    assert [params['q'] for _, params, _ in books_stub.requests] == [['isbn:9780441013593']]
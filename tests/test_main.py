@@ -1,3 +1,4 @@
+import re
 from models import User, Book
 from werkzeug.security import generate_password_hash
 from datetime import datetime
@@ -50,4 +51,22 @@ def test_index_with_books(auth_client, db_session):
     assert b'Test Book 1' in response.data
     assert b'Test Book 2' in response.data
     assert b'Author 1' in response.data
-    assert b'Author 2' in response.data
\ No newline at end of file
+    assert b'Author 2' in response.data
+
+def test_index_limits_shelves_and_counts_all(auth_client, db_session):
+    """Test each shelf shows its newest books while the badges count every book"""
+    user = User.query.filter_by(username='testuser').first()
+    for i in range(8):
+        db_session.add(Book(title=f'Queued {i}', authors='A', status='to_read',
+                            created_at=datetime(2024, 1, i + 1), user_id=user.id))
+    for i in range(3):
+        db_session.add(Book(title=f'Finished {i}', authors='B', status='read', user_id=user.id))
+    db_session.add(Book(title='Current', authors='C', status='reading', user_id=user.id))
+    db_session.commit()
+
+    html = auth_client.get('/').get_data(as_text=True)
+    assert [f'Queued {i}' in html for i in range(8)] == [False] * 3 + [True] * 5
+    assert 'Finished' not in html
+    assert 'Current' in html
+    badges = re.findall(r'rounded-pill">(\d+)<', html)
+    assert badges == ['8', '1', '3']
@@ -178,4 +178,36 @@ def test_rate_limit_integration(client, redis_client):
     # Verify login attempts were recorded
     assert 'login' in data
     assert data['login']['today_total'] >= 2  # At least one successful login and one failed login
-    assert '127.0.0.1' in data['login']['today_hits']
\ No newline at end of file
+    assert '127.0.0.1' in data['login']['today_hits']
+
+def test_cache_stats_api(auth_client):
+    """Test Google Books cache counters are exposed to admins"""
+    from tests.utils import login_user
+    from utils import google_books
+
+    google_books.search_cache.set('key', {'items': []})
+    google_books.search_cache.get('key')
+    google_books.search_cache.get('other')
+
+    login_user(auth_client, 'testuser', 'testpass123')
+    response = auth_client.get('/monitoring/api/cache')
+    assert response.status_code == 200
+    stats = response.get_json()['books_search']
+    assert stats['local_hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+
+def test_books_breaker_api(auth_client):
+    """Test the Google Books circuit breaker state is exposed to admins"""
+    from tests.utils import login_user
+
+    login_user(auth_client, 'testuser', 'testpass123')
+    response = auth_client.get('/monitoring/api/books-breaker')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['state'] == 'closed'
+    assert data['failures'] == 0
+
+    response = auth_client.get('/monitoring/rate-limits')
+    assert response.status_code == 200
+    assert b'Google Books Circuit Breaker' in response.data
@@ -0,0 +1,61 @@
+import pytest
+from utils.quota import QuotaExhausted, TokenBucket
+from utils import google_books
+
+def test_bucket_rejects_when_empty(redis_client):
+    """Test calls beyond the burst are rejected once the wait runs out"""
+    bucket = TokenBucket('test', rate=0.01, burst=3)
+    for _ in range(3):
+        bucket.acquire('search', wait=0)
+    with pytest.raises(QuotaExhausted):
+        bucket.acquire('search', wait=0)
+    assert bucket.stats()['priorities']['search'] == {'granted': 3, 'waited': 0, 'rejected': 1}
+
+def test_bucket_shared_between_workers(redis_client):
+    """Test two workers draw from the same Redis bucket"""
+    first = TokenBucket('test', rate=0.01, burst=2)
+    second = TokenBucket('test', rate=0.01, burst=2)
+    first.acquire('search', wait=0)
+    second.acquire('search', wait=0)
+    with pytest.raises(QuotaExhausted):
+        first.acquire('search', wait=0)
+
+def test_low_priority_leaves_reserve(redis_client):
+    """Test background calls cannot spend the tokens kept for searches"""
+    bucket = TokenBucket('test', rate=0.01, burst=10, reserves={'refresh': 0.5})
+    for _ in range(5):
+        bucket.acquire('refresh', wait=0)
+    with pytest.raises(QuotaExhausted):
+        bucket.acquire('refresh', wait=0)
+    for _ in range(5):
+        bucket.acquire('search', wait=0)
+
+def test_waits_for_refill(redis_client):
+    """Test a caller with a wait budget gets a token once it refills"""
+    bucket = TokenBucket('test', rate=50, burst=1)
+    bucket.acquire('refresh', wait=0)
+    bucket.acquire('refresh', wait=1)
+    assert bucket.stats()['priorities']['refresh']['waited'] == 1
+
+def test_local_fallback_without_redis(monkeypatch):
+    """Test the bucket still limits calls when Redis is unavailable"""
+    import routes.monitoring
+    monkeypatch.setattr(routes.monitoring, 'redis_client', routes.monitoring.DummyRedis())
+    bucket = TokenBucket('test', rate=0.01, burst=1)
+    assert bucket.stats()['backend'] == 'local'
+    bucket.acquire('search', wait=0)
+    with pytest.raises(QuotaExhausted):
+        bucket.acquire('search', wait=0)
+
+def test_quota_error_drains_bucket(books_stub, monkeypatch):
+    """Test a 429 from Google Books makes every worker back off"""
+    monkeypatch.setattr(google_books.quota, 'rate', 0.01)
+    monkeypatch.setitem(google_books.quota.waits, 'detail', 0)
+    books_stub.fail_with = 429
+    with pytest.raises(Exception):
+        google_books.get_volume('vol1')
+
+    books_stub.fail_with = None
+    with pytest.raises(QuotaExhausted):
+        google_books.get_volume('vol2')
+    assert books_stub.request_count == 1
@@ -0,0 +1,72 @@
+import re
+from models import Book, User, Volume, db
+from utils import search
+from tests.utils import login_user
+
+def shelf_titles(client, query):
+    html = client.get(f'/shelf/read?search={query}').get_data(as_text=True)
+    return re.findall(r'\[TEST\] [\w ]+?(?=\s*</a>)', html)
+
+def test_sqlite_backend_is_selected(app, db_session):
+    """Test the backend follows the dialect unless configured"""
+    assert search.get_backend().name == 'sqlite'
+    app.config['SHELF_SEARCH_BACKEND'] = 'like'
+    try:
+        assert search.get_backend().name == 'like'
+    finally:
+        app.config.pop('SHELF_SEARCH_BACKEND')
+
+def test_match_expression_quotes_input():
+    """Test FTS5 syntax in user input is treated as plain words"""
+    assert search.SqliteSearch.match_expression('dune OR "NEAR(x' ) == '"dune" "OR" "NEAR" "x"'
+    assert search.SqliteSearch.match_expression('  -*- ') == ''
+
+def test_fts_ranks_title_matches_first(auth_client, db_session, app, monkeypatch):
+    """Test bm25 weights put title matches ahead of description matches"""
+    user = User.query.filter_by(username='testuser').first()
+    db_session.add(Book(title='[TEST] Ocean Notes', authors='A', status='read', user_id=user.id,
+                        description='Tides and currents'))
+    db_session.add(Book(title='[TEST] Harbor Life', authors='B', status='read', user_id=user.id,
+                        description='A story set by the oceans'))
+    db_session.add(Book(title='[TEST] Desert', authors='C', status='read', user_id=user.id))
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+
+    # Stemming matches "oceans" for "ocean"
+    assert shelf_titles(auth_client, 'ocean') == ['[TEST] Ocean Notes', '[TEST] Harbor Life']
+
+    # Later pages continue from the last rank shown
+    monkeypatch.setitem(app.config, 'SHELF_PAGE_SIZE', 1)
+    html = auth_client.get('/shelf/read?search=ocean').get_data(as_text=True)
+    assert 'Found 2 books' in html
+    next_url = re.search(r'data-next-url="([^"]+)"', html).group(1).replace('&amp;', '&')
+    html = auth_client.get(next_url, headers={'X-Requested-With': 'XMLHttpRequest'}).get_data(as_text=True)
+    assert '[TEST] Harbor Life' in html
+    assert '[TEST] Ocean Notes' not in html
+    assert 'data-next-url' not in html
+
+def test_fts_follows_catalog_and_book_changes(auth_client, db_session):
+    """Test the triggers keep the index in step with books and volumes"""
+    user = User.query.filter_by(username='testuser').first()
+    volume = Volume(google_books_id='v1', title='Dune', description='Spice and sandworms')
+    book = Book(volume=volume, title='[TEST] Dune', authors='Frank Herbert',
+                status='read', user_id=user.id)
+    db_session.add(book)
+    db_session.commit()
+    login_user(auth_client, 'testuser', 'testpass123')
+    assert shelf_titles(auth_client, 'sandworms') == ['[TEST] Dune']
+
+    volume.description = 'Politics on Arrakis'
+    db_session.commit()
+    assert shelf_titles(auth_client, 'sandworms') == []
+    assert shelf_titles(auth_client, 'arrakis') == ['[TEST] Dune']
+
+    book.description_override = 'My notes about Café culture'
+    db_session.commit()
+    assert shelf_titles(auth_client, 'cafe') == ['[TEST] Dune']
+    assert shelf_titles(auth_client, 'arrakis') == []
+
+    db_session.delete(book)
+    db_session.commit()
+    count = db_session.execute(db.text('SELECT count(*) FROM books_search')).scalar()
+    assert count == 0
@@ -2,7 +2,7 @@ from models import User, Book
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 from sqlalchemy import text
-from tests.utils import get_csrf_token, login_user
+from tests.utils import capture_statements, get_csrf_token, login_user
 import json
 
 def test_shelf_view_empty(auth_client):
@@ -152,4 +152,97 @@ def test_shelf_search(auth_client, db_session):
     assert response.status_code == 200
     assert b'[TEST] Science Book' in response.data
     assert b'A science story' in response.data
-    assert b'[TEST] Fantasy Book' not in response.data
\ No newline at end of file
+    assert b'[TEST] Fantasy Book' not in response.data
+
+def test_shelf_reads_catalog_metadata(auth_client, db_session):
+    """Test shelf view and search use metadata from the shared volumes catalog"""
+    from models import Volume
+    user = User.query.filter_by(username='testuser').first()
+    volume = Volume(google_books_id='shared1', title='Dune', authors='Frank Herbert',
+                    description='Spice and sandworms', page_count=412)
+    db_session.add(volume)
+    db_session.add(Book(title='Dune', authors='Frank Herbert', status='read',
+                        volume=volume, user_id=user.id))
+    db_session.commit()
+
+    response = auth_client.get('/shelf/read')
+    assert b'Spice and sandworms' in response.data
+    assert b'412 pages' in response.data
+
+    response = auth_client.get('/shelf/read?search=sandworms')
+    assert b'Dune' in response.data
+
+def test_shelf_pages_with_cursor(auth_client, db_session, app, monkeypatch):
+    """Test shelves load a page at a time and scroll through every book once"""
+    import re
+    monkeypatch.setitem(app.config, 'SHELF_PAGE_SIZE', 2)
+    user = User.query.filter_by(username='testuser').first()
+    for i in range(5):
+        db_session.add(Book(title=f'[TEST] Read {i}', authors='Author', status='read',
+                            date_read=datetime(2024, 1, i + 1) if i != 2 else None,
+                            created_at=datetime(2023, 1, 1), user_id=user.id))
+    db_session.commit()
+
+    response = auth_client.get('/shelf/read')
+    html = response.get_data(as_text=True)
+    assert re.findall(r'\[TEST\] Read \d', html) == ['[TEST] Read 4', '[TEST] Read 3']
+
+    titles = []
+    next_url = re.search(r'data-next-url="([^"]+)"', html).group(1)
+    while next_url:
+        fragment = auth_client.get(next_url.replace('&amp;', '&'),
+                                   headers={'X-Requested-With': 'XMLHttpRequest'})
+        html = fragment.get_data(as_text=True)
+        assert '<html' not in html
+        titles += re.findall(r'\[TEST\] Read \d', html)
+        match = re.search(r'data-next-url="([^"]+)"', html)
+        next_url = match and match.group(1)
+
+    # Books without a read date come last
+    assert titles == ['[TEST] Read 1', '[TEST] Read 0', '[TEST] Read 2']
+
+    # A tampered cursor starts over instead of failing
+    response = auth_client.get('/shelf/read?after=not-a-cursor')
+    assert b'[TEST] Read 4' in response.data
+
+def test_shelf_pages_through_undated_books(auth_client, db_session, app, monkeypatch):
+    """Test paging continues past a page boundary among books without a read date"""
+    import re
+    monkeypatch.setitem(app.config, 'SHELF_PAGE_SIZE', 2)
+    user = User.query.filter_by(username='testuser').first()
+    for i in range(5):
+        db_session.add(Book(title=f'[TEST] Undated {i}', authors='Author', status='read',
+                            created_at=datetime(2023, 1, i + 1), user_id=user.id))
+    db_session.commit()
+
+    html = auth_client.get('/shelf/read').get_data(as_text=True)
+    titles = re.findall(r'\[TEST\] Undated \d', html)
+    next_url = re.search(r'data-next-url="([^"]+)"', html).group(1)
+    while next_url:
+        html = auth_client.get(next_url.replace('&amp;', '&'),
+                               headers={'X-Requested-With': 'XMLHttpRequest'}).get_data(as_text=True)
+        titles += re.findall(r'\[TEST\] Undated \d', html)
+        assert len(titles) <= 5, titles
+        match = re.search(r'data-next-url="([^"]+)"', html)
+        next_url = match and match.group(1)
+    assert titles == [f'[TEST] Undated {i}' for i in (4, 3, 2, 1, 0)]
+
+def test_shelf_loads_only_listed_columns(auth_client, db_session):
+    """Test list pages skip wide catalog columns and cut descriptions in SQL"""
+    from models import Volume
+    user = User.query.filter_by(username='testuser').first()
+    volume = Volume(google_books_id='wide1', title='Dune', description='x' * 5000,
+                    preview_link='https://example.com/preview')
+    db_session.add(Book(title='[TEST] Wide', authors='Author', status='read',
+                        volume=volume, user_id=user.id))
+    db_session.commit()
+
+    response, statements = capture_statements(auth_client, '/shelf/read')
+
+    html = response.get_data(as_text=True)
+    assert 'x' * 500 + '...' in html
+    assert 'x' * 501 not in html
+    book_queries = [s for s, _ in statements if 'FROM books' in s]
+    assert len(book_queries) == 1
+    assert 'preview_link' not in book_queries[0]
+    assert 'substr' in book_queries[0]
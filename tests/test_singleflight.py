@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from utils.cache import TwoTierCache
+from utils.singleflight import SingleFlight
+from utils import google_books
+
+def run_concurrently(count, target):
+    """Start count threads on target and wait for them"""
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+def test_concurrent_calls_coalesced():
+    """Test identical concurrent calls run the function once"""
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'answer': 42}
+
+    results, errors = run_concurrently(8, lambda: flight.do('key', slow))
+    assert len(calls) == 1
+    assert all(result == {'answer': 42} for result in results)
+    assert flight.stats()['coalesced'] == 7
+
+def test_errors_shared_with_waiters():
+    """Test waiters see the leader's exception"""
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.05)
+        raise ValueError('upstream down')
+
+    _, errors = run_concurrently(4, lambda: flight.do('key', failing))
+    assert all(isinstance(error, ValueError) for error in errors)
+
+def test_waits_for_other_worker(redis_client):
+    """Test a worker that loses the Redis lock reuses the winner's result"""
+    cache = TwoTierCache('flight')
+    flight = SingleFlight(poll_interval=0.01)
+    redis_client.set('singleflight:flight:key', 'other-worker', px=5000)
+
+    def other_worker_finishes():
+        time.sleep(0.05)
+        TwoTierCache('flight').set('key', {'from': 'other'})
+
+    threading.Thread(target=other_worker_finishes).start()
+    result = flight.do_cached('key', cache, lambda: pytest.fail('should not fetch'))
+    assert result == {'from': 'other'}
+    assert flight.stats()['remote_hits'] == 1
+
+def test_fetches_when_lock_holder_gives_up(redis_client):
+    """Test a released lock without a cached result falls back to fetching"""
+    cache = TwoTierCache('flight')
+    flight = SingleFlight(poll_interval=0.01)
+    redis_client.set('singleflight:flight:key', 'other-worker', px=30)
+
+    result = flight.do_cached('key', cache, lambda: {'from': 'me'})
+    assert result == {'from': 'me'}
+    assert cache.get('key') == {'from': 'me'}
+
+def test_concurrent_searches_hit_api_once(books_stub):
+    """Test identical concurrent searches make one Google Books call"""
+    books_stub.latency = 0.1
+    results, errors = run_concurrently(
+        6, lambda: google_books.search_volumes('subject:"Fiction"', max_results=5))
+    assert errors == [None] * 6
+    assert books_stub.request_count == 1
+    assert all(result == results[0] for result in results)
@@ -1,3 +1,4 @@
+import re
 from models import User, Book
 from werkzeug.security import generate_password_hash
 from datetime import datetime
@@ -97,4 +98,18 @@ def test_dashboard_categories(auth_client, db_session):
     assert b'Fiction (2)' in response.data
     assert b'Fantasy (1)' in response.data
     assert b'Science Fiction (1)' in response.data
-  
\ No newline at end of file
+  
+def test_dashboard_uses_catalog_page_counts(auth_client, db_session):
+    """Test stats aggregate page counts and publishers from the shared catalog"""
+    from models import Volume
+    user = User.query.filter_by(username='testuser').first()
+    volume = Volume(google_books_id='shared1', title='Dune', authors='Frank Herbert',
+                    page_count=412, publisher='Chilton', categories='Fiction')
+    db_session.add(volume)
+    db_session.add(Book(title='Dune', authors='Frank Herbert', status='read',
+                        date_read=datetime(2024, 1, 1), volume=volume, user_id=user.id))
+    db_session.commit()
+
+    response = auth_client.get('/stats/')
+    assert re.search(rb'Total Pages Read</span>\s*<span class="badge[^"]*">412</span>', response.data)
+    assert re.search(rb'Most Read Publisher</span>\s*<span class="badge[^"]*">Chilton</span>', response.data)
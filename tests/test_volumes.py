@@ -0,0 +1,89 @@
+from models import Book, User, Volume
+from utils.volumes import extract_isbns, normalize_volume
+
+VOLUME = {
+    'id': 'vol1',
+    'etag': 'abc',
+    'saleInfo': {'isEbook': True},
+    'volumeInfo': {
+        'title': 'Dune',
+        'authors': ['Frank Herbert'],
+        'description': '<p>Desert <b>planet</b> &amp; spice.</p>',
+        'industryIdentifiers': [
+            {'type': 'OTHER', 'identifier': 'OCLC:123'},
+            {'type': 'ISBN_13', 'identifier': '9780441013593'},
+            {'type': 'ISBN_10', 'identifier': '0441013597'}
+        ],
+        'imageLinks': {'thumbnail': 'http://example.com/t.jpg'}
+    }
+}
+
+def test_extract_isbns():
+    """Test both ISBN types are read from one pass over the identifiers"""
+    assert extract_isbns(VOLUME['volumeInfo']) == {'isbn': '0441013597', 'isbn13': '9780441013593'}
+    assert extract_isbns({}) == {}
+
+def test_normalize_volume_for_display():
+    """Test search/detail normalization fills display placeholders"""
+    book = normalize_volume(VOLUME)
+    assert book['id'] == 'vol1'
+    assert book['description'] == 'Desert planet & spice.'
+    assert book['isbn13'] == '9780441013593'
+    assert book['is_ebook'] is True
+    assert book['publisher'] == ''
+
+    empty = normalize_volume({'id': 'vol2'})
+    assert empty['title'] == 'Unknown Title'
+    assert empty['authors'] == ['Unknown Author']
+    assert empty['isbn'] == ''
+
+def test_normalize_volume_without_placeholders():
+    """Test the edit preview leaves missing fields empty"""
+    book = normalize_volume({'id': 'vol2'}, placeholders=False)
+    assert book['title'] is None
+    assert book['authors'] == []
+    assert book['thumbnail'] is None
+
+def test_update_from_google_books_uses_normalizer(db_session):
+    """Test refreshed volumes get the cleaned description and both ISBNs"""
+    book = Book(title='Dune', authors='Frank Herbert', isbn='old')
+    book.update_from_google_books(VOLUME)
+    assert book.description == 'Desert planet & spice.'
+    assert book.isbn == '0441013597'
+    assert book.isbn13 == '9780441013593'
+
+    book.update_from_google_books({'id': 'vol1', 'volumeInfo': {}})
+    assert book.isbn == '0441013597'  # Kept when Google lists no ISBN
+
+def test_volume_shared_between_users(db_session, test_user):
+    """Test two users' copies of a volume store its metadata once"""
+    other = User(username='other', email='other@example.com', password='x')
+    db_session.add(other)
+    first = Book(title='Dune', authors='Frank Herbert', user_id=test_user.id)
+    second = Book(title='Dune', authors='Frank Herbert', user_id=other.id)
+    first.update_from_google_books(VOLUME)
+    second.update_from_google_books(VOLUME)
+    db_session.add_all([first, second])
+    db_session.commit()
+
+    assert Volume.query.count() == 1
+    assert first.volume is second.volume
+    assert first.description_override is None
+    assert second.thumbnail == 'http://example.com/t.jpg'
+
+def test_override_only_stored_when_different(db_session, test_user):
+    """Test edits that match the catalog do not store another copy"""
+    book = Book(title='Dune', authors='Frank Herbert', user_id=test_user.id)
+    book.update_from_google_books(VOLUME)
+    db_session.add(book)
+    db_session.commit()
+
+    book.description = 'Desert planet & spice.'
+    book.page_count = '412'
+    assert book.description_override is None
+    assert book.page_count_override == '412'
+    db_session.commit()
+
+    found = Book.with_volume().filter(Book.description.ilike('%spice%')).all()
+    assert found == [book]
+    assert book.volume.description == 'Desert planet & spice.'
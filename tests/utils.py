@@ -1,4 +1,6 @@
 """Test utilities and helper functions"""
+from sqlalchemy import event
+from models import db
 
 def get_csrf_token(response):
     """Extract CSRF token from response"""
@@ -15,4 +17,16 @@ def login_user(client, username, password):
         'username': username,
         'password': password,
         'csrf_token': csrf_token
-    }, follow_redirects=True) 
\ No newline at end of file
+    }, follow_redirects=True) 
+
+def capture_statements(client, url, **kwargs):
+    """GET ``url``; returns the response and the ``(statement, parameters)`` it ran"""
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url, **kwargs)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, statements
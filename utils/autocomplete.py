@@ -0,0 +1,203 @@
+"""In-memory prefix index for search box suggestions.
+
+Titles and authors are kept in one sorted list of normalized keys, so a
+lookup is a ``bisect`` to the first key with the typed prefix followed by a
+short scan. Every word start of a title gets its own key, which lets
+"rings" find "The Lord of the Rings".
+
+Each worker builds its index from the shared ``volumes`` catalog on first
+use, sorting the whole batch once, and then only pulls volumes updated
+since its last sync. Books added
+through this worker and titles seen in recent search results are added
+directly.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+
+DEFAULT_SYNC_SECONDS = 60
+# Keys examined per lookup before ranking; bounds the cost of short prefixes
+SCAN_LIMIT = 200
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted array of (key, position, text, kind) entries"""
+
+    def __init__(self, max_recent=5000):
+        self._entries = []
+        self._seen = set()
+        # Search-result entries are capped; the oldest are dropped first
+        # unless the catalog has the same text (pinned)
+        self._recent = deque()
+        self._pinned = set()
+        self.max_recent = max_recent
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, text, kind):
+        words = normalize(text).split(' ')
+        if kind == 'author':
+            # Authors are matched on their full name or surname
+            starts = {0, len(words) - 1}
+        else:
+            starts = range(len(words))
+        for position in sorted(starts):
+            yield ' '.join(words[position:]), position
+
+    def _entries_for(self, text, kind):
+        text = ' '.join((text or '').split())
+        if not text:
+            return text, []
+        return text, [(key, position, text, kind) for key, position in self._keys(text, kind)]
+
+    def add(self, text, kind='title', recent=False):
+        """Index ``text``; returns False if it was already present"""
+        text, entries = self._entries_for(text, kind)
+        if not entries:
+            return False
+        with self._lock:
+            if not recent:
+                self._pinned.add((text, kind))
+            if (text, kind) in self._seen:
+                return False
+            self._seen.add((text, kind))
+            for entry in entries:
+                insort(self._entries, entry)
+            if recent:
+                self._recent.append((text, kind, entries))
+                while len(self._recent) > self.max_recent:
+                    self._remove(*self._recent.popleft())
+        return True
+
+    def _remove(self, text, kind, entries):
+        if (text, kind) in self._pinned:
+            return
+        self._seen.discard((text, kind))
+        for entry in entries:
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    @staticmethod
+    def _texts(title, authors):
+        yield title, 'title'
+        if isinstance(authors, str):
+            authors = authors.split(',')
+        for author in authors or ():
+            yield author, 'author'
+
+    def add_volume(self, title, authors, recent=False):
+        """Index a title and its comma-separated or list of authors"""
+        for text, kind in self._texts(title, authors):
+            self.add(text, kind, recent=recent)
+
+    def add_volumes(self, volumes):
+        """Index many ``(title, authors)`` pairs from the catalog.
+
+        The new entries are appended and the list sorted once, which is
+        linear for a small batch and n log n for a first build, where an
+        ``insort`` per key would be quadratic.
+        """
+        batch = [(kind, *self._entries_for(text, kind))
+                 for title, authors in volumes for text, kind in self._texts(title, authors)]
+        with self._lock:
+            added = []
+            for kind, text, entries in batch:
+                if not entries:
+                    continue
+                self._pinned.add((text, kind))
+                if (text, kind) in self._seen:
+                    continue
+                self._seen.add((text, kind))
+                added.extend(entries)
+            if added:
+                self._entries.extend(added)
+                self._entries.sort()
+        return len(added)
+
+    def search(self, prefix, limit=8):
+        """Suggestions starting with ``prefix``; whole-string matches rank first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = []
+        with self._lock:
+            i = bisect_left(self._entries, (prefix,))
+            while i < len(self._entries) and len(matches) < SCAN_LIMIT:
+                key, position, text, kind = self._entries[i]
+                if not key.startswith(prefix):
+                    break
+                matches.append((position, len(text), text, kind))
+                i += 1
+
+        suggestions = []
+        seen = set()
+        for _, _, text, kind in sorted(matches):
+            if (text, kind) in seen:
+                continue
+            seen.add((text, kind))
+            suggestions.append({'text': text, 'kind': kind})
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self._recent.clear()
+            self._pinned.clear()
+
+
+index = PrefixIndex()
+sync_seconds = DEFAULT_SYNC_SECONDS
+_synced_at = 0.0
+_watermark = None
+_sync_lock = threading.Lock()
+
+
+def sync():
+    """Pull catalog volumes added or updated since the last sync"""
+    global _synced_at, _watermark
+    from models import Volume, db
+    with _sync_lock:
+        if time.monotonic() - _synced_at < sync_seconds:
+            return
+        query = db.session.query(Volume.title, Volume.authors, Volume.updated_at)
+        if _watermark is not None:
+            query = query.filter(Volume.updated_at >= _watermark)
+        volumes = []
+        for title, authors, updated_at in query.yield_per(1000):
+            volumes.append((title, authors))
+            if updated_at is not None and (_watermark is None or updated_at > _watermark):
+                _watermark = updated_at
+        index.add_volumes(volumes)
+        _synced_at = time.monotonic()
+
+
+def suggest(prefix, limit=8):
+    """Suggestions for the search box; requires an app context"""
+    sync()
+    return index.search(prefix, limit)
+
+
+def reset():
+    """Forget everything so the next lookup rebuilds from the catalog"""
+    global _synced_at, _watermark
+    with _sync_lock:
+        index.clear()
+        _synced_at = 0.0
+        _watermark = None
+
+
+def init_app(app):
+    global sync_seconds
+    sync_seconds = app.config.get('AUTOCOMPLETE_SYNC_SECONDS', sync_seconds)
+    index.max_recent = app.config.get('AUTOCOMPLETE_MAX_RECENT', index.max_recent)
@@ -0,0 +1,434 @@
+"""In-process BM25 search over each user's library.
+
+A pure-Python engine for databases without full-text search, selected with
+``SHELF_SEARCH_BACKEND=bm25``. Each user's books go into an inverted index
+with one posting list per field and term; a posting list is a flat
+``array('I')`` of ``book, term frequency`` pairs. Text is unaccented,
+lowercased, split into words, stripped of English stop words and stemmed,
+like ``books_fts_config``. Ranking is BM25 per field, with the field
+weights the other backends use, and every word of the query must match.
+
+Indexes are saved under ``SHELF_SEARCH_INDEX_DIR`` (``instance/search``), one
+JSON snapshot per user, so a new worker loads instead of rebuilding. Committed
+changes to books and volumes append the affected book ids to the user's
+journal file there; every worker replays new journal entries before a
+search, re-reading just those books, so a change in one worker reaches all
+of them on a shared disk. ``flask books reindex-search`` rebuilds from the
+database and starts fresh journals. A worker's threads share one index per
+user and take that user's lock to replay, save or search it.
+"""
+import heapq
+import math
+import json
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from functools import lru_cache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Book, Volume, db
+from utils.stemmer import stem
+
+FIELDS = ('title', 'authors', 'description', 'categories')
+K1 = 1.2
+B = 0.75
+# Removed books stay in the postings until this share of the index is dead
+COMPACT_RATIO = 0.25
+# Journal bytes replayed before the snapshot is saved again
+SAVE_BYTES = 4096
+FORMAT = 2
+
+# PostgreSQL's english.stop list
+STOP_WORDS = frozenset('''
+    i me my myself we our ours ourselves you your yours yourself yourselves he
+    him his himself she her hers herself it its itself they them their theirs
+    themselves what which who whom this that these those am is are was were be
+    been being have has had having do does did doing a an the and but if or
+    because as until while of at by for with about against between into through
+    during before after above below to from up down in out on off over under
+    again further then once here there when where why how all any both each few
+    more most other some such no nor not only own same so than too very s t can
+    will just don should now
+'''.split())
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def unaccent(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# A library's vocabulary is small next to its word count
+_stem = lru_cache(maxsize=100_000)(stem)
+
+
+def tokenize(text):
+    """Index terms of ``text``, in order, repeats included"""
+    return [_stem(word) for word in _WORD_RE.findall(unaccent((text or '').lower()))
+            if word not in STOP_WORDS]
+
+
+class LibraryIndex:
+    """Inverted index of one user's books.
+
+    Documents are numbered densely; removing a book only marks its number
+    dead, and ``compact()`` drops dead numbers from the postings once they
+    make up ``COMPACT_RATIO`` of the index. Until then they still count in
+    the document frequencies and average lengths, which shifts scores only
+    slightly.
+    """
+
+    def __init__(self):
+        self.book_ids = array('q')
+        self.lengths = [array('I') for _ in FIELDS]
+        self.totals = [0] * len(FIELDS)
+        self.postings = [{} for _ in FIELDS]
+        self.df = {}
+        self.docs = {}
+        self.dead = 0
+        # Journal bytes applied, and applied as of the saved snapshot
+        self.journal_offset = 0
+        self.saved_offset = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, book_id):
+        return book_id in self.docs
+
+    def add(self, book_id, texts):
+        """Index a book from its field texts, replacing any earlier version"""
+        self.remove(book_id)
+        doc = len(self.book_ids)
+        self.book_ids.append(book_id)
+        self.docs[book_id] = doc
+        seen = set()
+        for field, text in enumerate(texts):
+            terms = tokenize(text)
+            self.lengths[field].append(len(terms))
+            self.totals[field] += len(terms)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            postings = self.postings[field]
+            for term, count in counts.items():
+                postings.setdefault(term, array('I')).extend((doc, count))
+                if term not in seen:
+                    seen.add(term)
+                    self.df[term] = self.df.get(term, 0) + 1
+
+    def remove(self, book_id):
+        doc = self.docs.pop(book_id, None)
+        if doc is None:
+            return
+        self.book_ids[doc] = -1
+        self.dead += 1
+        if self.dead >= COMPACT_RATIO * len(self.book_ids) and self.dead > 10:
+            self.compact()
+
+    def compact(self):
+        """Renumber the live documents and rebuild postings without the dead ones"""
+        renumber = {}
+        book_ids = array('q')
+        lengths = [array('I') for _ in FIELDS]
+        for doc, book_id in enumerate(self.book_ids):
+            if book_id >= 0:
+                renumber[doc] = len(book_ids)
+                book_ids.append(book_id)
+                for field in range(len(FIELDS)):
+                    lengths[field].append(self.lengths[field][doc])
+        df = {}
+        for field, postings in enumerate(self.postings):
+            for term in list(postings):
+                old = postings[term]
+                kept = array('I')
+                for i in range(0, len(old), 2):
+                    doc = renumber.get(old[i])
+                    if doc is not None:
+                        kept.append(doc)
+                        kept.append(old[i + 1])
+                if kept:
+                    postings[term] = kept
+                else:
+                    del postings[term]
+        for postings in self.postings:
+            for term, entries in postings.items():
+                # Counted once per document across fields
+                df.setdefault(term, set()).update(entries[::2])
+        self.df = {term: len(docs) for term, docs in df.items()}
+        self.book_ids = book_ids
+        self.lengths = lengths
+        self.totals = [sum(field_lengths) for field_lengths in lengths]
+        self.docs = {book_id: doc for doc, book_id in enumerate(book_ids)}
+        self.dead = 0
+
+    def search(self, terms, weights, limit=1000):
+        """``{book_id: score}`` for the best books containing every word of ``terms``"""
+        words = set(tokenize(terms))
+        if not words or not self.docs:
+            return {}
+        n = len(self.book_ids)
+        averages = [total / n for total in self.totals]
+
+        matches = []
+        for word in words:
+            df = self.df.get(word)
+            if not df:
+                return {}
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            scores = {}
+            for field, weight in enumerate(weights):
+                entries = self.postings[field].get(word)
+                if not entries or not averages[field]:
+                    continue
+                lengths = self.lengths[field]
+                scale = K1 / averages[field]
+                base = K1 * (1 - B)
+                factor = weight * idf * (K1 + 1)
+                it = iter(entries)
+                for doc, tf in zip(it, it):
+                    score = factor * tf / (tf + base + B * scale * lengths[doc])
+                    scores[doc] = scores.get(doc, 0.0) + score
+            matches.append(scores)
+
+        # Intersect, starting from the rarest word
+        matches.sort(key=len)
+        combined = matches[0]
+        for scores in matches[1:]:
+            combined = {doc: score + scores[doc] for doc, score in combined.items() if doc in scores}
+        book_ids = self.book_ids
+        best = heapq.nlargest(limit, ((score, doc) for doc, score in combined.items()
+                                      if book_ids[doc] >= 0))
+        return {book_ids[doc]: score for score, doc in best}
+
+    def to_data(self):
+        """The index as plain lists and dicts, for a JSON snapshot"""
+        return {
+            'format': FORMAT,
+            'book_ids': self.book_ids.tolist(),
+            'lengths': [lengths.tolist() for lengths in self.lengths],
+            'postings': [{term: entries.tolist() for term, entries in postings.items()}
+                         for postings in self.postings],
+            'df': self.df,
+            'journal_offset': self.journal_offset,
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        if data.get('format') != FORMAT:
+            raise ValueError('Search index snapshot has an old format')
+        index = cls()
+        index.book_ids = array('q', data['book_ids'])
+        index.lengths = [array('I', lengths) for lengths in data['lengths']]
+        if len(index.lengths) != len(FIELDS) or \
+                any(len(lengths) != len(index.book_ids) for lengths in index.lengths):
+            raise ValueError('Search index snapshot is inconsistent')
+        index.totals = [sum(lengths) for lengths in index.lengths]
+        index.postings = [{term: array('I', entries) for term, entries in postings.items()}
+                          for postings in data['postings']]
+        index.df = {term: int(count) for term, count in data['df'].items()}
+        index.docs = {book_id: doc for doc, book_id in enumerate(index.book_ids) if book_id >= 0}
+        index.dead = len(index.book_ids) - len(index.docs)
+        index.journal_offset = index.saved_offset = int(data['journal_offset'])
+        return index
+
+
+def _rows(user_id, book_ids=None):
+    """``(book_id, title, authors, description, categories)`` of the user's books"""
+    query = db.session.query(Book.id, *(getattr(Book, field) for field in FIELDS))\
+        .outerjoin(Book.volume)\
+        .filter(Book.user_id == user_id)
+    if book_ids is not None:
+        query = query.filter(Book.id.in_(book_ids))
+    return query.yield_per(1000)
+
+
+def build_index(user_id):
+    index = LibraryIndex()
+    for book_id, *texts in _rows(user_id):
+        index.add(book_id, texts)
+    return index
+
+
+class IndexStore:
+    """Snapshots and change journals on disk, one pair per user"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._user_locks = {}
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.RLock())
+
+    def _path(self, user_id, suffix):
+        return os.path.join(self.directory, f'{int(user_id)}.{suffix}')
+
+    def is_tracked(self, user_id):
+        """Whether the user has an index whose journal needs their changes"""
+        return self.directory is not None and os.path.exists(self._path(user_id, 'log'))
+
+    def load(self, user_id):
+        try:
+            with open(self._path(user_id, 'idx'), 'rb') as f:
+                return LibraryIndex.from_data(json.load(f))
+        except (OSError, ValueError, TypeError, KeyError, AttributeError, OverflowError):
+            return None
+
+    def save(self, user_id, index):
+        os.makedirs(self.directory, exist_ok=True)
+        index.saved_offset = index.journal_offset
+        path = self._path(user_id, 'idx')
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index.to_data(), f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    def log(self, user_id, book_ids):
+        """Append changed book ids to the user's journal"""
+        os.makedirs(self.directory, exist_ok=True)
+        data = ''.join(f'{book_id}\n' for book_id in book_ids).encode()
+        # One write with O_APPEND, so concurrent workers don't interleave lines
+        fd = os.open(self._path(user_id, 'log'), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def read_log(self, user_id, offset):
+        """Book ids logged after ``offset``, and the offset after them"""
+        try:
+            with open(self._path(user_id, 'log'), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return set(), offset
+        # Leave a line still being written for next time
+        end = data.rfind(b'\n') + 1
+        return {int(line) for line in data[:end].split()}, offset + end
+
+    def build(self, user_id):
+        """Index the user's books from the database and save the snapshot"""
+        with self._user_lock(user_id):
+            # Start the journal first: changes committed from here on are logged,
+            # and earlier ones are already in the database the build reads
+            self.log(user_id, [])
+            _, offset = self.read_log(user_id, 0)
+            index = build_index(user_id)
+            index.journal_offset = offset
+            self.save(user_id, index)
+            return index
+
+    def get(self, user_id):
+        """The user's index, caught up with the journal"""
+        with self._user_lock(user_id):
+            return self._current(user_id)
+
+    def search(self, user_id, terms, weights, limit=1000):
+        with self._user_lock(user_id):
+            return self._current(user_id).search(terms, weights, limit)
+
+    def _current(self, user_id):
+        # Called with the user's lock held
+        with self._lock:
+            index = self._indexes.get(user_id)
+        if index is None:
+            index = self.load(user_id) or self.build(user_id)
+        changed, offset = self.read_log(user_id, index.journal_offset)
+        if changed:
+            found = set()
+            for book_id, *texts in _rows(user_id, changed):
+                index.add(book_id, texts)
+                found.add(book_id)
+            for book_id in changed - found:
+                index.remove(book_id)
+            index.journal_offset = offset
+            # Save now and then so new workers have little to replay
+            if offset - index.saved_offset >= SAVE_BYTES:
+                self.save(user_id, index)
+        with self._lock:
+            self._indexes[user_id] = index
+        return index
+
+    def reset(self, user_id):
+        """Forget the user's index, in this worker and on disk"""
+        with self._user_lock(user_id):
+            with self._lock:
+                self._indexes.pop(user_id, None)
+            for suffix in ('idx', 'log'):
+                try:
+                    os.remove(self._path(user_id, suffix))
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+store = IndexStore()
+
+
+def search(user_id, terms, weights, limit=1000):
+    return store.search(user_id, terms, weights, limit)
+
+
+def rebuild(user_ids):
+    """Rebuild and save the indexes of ``user_ids`` from the database"""
+    for user_id in user_ids:
+        store.reset(user_id)
+        store.build(user_id)
+
+
+def init_app(app):
+    store.directory = app.config.get('SHELF_SEARCH_INDEX_DIR') or os.path.join(app.instance_path, 'search')
+    store.clear()
+
+
+# Changed books are logged once their transaction commits
+def _pending(session):
+    return session.info.setdefault('bm25_changes', set())
+
+
+@event.listens_for(Book, 'after_insert')
+@event.listens_for(Book, 'after_update')
+@event.listens_for(Book, 'after_delete')
+def _book_changed(mapper, connection, target):
+    session = db.inspect(target).session
+    if session is not None and target.user_id is not None:
+        _pending(session).add((target.user_id, target.id))
+
+
+@event.listens_for(Volume, 'after_update')
+def _volume_changed(mapper, connection, target):
+    """Catalog text shows in every copy of the volume"""
+    session = db.inspect(target).session
+    if session is None:
+        return
+    rows = connection.execute(
+        db.select(Book.user_id, Book.id).where(Book.google_books_id == target.google_books_id))
+    _pending(session).update(tuple(row) for row in rows)
+
+
+@event.listens_for(Session, 'after_commit')
+def _log_changes(session):
+    changes = session.info.pop('bm25_changes', None)
+    if not changes:
+        return
+    by_user = {}
+    for user_id, book_id in changes:
+        by_user.setdefault(user_id, []).append(book_id)
+    # Users who have never searched have no index to update
+    for user_id, book_ids in by_user.items():
+        if store.is_tracked(user_id):
+            store.log(user_id, book_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('bm25_changes', None)
@@ -0,0 +1,196 @@
+"""Two-tier caching: a bounded in-process LRU in front of shared Redis.
+
+Values must be JSON-serializable. The local tier is limited both by entry
+count and by the total serialized size of its values; the Redis tier is
+shared by every worker and expires entries with the same TTL.
+
+With ``stale_ttl`` set, entries are kept that much longer after they stop
+being fresh so ``get_stale`` can serve them when the upstream is down.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+import redis
+
+
+def get_redis():
+    """Shared Redis client, or None when Redis is unavailable"""
+    # Looked up on each call so tests can swap in FakeRedis
+    from routes import monitoring
+    if isinstance(monitoring.redis_client, monitoring.DummyRedis):
+        return None
+    return monitoring.redis_client
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry expiry and a total byte budget"""
+
+    def __init__(self, max_entries=256, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, ttl):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size, time.time() + ttl)
+            self.bytes += size
+            while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+
+class TwoTierCache:
+    """Local LRU tier backed by a shared Redis tier"""
+
+    def __init__(self, name, ttl=600, max_entries=256, max_bytes=8 * 1024 * 1024,
+                 max_item_bytes=512 * 1024, stale_ttl=0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_item_bytes = max_item_bytes
+        self.local = LRUCache(max_entries, max_bytes)
+        self.counters = {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'sets': 0}
+
+    def configure(self, ttl=None, max_entries=None, max_bytes=None, max_item_bytes=None,
+                  stale_ttl=None):
+        """Apply settings from app config; keeps current values for None"""
+        if ttl is not None:
+            self.ttl = ttl
+        if max_entries is not None:
+            self.local.max_entries = max_entries
+        if max_bytes is not None:
+            self.local.max_bytes = max_bytes
+        if max_item_bytes is not None:
+            self.max_item_bytes = max_item_bytes
+        if stale_ttl is not None:
+            self.stale_ttl = stale_ttl
+
+    def _redis_key(self, key):
+        return f'cache:{self.name}:{key}'
+
+    def _count(self, counter):
+        self.counters[counter] += 1
+
+    def _lookup(self, key):
+        """Return the stored (fresh_until, value) envelope from either tier"""
+        envelope = self.local.get(key)
+        if envelope is not None:
+            return envelope, 'local'
+
+        client = get_redis()
+        if client is None:
+            return None, None
+        try:
+            payload = client.get(self._redis_key(key))
+        except redis.RedisError:
+            return None, None
+        if payload is None:
+            return None, None
+        envelope = tuple(json.loads(payload))
+        remaining = envelope[0] + self.stale_ttl - time.time()
+        if remaining > 0:
+            self.local.set(key, envelope, len(payload), remaining)
+        return envelope, 'redis'
+
+    def get(self, key):
+        """Look up a fresh value in the local tier, then Redis; None on miss"""
+        envelope, tier = self._lookup(key)
+        if envelope is not None and envelope[0] > time.time():
+            self._count(f'{tier}_hits')
+            return envelope[1]
+        self._count('misses')
+        return None
+
+    def get_shared(self, key):
+        """Read a fresh value without touching the hit/miss counters"""
+        envelope, _ = self._lookup(key)
+        if envelope is not None and envelope[0] > time.time():
+            return envelope[1]
+        return None
+
+    def get_stale(self, key):
+        """Return a value even if it is past its TTL but not yet discarded"""
+        envelope, _ = self._lookup(key)
+        return envelope[1] if envelope is not None else None
+
+    def set(self, key, value):
+        envelope = (time.time() + self.ttl, value)
+        payload = json.dumps(envelope, separators=(',', ':'))
+        if len(payload) > self.max_item_bytes:
+            return
+        storage_ttl = self.ttl + self.stale_ttl
+        self.local.set(key, envelope, len(payload), storage_ttl)
+        self._count('sets')
+
+        client = get_redis()
+        if client is not None:
+            try:
+                client.setex(self._redis_key(key), int(storage_ttl), payload)
+            except redis.RedisError:
+                pass
+
+    def delete(self, key):
+        self.local.delete(key)
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self._redis_key(key))
+            except redis.RedisError:
+                pass
+
+    def clear(self):
+        """Clear the local tier and reset counters"""
+        self.local.clear()
+        for counter in self.counters:
+            self.counters[counter] = 0
+
+    def stats(self):
+        lookups = self.counters['local_hits'] + self.counters['redis_hits'] + self.counters['misses']
+        hits = lookups - self.counters['misses']
+        return {
+            **self.counters,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'entries': len(self.local),
+            'bytes': self.local.bytes,
+            'evictions': self.local.evictions,
+            'ttl': self.ttl
+        }
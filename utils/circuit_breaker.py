@@ -0,0 +1,128 @@
+"""Circuit breaker for calls to an unreliable upstream service.
+
+The breaker tracks outcomes over a rolling time window. Once enough calls
+have been made and the failure rate crosses the threshold it opens and
+rejects calls immediately with CircuitOpenError, so worker threads are not
+tied up waiting on timeouts. After ``open_seconds`` it lets a limited
+number of probe calls through (half-open); a successful probe closes it
+again, a failed one reopens it.
+"""
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the breaker is open"""
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failure_rate=0.5, min_calls=10, window_seconds=60,
+                 open_seconds=30, half_open_probes=1, is_failure=None):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.is_failure = is_failure or (lambda error: True)
+        self.state = CLOSED
+        self.counters = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0, 'stale_served': 0}
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    def configure(self, **settings):
+        """Apply settings from app config; keeps current values for None"""
+        for name, value in settings.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    def call(self, func):
+        """Run ``func`` through the breaker"""
+        self._before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if self.is_failure(e):
+                self._record(False)
+            else:
+                self._record(True)
+            raise
+        self._record(True)
+        return result
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.counters['rejected'] += 1
+                    raise CircuitOpenError(f'{self.name} circuit is open')
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.counters['rejected'] += 1
+                    raise CircuitOpenError(f'{self.name} circuit is half-open')
+                self._probes += 1
+
+    def _record(self, ok):
+        now = time.monotonic()
+        with self._lock:
+            self.counters['successes' if ok else 'failures'] += 1
+            if self.state == HALF_OPEN:
+                self._probes -= 1
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+            if self.state == CLOSED and self._current_failure_rate() >= self.failure_rate \
+                    and len(self._outcomes) >= self.min_calls:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self.counters['opened'] += 1
+        self._outcomes.clear()
+
+    def _current_failure_rate(self):
+        if not self._outcomes:
+            return 0.0
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return failures / len(self._outcomes)
+
+    def record_stale_served(self):
+        with self._lock:
+            self.counters['stale_served'] += 1
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._probes = 0
+            self._outcomes.clear()
+            for counter in self.counters:
+                self.counters[counter] = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                **self.counters,
+                'window_calls': len(self._outcomes),
+                'window_failure_rate': round(self._current_failure_rate(), 3),
+                'failure_rate_threshold': self.failure_rate,
+                'open_seconds': self.open_seconds
+            }
@@ -0,0 +1,117 @@
+"""Conditional GETs for library pages.
+
+A library page depends only on the user's library version and the view's
+parameters, so its ETag can be worked out before the view runs. A browser
+revalidating a page it already has gets a 304 without any of the page's
+queries or template rendering.
+
+The tag also covers what the layout shows besides the library: the
+username, the templates, and the session's CSRF token. That token is
+signed with a timestamp, so the tag changes every half of
+WTF_CSRF_TIME_LIMIT to keep a reused page's forms valid. A page carrying
+a flashed message, or one its view marks with ``untagged()`` such as an
+error page, is never tagged.
+"""
+import hashlib
+import json
+import os
+import time
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from utils import library_version
+
+# Cache-Control for each blueprint's responses, unless the view sets its own.
+# Library pages are per user and always revalidated, which the ETags make
+# cheap; account pages are not kept at all
+POLICIES = {
+    'main': 'private, no-cache',
+    'shelf': 'private, no-cache',
+    'stats': 'private, no-cache',
+    'books': 'private, no-cache',
+    'profile': 'private, no-store',
+    'admin': 'private, no-store',
+}
+
+# Digest of the templates, so a deploy that changes them changes every tag
+release = ''
+
+
+def page_etag(name, params):
+    """Weak ETag of the current user's ``name`` page with these parameters"""
+    generate_csrf()
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT')
+    window = int(time.time() // (limit / 2)) if limit else 0
+    parts = [
+        release, current_user.id, current_user.username, current_user.is_admin,
+        library_version.get(current_user.id),
+        session.get(current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')), window,
+        name, params
+    ]
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def untagged():
+    """Keep this response from being tagged, e.g. a page rendered after an error"""
+    g.untagged = True
+
+
+def request_params(**kwargs):
+    """The view's arguments and query string"""
+    return dict(kwargs, args=sorted(request.args.items(multi=True)))
+
+
+def conditional(name, params=request_params):
+    """Tag the view's page with a weak ETag and answer a matching
+    ``If-None-Match`` with 304 before the view runs.
+
+    ``params`` gets the view's arguments and returns what else the page
+    depends on besides the library (by default the arguments and query
+    string), or None to leave the request alone.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_authenticated or '_flashes' in session:
+                return view(*args, **kwargs)
+            view_params = params(**kwargs)
+            if view_params is None:
+                return view(*args, **kwargs)
+
+            etag = page_etag(name, view_params)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or g.pop('untagged', False):
+                    return response
+            response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def apply_policy(response):
+    policy = POLICIES.get(request.blueprint)
+    if policy and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+        response.vary.add('Cookie')
+    return response
+
+
+def templates_digest(app):
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            digest.update(os.path.relpath(path, app.root_path).encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def init_app(app):
+    global release
+    release = templates_digest(app)
+    app.after_request(apply_policy)
@@ -0,0 +1,196 @@
+"""Cover image cache.
+
+Covers are fetched from Google's image servers once per volume and size and
+stored on disk by the SHA-256 of their bytes, so identical images (such as
+Google's "no cover" placeholder) are stored once. A small key file maps
+``volume_id/size/version`` to the content hash, which doubles as the ETag.
+
+When the cache grows past ``max_bytes`` (blobs and key files together),
+the least recently served files are deleted; a key whose blob is gone is
+simply fetched again.
+
+Resizing uses Pillow, which requirements.txt installs; where it is missing
+every size is served as the original image.
+"""
+import hashlib
+import io
+import os
+import threading
+from urllib.parse import urlsplit, urlunsplit
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # Serve covers unresized rather than fail
+    Image = None
+
+# Width in pixels for each size; Google's own thumbnails are 128px wide
+SIZES = {'small': 80, 'thumb': 128}
+ALLOWED_HOSTS = ('books.google.com', 'books.googleusercontent.com')
+CONTENT_URL = 'https://books.google.com/books/content?id={volume_id}&printsec=frontcover&img=1&zoom=1'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+FETCH_TIMEOUT = 5
+
+_local = threading.local()
+
+
+def allowed_host(hostname):
+    """Whether a cover may be fetched from ``hostname``: Google's hosts or their subdomains"""
+    return bool(hostname) and any(hostname == host or hostname.endswith('.' + host)
+                                  for host in ALLOWED_HOSTS)
+
+
+def source_url(volume_id, url=None):
+    """HTTPS cover URL from the catalog, or Google's standard content URL"""
+    if not url:
+        return CONTENT_URL.format(volume_id=volume_id)
+    parts = urlsplit(url)
+    if not allowed_host(parts.hostname):
+        return None
+    return urlunsplit(('https',) + tuple(parts[1:]))
+
+
+def cover_version(etag):
+    """URL version of a volume's cover; it changes with the volume's etag"""
+    return hashlib.sha1(etag.encode()).hexdigest()[:10] if etag else ''
+
+
+def get_session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _local.session = session
+    return session
+
+
+def fetch_image(url):
+    """Download an image; returns (bytes, content_type)"""
+    response = get_session().get(url, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    content_type = response.headers.get('Content-Type', 'image/jpeg').split(';')[0]
+    if not content_type.startswith('image/'):
+        raise ValueError(f'Not an image: {content_type}')
+    return response.content, content_type
+
+
+def resize(data, content_type, width):
+    """Scale an image down to ``width``; returns it unchanged without Pillow"""
+    if Image is None:
+        return data, content_type
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width <= width:
+            return data, content_type
+        height = round(image.height * width / image.width)
+        resized = image.convert('RGB').resize((width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        resized.save(out, 'JPEG', quality=85, optimize=True)
+        return out.getvalue(), 'image/jpeg'
+
+
+class CoverCache:
+    """Content-addressed blobs on disk with a total size budget"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def _key_path(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, 'keys', digest[:2], digest)
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.directory, 'blobs', content_hash[:2], content_hash)
+
+    @staticmethod
+    def _write(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        """Return (content_hash, content_type, path) or None"""
+        key_path = self._key_path(key)
+        try:
+            with open(key_path) as f:
+                content_hash, content_type = f.read().split()
+        except (OSError, ValueError):
+            return None
+        path = self._blob_path(content_hash)
+        try:
+            # Mark as recently used for eviction
+            os.utime(path)
+            os.utime(key_path)
+        except OSError:
+            return None
+        return content_hash, content_type, path
+
+    def put(self, key, data, content_type):
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+        added = 0
+        if not os.path.exists(path):
+            self._write(path, data)
+            added += len(data)
+        key_path = self._key_path(key)
+        record = f'{content_hash} {content_type}'.encode()
+        if not os.path.exists(key_path):
+            added += len(record)
+        self._write(key_path, record)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += added
+        self.evict()
+        return content_hash, content_type, path
+
+    def _files(self):
+        """Blobs and key files"""
+        for kind in ('blobs', 'keys'):
+            root = os.path.join(self.directory, kind)
+            if not os.path.isdir(root):
+                continue
+            for shard in os.scandir(root):
+                if shard.is_dir():
+                    for entry in os.scandir(shard.path):
+                        if not entry.name.endswith('.tmp'):
+                            yield entry
+
+    def size(self):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(entry.stat().st_size for entry in self._files())
+            return self._bytes
+
+    def evict(self):
+        """Delete least recently used files until the cache fits its budget"""
+        if self.size() <= self.max_bytes:
+            return 0
+        with self._lock:
+            files = sorted(((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                            for entry in self._files()))
+            total = sum(size for _, size, _ in files)
+            # Free a little extra so every new cover doesn't trigger a scan
+            target = self.max_bytes * 0.9
+            removed = 0
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._bytes = total
+            return removed
+
+
+cache = CoverCache(os.path.join('instance', 'covers'))
+
+
+def init_app(app):
+    cache.directory = app.config.get('COVER_CACHE_DIR') or os.path.join(app.instance_path, 'covers')
+    cache.max_bytes = app.config.get('COVER_CACHE_MAX_BYTES', cache.max_bytes)
@@ -0,0 +1,61 @@
+"""Cached HTML fragments of library pages.
+
+The book lists on the home, shelf and stats pages are cached per user,
+keyed on the user's library version and the view's parameters. A change
+to the library bumps the version, so it makes new keys rather than
+invalidating old ones, and stale entries age out. A hit skips both the
+view's queries and the template rendering.
+
+Forms inside a fragment get their CSRF token when the page is served, not
+when the fragment was cached.
+"""
+import hashlib
+import json
+from flask import render_template
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from utils import library_version
+from utils.cache import TwoTierCache
+
+CSRF_PLACEHOLDER = '__fragment_csrf_token__'
+
+cache = TwoTierCache('fragments', ttl=10 * 60, max_entries=1024, max_bytes=32 * 1024 * 1024)
+enabled = True
+
+
+def render(template, **context):
+    """Render a fragment template for caching, with a placeholder CSRF token"""
+    return render_template(template, csrf_token=lambda: CSRF_PLACEHOLDER, **context)
+
+
+def markup(html):
+    """A cached fragment ready for the page, with this session's CSRF token"""
+    return Markup(html.replace(CSRF_PLACEHOLDER, generate_csrf()))
+
+
+def cache_key(user_id, name, params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f'{user_id}:{library_version.get(user_id)}:{name}:{digest}'
+
+
+def cached(user_id, name, params, build):
+    """``build()``'s value for this user, view and parameters, from the cache
+    while the user's library is unchanged. The value must be JSON-serializable."""
+    if not enabled:
+        return build()
+    key = cache_key(user_id, name, params)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value)
+    return value
+
+
+def init_app(app):
+    global enabled
+    enabled = app.config.get('FRAGMENT_CACHE_ENABLED', True)
+    cache.configure(
+        ttl=app.config.get('FRAGMENT_CACHE_TTL'),
+        max_entries=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES'),
+        max_bytes=app.config.get('FRAGMENT_CACHE_MAX_BYTES')
+    )
@@ -0,0 +1,171 @@
+"""Typo-tolerant matching of titles and authors with trigrams.
+
+PostgreSQL does this with pg_trgm; this module is the fallback for other
+databases. Trigrams are taken the way pg_trgm takes them (each lowercased
+word padded with two spaces in front and one behind), and a text's score
+is the share of the query's trigrams it contains, like pg_trgm's
+``word_similarity``. "tolkein" still finds "J. R. R. Tolkien", and "hobb"
+finds "The Hobbit".
+
+Each worker keeps one index per user, tagged with the user's library
+version. When the version has moved on, whichever worker made the change,
+the index re-reads the user's titles and authors and re-indexes only the
+books whose text differs; it is built in full only on first use.
+"""
+import re
+import threading
+from collections import Counter, defaultdict
+from models import Book, db
+from utils import library_version
+
+# Share of the query's trigrams a title or author must contain
+THRESHOLD = 0.5
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def trigrams(text):
+    grams = set()
+    for word in _WORD_RE.findall((text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Distinct titles and authors with the books they belong to"""
+
+    def __init__(self):
+        self._entries = {}
+        self._texts = []
+        self._sizes = []
+        self._postings = defaultdict(list)
+        self.books = {}
+
+    def __len__(self):
+        return len(self._texts)
+
+    @staticmethod
+    def _book_texts(title, authors):
+        yield title, 'title'
+        for author in (authors or '').split(','):
+            yield author, 'author'
+
+    def put(self, book_id, title, authors):
+        """Index a book's title and authors, replacing its earlier ones"""
+        if self.books.get(book_id) == (title, authors):
+            return False
+        self.discard(book_id)
+        self.books[book_id] = (title, authors)
+        for text, kind in self._book_texts(title, authors):
+            self.add(text, kind, book_id)
+        return True
+
+    def discard(self, book_id):
+        old = self.books.pop(book_id, None)
+        if old is None:
+            return
+        for text, kind in self._book_texts(*old):
+            entry = self._entries.get((' '.join((text or '').split()), kind))
+            if entry is not None and book_id in self._texts[entry][2]:
+                # The text stays in the postings for a later book that has it
+                self._texts[entry][2].remove(book_id)
+
+    def add(self, text, kind, book_id):
+        text = ' '.join((text or '').split())
+        if not text:
+            return
+        entry = self._entries.get((text, kind))
+        if entry is None:
+            entry = len(self._texts)
+            self._entries[(text, kind)] = entry
+            grams = trigrams(text)
+            self._texts.append((text, kind, []))
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(entry)
+        self._texts[entry][2].append(book_id)
+
+    def search(self, terms, threshold=THRESHOLD, limit=20):
+        """Best matches as ``(score, text, kind, book_ids)``, best first"""
+        query = trigrams(terms)
+        if not query:
+            return []
+        counts = Counter()
+        for gram in query:
+            counts.update(self._postings.get(gram, ()))
+        minimum = threshold * len(query)
+        # Equal scores: prefer the text with fewer extra trigrams
+        ranked = sorted(
+            ((count / len(query), -self._sizes[entry], entry)
+             for entry, count in counts.items() if count >= minimum and self._texts[entry][2]),
+            reverse=True
+        )[:limit]
+        return [(score, *self._texts[entry]) for score, _, entry in ranked]
+
+
+_indexes = {}
+_lock = threading.Lock()
+_user_locks = {}
+
+
+def _user_lock(user_id):
+    with _lock:
+        return _user_locks.setdefault(user_id, threading.Lock())
+
+
+def sync_index(index, user_id):
+    """Bring ``index`` up to date with the user's books; returns the books re-indexed"""
+    rows = db.session.query(Book.id, Book.title, Book.authors)\
+        .filter(Book.user_id == user_id)\
+        .yield_per(1000)
+    changed = 0
+    current = set()
+    for book_id, title, authors in rows:
+        current.add(book_id)
+        changed += index.put(book_id, title, authors)
+    for book_id in set(index.books) - current:
+        index.discard(book_id)
+        changed += 1
+    return changed
+
+
+def _search(user_id, terms, limit):
+    with _user_lock(user_id):
+        # Read first, so a change committed during the sync moves it on again
+        version = library_version.get(user_id)
+        with _lock:
+            cached = _indexes.get(user_id)
+        if cached is None:
+            cached = (None, TrigramIndex())
+        if cached[0] != version:
+            sync_index(cached[1], user_id)
+            with _lock:
+                _indexes[user_id] = (version, cached[1])
+        return cached[1].search(terms, limit=limit)
+
+
+def match_scores(user_id, terms, max_books=500):
+    """``{book_id: score}`` for the user's books whose title or author is close"""
+    scores = {}
+    for score, _, _, book_ids in _search(user_id, terms, max_books):
+        for book_id in book_ids:
+            if book_id not in scores:
+                scores[book_id] = score
+        if len(scores) >= max_books:
+            break
+    return scores
+
+
+def suggest(user_id, terms):
+    """Closest title or author to ``terms``, or None"""
+    matches = _search(user_id, terms, 1)
+    return matches[0][1] if matches else None
+
+
+def invalidate(user_id=None):
+    with _lock:
+        if user_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(user_id, None)
@@ -0,0 +1,358 @@
+"""Shared Google Books API client.
+
+The service object is built once per worker process from the discovery
+document bundled with google-api-python-client instead of on every request.
+httplib2 connections are not thread-safe, so each thread keeps its own
+keep-alive ``Http`` instance and reuses it for every call.
+
+Search result pages are cached in a two-tier cache (see ``utils.cache``)
+keyed on the normalized query, start index and page size. Volumes are
+cached with their ETag; once an entry is older than the freshness window it
+is revalidated with a conditional request, and a 304 simply renews it.
+
+Cache misses are coalesced (see ``utils.singleflight``) so concurrent
+identical calls, within a worker or across workers, reach Google once.
+
+Every call asks only for the fields its caller uses (``FIELD_SPECS``, in
+Google's partial-response syntax) and records response size and JSON
+parse time per call type.
+
+All calls pass through a circuit breaker (see ``utils.circuit_breaker``).
+When Google is failing or the breaker is open, searches and volumes fall
+back to the last cached copy, returned with ``'stale': True``.
+
+Before a request goes out it takes a token from the cluster-wide quota
+bucket (see ``utils.quota``). Searches have first claim on the quota, then
+detail lookups, then background refreshes, which wait their turn rather
+than eat into what interactive requests need.
+"""
+import hashlib
+import os
+import threading
+import time
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from utils.cache import TwoTierCache
+from utils.circuit_breaker import CircuitBreaker
+from utils.quota import QuotaExhausted, TokenBucket
+from utils.singleflight import SingleFlight
+
+DEFAULT_TIMEOUT = 5
+DEFAULT_VOLUME_FRESH_SECONDS = 60 * 60
+
+VOLUME_INFO_FIELDS = (
+    'title,authors,publisher,publishedDate,description,industryIdentifiers,'
+    'pageCount,categories,language,imageLinks(thumbnail,smallThumbnail),'
+    'previewLink,infoLink'
+)
+VOLUME_INFO_REFRESH_FIELDS = VOLUME_INFO_FIELDS + ',printType,maturityRating,canonicalVolumeLink,contentVersion'
+
+# Partial-response field specs, one per call type
+FIELD_SPECS = {
+    'search': f'totalItems,items(id,etag,selfLink,saleInfo/isEbook,volumeInfo({VOLUME_INFO_REFRESH_FIELDS}))',
+    'detail': f'id,volumeInfo({VOLUME_INFO_FIELDS})',
+    'refresh': f'id,etag,selfLink,saleInfo/isEbook,volumeInfo({VOLUME_INFO_REFRESH_FIELDS})',
+}
+
+search_cache = TwoTierCache('books_search', stale_ttl=24 * 60 * 60)
+volume_cache = TwoTierCache('books_volume', ttl=7 * 24 * 60 * 60)
+volume_fresh_seconds = DEFAULT_VOLUME_FRESH_SECONDS
+coalescer = SingleFlight()
+# Reserves are fractions of the bucket a priority must leave for those above it
+quota = TokenBucket(
+    'google_books',
+    reserves={'search': 0.0, 'detail': 0.2, 'refresh': 0.5},
+    waits={'search': 2.0, 'detail': 2.0, 'refresh': 60.0}
+)
+timeout = float(os.getenv('GOOGLE_BOOKS_TIMEOUT', DEFAULT_TIMEOUT))
+
+
+def is_upstream_failure(error):
+    """Whether an error means Google Books itself is unhealthy"""
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500 or error.resp.status == 429
+    return True
+
+
+def describe_error(error):
+    """User-facing explanation of a failed Google Books call"""
+    if isinstance(error, QuotaExhausted):
+        return 'Book searches are very busy right now. Please try again in a few seconds.'
+    if is_upstream_failure(error):
+        return 'Google Books is not responding right now. Please try again in a few minutes.'
+    return 'Google Books could not complete the request.'
+
+
+breaker = CircuitBreaker('google_books', is_failure=is_upstream_failure)
+
+
+class VolumeNotModified(Exception):
+    """The caller's ETag still matches and there is no cached body to return"""
+
+
+class CallStats:
+    """Response size and parse time per call type"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _entry(self, call):
+        return self._calls.setdefault(call, {'requests': 0, 'not_modified': 0,
+                                             'bytes': 0, 'parse_seconds': 0.0})
+
+    def record(self, call, size, parse_seconds):
+        with self._lock:
+            entry = self._entry(call)
+            entry['requests'] += 1
+            entry['bytes'] += size
+            entry['parse_seconds'] += parse_seconds
+
+    def record_not_modified(self, call):
+        with self._lock:
+            self._entry(call)['not_modified'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for call, entry in self._calls.items():
+                requests = entry['requests'] or 1
+                result[call] = {
+                    'requests': entry['requests'],
+                    'not_modified': entry['not_modified'],
+                    'bytes': entry['bytes'],
+                    'avg_bytes': entry['bytes'] // requests,
+                    'parse_ms': round(entry['parse_seconds'] * 1000, 3),
+                    'avg_parse_ms': round(entry['parse_seconds'] * 1000 / requests, 3)
+                }
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+
+call_stats = CallStats()
+
+_service = None
+_service_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_timeout():
+    """HTTP timeout in seconds for calls to Google Books"""
+    return timeout
+
+
+def get_http():
+    """Return this thread's keep-alive Http object, creating it on first use"""
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = httplib2.Http(timeout=get_timeout())
+        _local.http = http
+    return http
+
+
+def get_service():
+    """Return the process-wide Books service, building it on first use"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                client_options = None
+                # Allows pointing the client at a local stub server
+                api_url = os.getenv('GOOGLE_BOOKS_API_URL')
+                if api_url:
+                    client_options = {'api_endpoint': api_url}
+                _service = build_from_document(
+                    get_static_doc('books', 'v1'),
+                    http=get_http(),
+                    developerKey=os.getenv('GOOGLE_BOOKS_API_KEY'),
+                    client_options=client_options
+                )
+    return _service
+
+
+def reset_client():
+    """Drop the cached service and this thread's connections"""
+    global _service
+    with _service_lock:
+        _service = None
+    http = getattr(_local, 'http', None)
+    if http is not None:
+        http.close()
+        _local.http = None
+
+
+def execute(request, call=None, priority=None):
+    """Execute an API request on the calling thread's pooled connection.
+
+    With ``call`` set, the response size and parse time are recorded
+    under that call type. A quota token is taken at ``priority``, which
+    defaults to the call type.
+    """
+    if call is not None:
+        postproc = request.postproc
+
+        def timed_postproc(resp, content):
+            started = time.perf_counter()
+            result = postproc(resp, content)
+            call_stats.record(call, len(content), time.perf_counter() - started)
+            return result
+        request.postproc = timed_postproc
+    quota.acquire(priority or call or 'detail')
+    try:
+        return breaker.call(lambda: request.execute(http=get_http()))
+    except HttpError as e:
+        if e.resp.status == 429:
+            # Over quota already; make every worker back off
+            quota.drain()
+        raise
+
+
+def normalize_query(query):
+    """Canonical form of a search query for cache keys"""
+    return ' '.join(query.lower().split())
+
+
+def search_cache_key(query, start_index, max_results, order_by='relevance'):
+    raw = f'{normalize_query(query)}|{start_index}|{max_results}|{order_by}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def search_volumes(query, start_index=0, max_results=40, order_by='relevance'):
+    """Run a volumes().list search, serving repeated pages from the cache.
+
+    If Google is unavailable, the last cached page is returned marked stale.
+    """
+    key = search_cache_key(query, start_index, max_results, order_by)
+    result = search_cache.get(key)
+    if result is not None:
+        return result
+
+    def fetch():
+        request = get_service().volumes().list(
+            q=query,
+            startIndex=start_index,
+            maxResults=max_results,
+            orderBy=order_by,
+            fields=FIELD_SPECS['search']
+        )
+        return execute(request, call='search')
+    try:
+        return coalescer.do_cached(key, search_cache, fetch)
+    except Exception as e:
+        stale = search_cache.get_stale(key) if is_upstream_failure(e) else None
+        if stale is None:
+            raise
+        breaker.record_stale_served()
+        return {**stale, 'stale': True}
+
+
+def quote_etag(etag):
+    """Format a stored volume etag for an If-None-Match header"""
+    if not etag or etag.startswith(('"', 'W/')):
+        return etag
+    return f'"{etag}"'
+
+
+def fetch_volume(volume_id, etag=None, call='refresh', priority=None):
+    """Fetch a volume, conditionally if an ETag is given.
+
+    Returns ``(volume, etag)``; ``volume`` is None when the server answered
+    304 Not Modified.
+    """
+    request = get_service().volumes().get(volumeId=volume_id, fields=FIELD_SPECS[call])
+    if etag:
+        request.headers['If-None-Match'] = etag
+    headers = {}
+    request.add_response_callback(headers.update)
+    try:
+        volume = execute(request, call=call, priority=priority)
+    except HttpError as e:
+        if e.resp.status == 304:
+            call_stats.record_not_modified(call)
+            return None, etag
+        raise
+    return volume, headers.get('etag') or quote_etag(volume.get('etag'))
+
+
+def get_volume(volume_id, etag=None, call='detail', priority=None):
+    """Return a volume resource, revalidating stale cache entries.
+
+    ``call`` selects the field spec; entries are cached per call type.
+    ``priority`` overrides the quota priority, which defaults to ``call``.
+    ``etag`` is the caller's stored etag (e.g. ``Book.etag``). It is only
+    used when nothing is cached; if Google reports the volume unchanged,
+    VolumeNotModified is raised since there is no body to return.
+    """
+    key = f'{call}:{volume_id}'
+    entry = volume_cache.get(key)
+    if entry is not None:
+        if time.time() - entry['fetched_at'] < volume_fresh_seconds:
+            return entry['volume']
+        try:
+            volume, new_etag = coalescer.do(
+                f'volume:{key}', lambda: fetch_volume(volume_id, entry['etag'], call=call, priority=priority))
+        except Exception as e:
+            if not is_upstream_failure(e):
+                raise
+            breaker.record_stale_served()
+            return {**entry['volume'], 'stale': True}
+        if volume is None:
+            volume = entry['volume']
+    else:
+        send_etag = quote_etag(etag)
+        volume, new_etag = coalescer.do(
+            f'volume:{key}:{send_etag}', lambda: fetch_volume(volume_id, send_etag, call=call, priority=priority))
+        if volume is None:
+            raise VolumeNotModified(volume_id)
+
+    volume_cache.set(key, {'volume': volume, 'etag': new_etag, 'fetched_at': time.time()})
+    return volume
+
+
+def init_app(app):
+    """Configure the client, caches, circuit breaker and quota from the app config"""
+    global volume_fresh_seconds, timeout
+    timeout = app.config.get('GOOGLE_BOOKS_TIMEOUT', timeout)
+    search_cache.configure(
+        ttl=app.config.get('BOOKS_SEARCH_CACHE_TTL'),
+        max_entries=app.config.get('BOOKS_SEARCH_CACHE_MAX_ENTRIES'),
+        max_bytes=app.config.get('BOOKS_SEARCH_CACHE_MAX_BYTES'),
+        max_item_bytes=app.config.get('BOOKS_SEARCH_CACHE_MAX_ITEM_BYTES'),
+        stale_ttl=app.config.get('BOOKS_SEARCH_CACHE_STALE_TTL')
+    )
+    volume_cache.configure(
+        ttl=app.config.get('BOOKS_VOLUME_CACHE_TTL'),
+        max_entries=app.config.get('BOOKS_VOLUME_CACHE_MAX_ENTRIES')
+    )
+    volume_fresh_seconds = app.config.get('BOOKS_VOLUME_CACHE_FRESH_SECONDS',
+                                          DEFAULT_VOLUME_FRESH_SECONDS)
+    breaker.configure(
+        failure_rate=app.config.get('BOOKS_BREAKER_FAILURE_RATE'),
+        min_calls=app.config.get('BOOKS_BREAKER_MIN_CALLS'),
+        window_seconds=app.config.get('BOOKS_BREAKER_WINDOW_SECONDS'),
+        open_seconds=app.config.get('BOOKS_BREAKER_OPEN_SECONDS'),
+        half_open_probes=app.config.get('BOOKS_BREAKER_HALF_OPEN_PROBES')
+    )
+    quota.configure(
+        rate=app.config.get('BOOKS_QUOTA_RATE'),
+        burst=app.config.get('BOOKS_QUOTA_BURST'),
+        reserves={
+            'detail': app.config.get('BOOKS_QUOTA_DETAIL_RESERVE'),
+            'refresh': app.config.get('BOOKS_QUOTA_REFRESH_RESERVE')
+        },
+        waits={
+            'search': app.config.get('BOOKS_QUOTA_INTERACTIVE_WAIT'),
+            'detail': app.config.get('BOOKS_QUOTA_INTERACTIVE_WAIT'),
+            'refresh': app.config.get('BOOKS_QUOTA_REFRESH_WAIT')
+        }
+    )
+
+
+def cache_stats():
+    """Hit/miss counters for every Google Books cache"""
+    return {cache.name: cache.stats() for cache in (search_cache, volume_cache)}
@@ -0,0 +1,76 @@
+"""ISBN parsing, validation and normalization.
+
+Every ISBN-10 has an ISBN-13 form (``978`` prefix, new check digit), so
+ISBN-13 is used as the canonical key; ``979`` ISBNs have no ISBN-10.
+"""
+import re
+
+_SEPARATORS_RE = re.compile(r'[\s-]')
+_ISBN10_RE = re.compile(r'^\d{9}[\dX]$')
+_ISBN13_RE = re.compile(r'^97[89]\d{10}$')
+
+
+def clean(value):
+    """Strip spaces and hyphens and upper-case a trailing x"""
+    return _SEPARATORS_RE.sub('', value or '').upper()
+
+
+def isbn10_check_digit(digits):
+    total = sum((10 - i) * int(d) for i, d in enumerate(digits[:9]))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+
+def isbn13_check_digit(digits):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid(value):
+    value = clean(value)
+    if _ISBN10_RE.match(value):
+        return isbn10_check_digit(value) == value[9]
+    if _ISBN13_RE.match(value):
+        return isbn13_check_digit(value) == value[12]
+    return False
+
+
+def to_isbn13(value):
+    """Canonical ISBN-13 for a valid ISBN-10 or ISBN-13, else None"""
+    value = clean(value)
+    if not is_valid(value):
+        return None
+    if len(value) == 13:
+        return value
+    digits = '978' + value[:9]
+    return digits + isbn13_check_digit(digits)
+
+
+def to_isbn10(value):
+    """ISBN-10 form of a valid ISBN, or None (including for 979 ISBNs)"""
+    value = clean(value)
+    if not is_valid(value):
+        return None
+    if len(value) == 10:
+        return value
+    if not value.startswith('978'):
+        return None
+    digits = value[3:12]
+    return digits + isbn10_check_digit(digits)
+
+
+def parse_query(query):
+    """Canonical ISBN-13 if a search is just an ISBN, else None.
+
+    Accepts bare ISBNs as typed or scanned (``978-0-441-01359-3``) and
+    Google's ``isbn:`` keyword.
+    """
+    query = (query or '').strip()
+    if query[:5].lower() == 'isbn:':
+        query = query[5:].strip().strip('"\'')
+    return to_isbn13(query)
+
+
+def normalize(isbn13=None, isbn10=None):
+    """Lookup key for a volume from its stored identifiers"""
+    return to_isbn13(isbn13) or to_isbn13(isbn10)
@@ -0,0 +1,118 @@
+"""Per-user library version.
+
+A number that changes whenever anything shown about a user's library
+changes: a book is added, edited, moved to another shelf or removed, or
+the catalog entry of one of their books is refreshed. Caches put it in
+their keys instead of being invalidated.
+
+The count is ``users.library_version``, bumped in the same transaction as
+the change. Redis keeps a copy so a page can read it without a query; when
+the copy is missing or Redis is down, the database is read.
+"""
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import Book, User, Volume, db
+from utils.cache import get_redis
+
+# Seconds Redis keeps an idle user's copy
+TTL = 24 * 60 * 60
+
+users = User.__table__
+
+
+def _key(user_id):
+    return f'library_version:{user_id}'
+
+
+def publish(client, user_id, version):
+    """Store ``version`` in Redis unless a newer one is already there"""
+    key = _key(user_id)
+    for _ in range(3):
+        try:
+            with client.pipeline() as pipe:
+                pipe.watch(key)
+                current = pipe.get(key)
+                if current is not None and int(current) >= version:
+                    return
+                pipe.multi()
+                pipe.setex(key, TTL, version)
+                pipe.execute()
+                return
+        except redis.WatchError:
+            continue
+        except redis.RedisError:
+            return
+
+
+def get(user_id):
+    """The user's current library version"""
+    client = get_redis()
+    if client is not None:
+        try:
+            value = client.get(_key(user_id))
+        except redis.RedisError:
+            client = None
+        else:
+            if value is not None:
+                return int(value)
+    version = db.session.execute(
+        db.select(users.c.library_version).where(users.c.id == user_id)).scalar() or 0
+    if client is not None:
+        publish(client, user_id, version)
+    return version
+
+
+# Users whose libraries changed in the current flush
+def _pending(session):
+    return session.info.setdefault('library_changes', set())
+
+
+@event.listens_for(Book, 'after_insert')
+@event.listens_for(Book, 'after_update')
+@event.listens_for(Book, 'after_delete')
+def _book_changed(mapper, connection, target):
+    session = db.inspect(target).session
+    if session is not None and target.user_id is not None:
+        _pending(session).add(target.user_id)
+
+
+@event.listens_for(Volume, 'after_update')
+def _volume_changed(mapper, connection, target):
+    """Catalog data shows in every library holding the volume"""
+    session = db.inspect(target).session
+    if session is None:
+        return
+    rows = connection.execute(
+        db.select(Book.user_id).distinct().where(Book.google_books_id == target.google_books_id))
+    _pending(session).update(user_id for user_id, in rows if user_id is not None)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump(session, flush_context):
+    changed = session.info.pop('library_changes', None)
+    if not changed:
+        return
+    connection = session.connection()
+    connection.execute(users.update()
+                       .where(users.c.id.in_(changed))
+                       .values(library_version=users.c.library_version + 1))
+    rows = connection.execute(db.select(users.c.id, users.c.library_version)
+                              .where(users.c.id.in_(changed)))
+    session.info.setdefault('library_versions', {}).update(rows.all())
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_versions(session):
+    versions = session.info.pop('library_versions', None)
+    client = get_redis() if versions else None
+    if client is None:
+        return
+    for user_id, version in versions.items():
+        publish(client, user_id, version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('library_changes', None)
+    session.info.pop('library_versions', None)
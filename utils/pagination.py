@@ -0,0 +1,68 @@
+"""Keyset (seek) pagination.
+
+Instead of ``OFFSET``, each page continues from the sort key of the last
+row shown, so the database seeks straight to it through the index and page
+50 costs the same as page 1. The key is handed to the browser as an opaque
+cursor token.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from extensions import db
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+def _object_hook(value):
+    if '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), default=_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Key values from a cursor token, or None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(data, object_hook=_object_hook)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def keyset_page(query, key, cursor=None, per_page=50):
+    """Fetch one page of ``query`` ordered by ``key`` descending.
+
+    ``key`` is a list of column expressions that together are unique (end
+    it with the primary key); none of them may be NULL. ``query`` must
+    select a single entity; the key columns are added to it here.
+    """
+    query = query.add_columns(*key).order_by(*(column.desc() for column in key))
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(key):
+        query = query.filter(db.tuple_(*key) < db.tuple_(*values))
+
+    rows = query.limit(per_page + 1).all()
+    next_cursor = encode_cursor(rows[per_page - 1][1:]) if len(rows) > per_page else None
+    return Page([row[0] for row in rows[:per_page]], next_cursor)
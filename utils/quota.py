@@ -0,0 +1,165 @@
+"""Cluster-wide token bucket for outbound API calls.
+
+Every worker on every host draws from one bucket stored in Redis, so the
+combined call rate stays under the upstream quota no matter how many
+gunicorn processes are running. Tokens refill continuously at ``rate`` per
+second up to ``burst``.
+
+Callers acquire with a priority. Lower priorities must leave a reserve of
+tokens in the bucket (a fraction of ``burst``) that only higher priorities
+may spend, so a bulk job can drain the bucket down to its reserve but never
+take the tokens interactive requests need.
+
+The bucket is updated with an optimistic WATCH/MULTI transaction. When
+Redis is unavailable each worker falls back to an in-process bucket.
+"""
+import threading
+import time
+import redis
+from utils.cache import get_redis
+
+
+class QuotaExhausted(Exception):
+    """No token became available within the caller's wait budget"""
+
+
+class TokenBucket:
+    """Token bucket shared through Redis, with per-priority reserves"""
+
+    def __init__(self, name, rate=5.0, burst=20, reserves=None, waits=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        # Fraction of the bucket each priority has to leave untouched
+        self.reserves = reserves or {}
+        # Seconds each priority may wait for a token before giving up
+        self.waits = waits or {}
+        self.counters = {}
+        self._tokens = float(burst)
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def configure(self, rate=None, burst=None, reserves=None, waits=None):
+        """Apply settings from app config; keeps current values for None"""
+        if rate is not None:
+            self.rate = rate
+        if burst is not None:
+            self.burst = burst
+        for current, updates in ((self.reserves, reserves), (self.waits, waits)):
+            for priority, value in (updates or {}).items():
+                if value is not None:
+                    current[priority] = value
+
+    def _redis_key(self):
+        return f'quota:{self.name}'
+
+    def _count(self, priority, counter):
+        with self._lock:
+            counts = self.counters.setdefault(priority, {'granted': 0, 'waited': 0, 'rejected': 0})
+            counts[counter] += 1
+
+    def _refill(self, tokens, updated_at, now):
+        if tokens is None:
+            return float(self.burst)
+        return min(float(self.burst), tokens + max(0.0, now - updated_at) * self.rate)
+
+    def _take(self, tokens, floor):
+        """Return (new_tokens, seconds_to_wait) for one attempt"""
+        if tokens - 1 >= floor:
+            return tokens - 1, 0.0
+        return tokens, (floor + 1 - tokens) / self.rate
+
+    def _try_local(self, floor):
+        with self._lock:
+            now = time.time()
+            tokens = self._refill(self._tokens, self._updated_at, now)
+            self._tokens, wait = self._take(tokens, floor)
+            self._updated_at = now
+            return wait
+
+    def _try_redis(self, client, floor):
+        key = self._redis_key()
+        with client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    tokens, updated_at = pipe.hmget(key, 'tokens', 'updated_at')
+                    # Redis time keeps hosts with skewed clocks consistent
+                    seconds, micros = pipe.time()
+                    now = seconds + micros / 1e6
+                    tokens = self._refill(
+                        float(tokens) if tokens is not None else None,
+                        float(updated_at or now), now)
+                    tokens, wait = self._take(tokens, floor)
+                    pipe.multi()
+                    pipe.hset(key, mapping={'tokens': tokens, 'updated_at': now})
+                    # A full bucket is the same as no key at all
+                    pipe.expire(key, int(self.burst / self.rate) + 1)
+                    pipe.execute()
+                    return wait
+                except redis.WatchError:
+                    continue
+
+    def try_acquire(self, priority):
+        """Take a token if one is available; returns seconds to wait otherwise"""
+        floor = self.burst * self.reserves.get(priority, 0.0)
+        client = get_redis()
+        if client is not None:
+            try:
+                return self._try_redis(client, floor)
+            except redis.RedisError:
+                pass
+        return self._try_local(floor)
+
+    def acquire(self, priority, wait=None):
+        """Block until a token is granted or raise QuotaExhausted"""
+        wait = self.waits.get(priority, 0.0) if wait is None else wait
+        deadline = time.monotonic() + wait
+        waited = False
+        while True:
+            needed = self.try_acquire(priority)
+            if needed == 0:
+                self._count(priority, 'waited' if waited else 'granted')
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count(priority, 'rejected')
+                raise QuotaExhausted(f'{self.name} quota exhausted for {priority} calls')
+            waited = True
+            time.sleep(min(needed, remaining))
+
+    def drain(self):
+        """Empty the bucket, e.g. after the upstream reports a quota error"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated_at = time.time()
+        client = get_redis()
+        if client is not None:
+            try:
+                seconds, micros = client.time()
+                client.hset(self._redis_key(), mapping={
+                    'tokens': 0, 'updated_at': seconds + micros / 1e6})
+                client.expire(self._redis_key(), int(self.burst / self.rate) + 1)
+            except redis.RedisError:
+                pass
+
+    def reset(self):
+        with self._lock:
+            self._tokens = float(self.burst)
+            self._updated_at = time.time()
+            self.counters = {}
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self._redis_key())
+            except redis.RedisError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'backend': 'redis' if get_redis() is not None else 'local',
+                'priorities': {priority: dict(counts) for priority, counts in self.counters.items()}
+            }
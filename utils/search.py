@@ -0,0 +1,235 @@
+"""Shelf search backends.
+
+``get_backend()`` picks one by database dialect (or ``SHELF_SEARCH_BACKEND``):
+
+- ``postgresql``: the generated ``search_vector`` tsvector columns.
+- ``sqlite``: an FTS5 table, ``books_search``, kept up to date by triggers.
+- ``like``: ``ILIKE`` over the text columns, for anything else.
+- ``bm25``: ``utils.bm25``'s in-process index; only used when configured.
+
+A backend's ``apply(query, terms)`` filters a ``Book.with_volume()`` query
+to the matches and returns it with a relevance expression (higher is
+better), or None when it can't rank. With ``fuzzy``, titles and authors
+that are merely close to the terms (typos, partial words) match too, and
+their similarity is added to the rank. ``suggest(user_id, terms)`` gives
+the closest title or author for a "did you mean" link.
+
+Fuzzy matching uses pg_trgm on PostgreSQL and ``utils.fuzzy`` elsewhere.
+Another backend can be added with ``register()``.
+"""
+import re
+from flask import current_app
+from sqlalchemy import case, event, false, literal, literal_column, or_
+from models import Book, db
+from utils import bm25, fuzzy as trigram
+
+# ts_rank's default weights for the A/B/C/D labels in the tsvector columns:
+# title, authors, description, categories
+WEIGHTS = (1.0, 0.4, 0.2, 0.1)
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def score_rank(scores):
+    """SQL expression giving each book in ``{book_id: score}`` its score, 0 for the rest"""
+    return case(scores, value=Book.id, else_=0.0) if scores else literal(0.0)
+
+
+class LikeSearch:
+    name = 'like'
+
+    def apply(self, query, terms, user_id=None, fuzzy=False):
+        pattern = f'%{terms}%'
+        matched = or_(
+            Book.title.ilike(pattern),
+            Book.authors.ilike(pattern),
+            Book.description.ilike(pattern),
+            Book.categories.ilike(pattern)
+        )
+        if not fuzzy:
+            return query.filter(matched), None
+        scores = trigram.match_scores(user_id, terms)
+        return query.filter(or_(matched, Book.id.in_(scores))), score_rank(scores)
+
+    def suggest(self, user_id, terms):
+        return trigram.suggest(user_id, terms)
+
+
+class PostgresSearch:
+    """Catalog text is indexed once per volume; the book's own vector covers
+    its title, authors and overrides"""
+    name = 'postgresql'
+
+    @staticmethod
+    def set_threshold():
+        """Make ``<%`` as lenient as the fallback, for this transaction only"""
+        db.session.execute(db.text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+                           {'t': str(trigram.THRESHOLD)})
+
+    def apply(self, query, terms, user_id=None, fuzzy=False):
+        tsquery = db.func.plainto_tsquery('books_fts_config', terms)
+        book_vector = literal_column('books.search_vector')
+        volume_vector = literal_column('volumes.search_vector')
+        matched = or_(book_vector.op('@@')(tsquery), volume_vector.op('@@')(tsquery))
+        rank = db.func.greatest(
+            db.func.ts_rank(book_vector, tsquery),
+            db.func.coalesce(db.func.ts_rank(volume_vector, tsquery), 0)
+        )
+        if fuzzy:
+            # "terms <% column" uses the trigram GIN indexes on books
+            self.set_threshold()
+            matched = or_(matched,
+                          literal(terms).op('<%')(Book.title),
+                          literal(terms).op('<%')(Book.authors))
+            rank = rank + db.func.greatest(db.func.word_similarity(terms, Book.title),
+                                           db.func.word_similarity(terms, Book.authors))
+        return query.filter(matched), rank
+
+    def suggest(self, user_id, terms):
+        self.set_threshold()
+        candidates = db.union_all(*(
+            db.select(column.label('text'), db.func.word_similarity(terms, column).label('score'))
+            .where(Book.user_id == user_id, literal(terms).op('<%')(column))
+            for column in (Book.title, Book.authors)
+        )).subquery()
+        return db.session.execute(
+            db.select(candidates.c.text)
+            .order_by(candidates.c.score.desc(), db.func.length(candidates.c.text))
+            .limit(1)
+        ).scalar()
+
+
+class SqliteSearch:
+    """FTS5 index of each book's effective text (override, else catalog).
+
+    Stemming and accent folding match the Postgres configuration, and bm25
+    gets the same column weights as the tsvector labels.
+    """
+    name = 'sqlite'
+    table = 'books_search'
+
+    INDEX_ROWS = """
+        INSERT INTO books_search (rowid, title, authors, description, categories)
+        SELECT b.id, b.title, b.authors,
+               coalesce(b.description, v.description), coalesce(b.categories, v.categories)
+        FROM books b LEFT JOIN volumes v ON v.google_books_id = b.google_books_id
+    """
+
+    DDL = (
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_search USING fts5(
+            title, authors, description, categories,
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS books_search_ai AFTER INSERT ON books BEGIN
+            {INDEX_ROWS} WHERE b.id = new.id;
+        END
+        """,
+        # Status changes don't touch the index
+        f"""
+        CREATE TRIGGER IF NOT EXISTS books_search_au
+        AFTER UPDATE OF title, authors, description, categories, google_books_id ON books BEGIN
+            DELETE FROM books_search WHERE rowid = old.id;
+            {INDEX_ROWS} WHERE b.id = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_search_ad AFTER DELETE ON books BEGIN
+            DELETE FROM books_search WHERE rowid = old.id;
+        END
+        """,
+        # Catalog changes reindex every copy of the volume
+        f"""
+        CREATE TRIGGER IF NOT EXISTS volumes_search_ai AFTER INSERT ON volumes BEGIN
+            DELETE FROM books_search WHERE rowid IN
+                (SELECT id FROM books WHERE google_books_id = new.google_books_id);
+            {INDEX_ROWS} WHERE b.google_books_id = new.google_books_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS volumes_search_au
+        AFTER UPDATE OF description, categories ON volumes BEGIN
+            DELETE FROM books_search WHERE rowid IN
+                (SELECT id FROM books WHERE google_books_id = new.google_books_id);
+            {INDEX_ROWS} WHERE b.google_books_id = new.google_books_id;
+        END
+        """,
+    )
+
+    @staticmethod
+    def match_expression(terms):
+        """Quote each word so user input can't use FTS5 query syntax; words are ANDed"""
+        return ' '.join(f'"{word}"' for word in _WORD_RE.findall(terms))
+
+    def install(self, connection, rebuild=False):
+        """Create the index and triggers; ``rebuild`` refills it from the tables"""
+        if rebuild:
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS {self.table}')
+        for statement in self.DDL:
+            connection.exec_driver_sql(statement)
+        if rebuild:
+            connection.exec_driver_sql(self.INDEX_ROWS)
+
+    def apply(self, query, terms, user_id=None, fuzzy=False):
+        match = self.match_expression(terms)
+        if not match:
+            return query.filter(false()), None
+        scores = trigram.match_scores(user_id, terms) if fuzzy else {}
+
+        # Full-text matches with their rank; bm25 is lower for better matches
+        fts = db.table(self.table, db.column('rowid'))
+        matches = db.select(
+            fts.c.rowid.label('book_id'),
+            (-db.func.bm25(literal_column(self.table), *WEIGHTS)).label('rank')
+        ).where(literal_column(self.table).op('MATCH')(match)).subquery()
+
+        if not fuzzy:
+            return query.join(matches, matches.c.book_id == Book.id), matches.c.rank
+        query = query.outerjoin(matches, matches.c.book_id == Book.id)\
+            .filter(or_(matches.c.book_id.isnot(None), Book.id.in_(scores)))
+        return query, db.func.coalesce(matches.c.rank, 0) + score_rank(scores)
+
+    def suggest(self, user_id, terms):
+        return trigram.suggest(user_id, terms)
+
+
+class Bm25Search:
+    """Ranks in Python from a per-user inverted index, so it works on any
+    database; only the best ``MAX_RESULTS`` books are returned"""
+    name = 'bm25'
+    MAX_RESULTS = 500
+
+    def apply(self, query, terms, user_id=None, fuzzy=False):
+        scores = bm25.search(user_id, terms, WEIGHTS, limit=self.MAX_RESULTS)
+        if fuzzy:
+            for book_id, score in trigram.match_scores(user_id, terms).items():
+                scores[book_id] = scores.get(book_id, 0.0) + score
+        if not scores:
+            return query.filter(false()), None
+        return query.filter(Book.id.in_(scores)), score_rank(scores)
+
+    def suggest(self, user_id, terms):
+        return trigram.suggest(user_id, terms)
+
+
+BACKENDS = {backend.name: backend
+            for backend in (PostgresSearch(), SqliteSearch(), LikeSearch(), Bm25Search())}
+
+
+def register(backend):
+    """Make a backend selectable through ``SHELF_SEARCH_BACKEND``"""
+    BACKENDS[backend.name] = backend
+
+
+def get_backend():
+    name = current_app.config.get('SHELF_SEARCH_BACKEND') or db.engine.dialect.name
+    return BACKENDS.get(name, BACKENDS['like'])
+
+
+@event.listens_for(Book.__table__, 'after_create')
+def create_sqlite_index(target, connection, **kw):
+    """A freshly created books table starts with a fresh SQLite index"""
+    if connection.dialect.name == 'sqlite':
+        BACKENDS['sqlite'].install(connection, rebuild=True)
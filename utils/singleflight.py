@@ -0,0 +1,116 @@
+"""Request coalescing for identical upstream calls.
+
+Within a worker, concurrent callers with the same key wait on a single
+in-flight call and share its result (or exception). Across workers, a
+short-lived Redis lock elects one worker to make the call; the others poll
+the shared cache tier for the result it writes, and only fall back to
+calling themselves if it never shows up.
+"""
+import threading
+import time
+import uuid
+import redis
+from utils.cache import get_redis
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+
+    def __init__(self, lock_ttl=5.0, wait_timeout=5.0, poll_interval=0.05):
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.counters = {'calls': 0, 'coalesced': 0, 'remote_waits': 0, 'remote_hits': 0}
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Run ``func`` once for all concurrent callers using ``key``"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.counters['calls'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def do_cached(self, key, cache, func):
+        """Coalesce ``func`` across threads and workers, storing its result in ``cache``"""
+        return self.do(key, lambda: self._across_workers(key, cache, func))
+
+    def _across_workers(self, key, cache, func):
+        # Another worker may have finished while we were waiting locally
+        value = cache.get_shared(key)
+        if value is not None:
+            return value
+
+        client = get_redis()
+        if client is None:
+            return self._fetch(key, cache, func)
+
+        lock_key = f'singleflight:{cache.name}:{key}'
+        token = uuid.uuid4().hex
+        try:
+            acquired = client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except redis.RedisError:
+            return self._fetch(key, cache, func)
+
+        if acquired:
+            try:
+                return self._fetch(key, cache, func)
+            finally:
+                try:
+                    if client.get(lock_key) == token:
+                        client.delete(lock_key)
+                except redis.RedisError:
+                    pass
+
+        # Another worker holds the lock; wait for its result to land in the cache
+        self.counters['remote_waits'] += 1
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = cache.get_shared(key)
+            if value is not None:
+                self.counters['remote_hits'] += 1
+                return value
+            try:
+                if not client.exists(lock_key):
+                    break
+            except redis.RedisError:
+                break
+        return self._fetch(key, cache, func)
+
+    def _fetch(self, key, cache, func):
+        value = func()
+        cache.set(key, value)
+        return value
+
+    def stats(self):
+        return dict(self.counters)
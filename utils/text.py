@@ -1,19 +1,21 @@
 import re
 from html import unescape
 
+# Inline formatting is dropped without adding a space so "<i>word</i>s"
+# stays one word; every other tag (p, br, li, div, ...) becomes a separator.
+_INLINE_TAG_RE = re.compile(
+    r'</?(?:a|abbr|b|cite|em|font|i|small|span|strong|sub|sup|u)\b[^>]*>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<(?:/?[a-zA-Z]|!)[^>]*>')
+
+
 def strip_html_tags(text):
-    """Remove HTML tags from text while preserving content"""
+    """Remove HTML tags and decode HTML entities from a string"""
     if not text:
         return ''
-    
-    # Convert HTML entities
-    text = unescape(text)
-    
-    # Remove HTML tags
-    clean = re.compile('<.*?>')
-    text = re.sub(clean, '', text)
-    
-    # Normalize whitespace
-    text = ' '.join(text.split())
-    
-    return text 
\ No newline at end of file
+
+    # Most descriptions have no markup at all
+    if '<' in text:
+        text = _TAG_RE.sub(' ', _INLINE_TAG_RE.sub('', text))
+    if '&' in text:
+        text = unescape(text)
+    return ' '.join(text.split())
@@ -0,0 +1,120 @@
+"""Normalization of Google Books volume resources.
+
+Search results, the detail page, the edit preview and
+``Book.update_from_google_books`` all read volumes through these helpers,
+so every page sees the same cleaned description and identifiers.
+"""
+import re
+from utils.text import strip_html_tags
+
+ISBN_TYPES = {'ISBN_10': 'isbn', 'ISBN_13': 'isbn13'}
+
+_SLASH_RE = re.compile(r'\s*/\s*')
+
+
+def normalize_category(name):
+    """Canonical spelling of a category: single spaces, ' / ' between levels"""
+    return _SLASH_RE.sub(' / ', ' '.join((name or '').split()))
+
+
+def _distinct(names, normalize):
+    result = []
+    for name in names:
+        name = normalize(name)
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def split_categories(value):
+    """Distinct normalized categories from a comma-joined string, in order"""
+    return _distinct((value or '').split(','), normalize_category)
+
+
+def normalize_author(name):
+    return ' '.join((name or '').split())
+
+
+def distinct_authors(names):
+    """Google's author list without blanks, duplicates or stray spaces"""
+    return _distinct(names or (), normalize_author)
+
+
+def split_authors(value):
+    """Authors from a comma-joined string, for books without Google's list"""
+    return distinct_authors((value or '').split(','))
+
+
+def extract_isbns(volume_info):
+    """Return ``{'isbn': ..., 'isbn13': ...}`` from one pass over the identifiers.
+
+    Types that are missing are left out of the result.
+    """
+    isbns = {}
+    for identifier in volume_info.get('industryIdentifiers') or ():
+        field = ISBN_TYPES.get(identifier.get('type'))
+        if field and field not in isbns:
+            isbns[field] = identifier.get('identifier')
+            if len(isbns) == len(ISBN_TYPES):
+                break
+    return isbns
+
+
+def normalize_volume(item, placeholders=True):
+    """Flatten a volume resource into the fields the templates use.
+
+    ``authors`` and ``categories`` stay lists. With ``placeholders`` a
+    missing title or author list gets a display placeholder and other
+    missing text becomes ``''``; without it they are left as None/empty so
+    the result can be compared against a stored Book.
+    """
+    volume_info = item.get('volumeInfo') or {}
+    image_links = volume_info.get('imageLinks') or {}
+    missing = '' if placeholders else None
+    isbns = extract_isbns(volume_info)
+
+    return {
+        'id': item.get('id'),
+        'title': volume_info.get('title') or ('Unknown Title' if placeholders else None),
+        'authors': volume_info.get('authors') or (['Unknown Author'] if placeholders else []),
+        'published_date': volume_info.get('publishedDate', missing),
+        'description': strip_html_tags(volume_info.get('description')),
+        'page_count': volume_info.get('pageCount'),
+        'categories': volume_info.get('categories') or [],
+        'language': volume_info.get('language', missing),
+        'publisher': volume_info.get('publisher', missing),
+        'thumbnail': image_links.get('thumbnail', missing),
+        'small_thumbnail': image_links.get('smallThumbnail', missing),
+        'isbn': isbns.get('isbn', missing),
+        'isbn13': isbns.get('isbn13', missing),
+        'etag': item.get('etag', missing),
+        'self_link': item.get('selfLink', missing),
+        'print_type': volume_info.get('printType', missing),
+        'maturity_rating': volume_info.get('maturityRating', missing),
+        'preview_link': volume_info.get('previewLink', missing),
+        'info_link': volume_info.get('infoLink', missing),
+        'canonical_volume_link': volume_info.get('canonicalVolumeLink', missing),
+        'content_version': volume_info.get('contentVersion', missing),
+        'is_ebook': (item.get('saleInfo') or {}).get('isEbook', False)
+    }
+
+
+def catalog_result(volume):
+    """Shape a catalog ``Volume`` like ``normalize_volume``'s display output"""
+    def split(value):
+        return [part.strip() for part in value.split(',') if part.strip()] if value else []
+
+    result = {
+        'id': volume.google_books_id,
+        'title': volume.title or 'Unknown Title',
+        'authors': split(volume.authors) or ['Unknown Author'],
+        'categories': split(volume.categories),
+        'page_count': volume.page_count,
+        'is_ebook': bool(volume.is_ebook)
+    }
+    for field in ('published_date', 'description', 'language', 'publisher', 'thumbnail',
+                  'small_thumbnail', 'isbn', 'isbn13', 'etag', 'self_link', 'print_type',
+                  'maturity_rating', 'preview_link', 'info_link', 'canonical_volume_link',
+                  'content_version'):
+        result[field] = getattr(volume, field) or ''
+    return result